@@ -5,17 +5,81 @@ Utilitaire pour vérifier l'existence des produits via l'API backend Pharmazon.
 
 from __future__ import annotations
 
+import logging
 import os
+import threading
+import time
 import requests
-from typing import Optional
+from collections import OrderedDict
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlencode
 
+from cassette import mount_cassette
+from config import (
+    BACKEND_CACHE_MAX_ENTRIES,
+    BACKEND_CACHE_NEGATIVE_TTL,
+    BACKEND_CACHE_TTL,
+    PHARMAZON_BATCH_SIZE,
+    PHARMAZON_FIELDS,
+    PHARMAZON_POOL_SIZE,
+    PHARMAZON_TIMEOUT,
+)
+from deadline import Deadline, DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+
+class BackendCache:
+    """
+    Cache à durée de vie (TTL) des vérifications backend, partagé entre les jobs.
+
+    Les produits absents sont conservés moins longtemps que les produits trouvés
+    (ils peuvent être créés entre deux imports). Les erreurs ne sont jamais cachées.
+    """
+
+    def __init__(
+        self,
+        ttl: float = BACKEND_CACHE_TTL,
+        negative_ttl: float = BACKEND_CACHE_NEGATIVE_TTL,
+        max_entries: int = BACKEND_CACHE_MAX_ENTRIES,
+    ) -> None:
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[bool, Optional[dict]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, ean: str) -> Optional[Tuple[bool, Optional[dict]]]:
+        """Retourne (existe, données) si l'EAN est en cache et non expiré."""
+        with self._lock:
+            entry = self._entries.get(ean)
+            if entry is None or entry[0] <= time.monotonic():
+                if entry is not None:
+                    del self._entries[ean]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ean)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, ean: str, value: Tuple[bool, Optional[dict]]) -> None:
+        """Enregistre un résultat de vérification (éviction LRU au-delà de max_entries)."""
+        ttl = self.ttl if value[0] else self.negative_ttl
+        with self._lock:
+            self._entries[ean] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(ean)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
 
 class PharmazonAPIChecker:
     """Vérifie l'existence des produits dans le backend Pharmazon via l'API."""
 
     def __init__(self):
-        """Initialise le checker avec les headers requis."""
+        """Initialise le checker avec les headers requis et une session HTTP partagée."""
         self.BASE_URL = os.getenv("PHARMAZON_BASE_URL")
         self.BEARER_TOKEN = os.getenv("PHARMAZON_BEARER_TOKEN")
         self.USER_AGENT = os.getenv("PHARMAZON_USER_AGENT")
@@ -26,64 +90,163 @@ class PharmazonAPIChecker:
             "User-Agent": self.USER_AGENT,
         }
 
-    def check_product_exists(self, ean: str) -> tuple[bool, Optional[dict]]:
+        # Session avec pool de connexions (keep-alive) réutilisée par toutes les vérifications
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=PHARMAZON_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        mount_cassette(self.session, pool_connections=1, pool_maxsize=PHARMAZON_POOL_SIZE)
+        self.session.headers.update(self.headers)
+
+        self.cache = BackendCache()
+
+    @staticmethod
+    def _item_ean(item: dict) -> Optional[str]:
+        """Retourne l'EAN d'un produit Magento (champ direct ou attribut personnalisé)."""
+        if item.get("ean"):
+            return str(item["ean"])
+        for attribute in item.get("custom_attributes") or []:
+            if attribute.get("attribute_code") == "ean":
+                return str(attribute.get("value"))
+        return None
+
+    def check_product_exists(
+        self, ean: str, deadline: Optional[Deadline] = None
+    ) -> tuple[bool, Optional[dict]]:
         """
         Vérifie si un produit existe dans le backend via son code EAN.
 
         Args:
             ean: Le code EAN du produit à vérifier
+            deadline: Échéance bornant le timeout de la requête
 
         Returns:
             Un tuple (existe, données) où:
             - existe: True si le produit existe, False sinon
             - données: Les données du produit si trouvé, None sinon
+
+        Raises:
+            requests.exceptions.RequestException: si le backend n'a pas pu répondre
+                (une erreur réseau ne signifie pas que le produit est absent)
         """
+        cached = self.cache.get(ean)
+        if cached is not None:
+            return cached
+
         # Construire les paramètres de recherche
         search_criteria = {
             "searchCriteria[filter_groups][0][filters][0][field]": "ean",
             "searchCriteria[filter_groups][0][filters][0][value]": ean,
             "searchCriteria[filter_groups][0][filters][0][condition_type]": "eq",
+            "fields": PHARMAZON_FIELDS,
         }
 
         url = f"{self.BASE_URL}?{urlencode(search_criteria)}"
+        deadline = deadline or Deadline()
 
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(url, timeout=deadline.timeout(PHARMAZON_TIMEOUT))
             response.raise_for_status()
 
             data = response.json()
 
             # Vérifier si des produits ont été trouvés
             if data.get("total_count", 0) > 0 and data.get("items"):
-                return True, data["items"][0]
+                result = (True, data["items"][0])
             else:
-                return False, None
+                result = (False, None)
+            self.cache.set(ean, result)
+            return result
 
         except requests.exceptions.RequestException as e:
-            print(f"⚠️  Erreur lors de la vérification de l'EAN {ean}: {e}")
-            return False, None
+            logger.warning("⚠️  Erreur lors de la vérification de l'EAN %s: %s", ean, e)
+            raise
+
+    def _fetch_batch(self, eans: List[str], deadline: Deadline) -> Dict[str, dict]:
+        """
+        Interroge le backend pour un lot d'EAN avec un filtre `in`, page par page.
+
+        Returns:
+            Les produits trouvés, indexés par EAN
 
-    def batch_check_products(self, eans: list[str]) -> dict[str, tuple[bool, Optional[dict]]]:
+        Raises:
+            requests.exceptions.RequestException: en cas d'erreur HTTP ou réseau
         """
-        Vérifie l'existence de plusieurs produits.
+        found: Dict[str, dict] = {}
+        page = 1
+
+        while True:
+            search_criteria = {
+                "searchCriteria[filter_groups][0][filters][0][field]": "ean",
+                "searchCriteria[filter_groups][0][filters][0][value]": ",".join(eans),
+                "searchCriteria[filter_groups][0][filters][0][condition_type]": "in",
+                "searchCriteria[pageSize]": PHARMAZON_BATCH_SIZE,
+                "searchCriteria[currentPage]": page,
+                "fields": PHARMAZON_FIELDS,
+            }
+            url = f"{self.BASE_URL}?{urlencode(search_criteria)}"
+            response = self.session.get(url, timeout=deadline.timeout(PHARMAZON_TIMEOUT))
+            response.raise_for_status()
+            data = response.json()
+
+            items = data.get("items") or []
+            for item in items:
+                item_ean = self._item_ean(item)
+                if item_ean is None and len(eans) == 1:
+                    item_ean = eans[0]
+                if item_ean in eans and item_ean not in found:
+                    found[item_ean] = item
+
+            if not items or page * PHARMAZON_BATCH_SIZE >= data.get("total_count", 0):
+                return found
+            page += 1
+
+    def batch_check_products(
+        self, eans: list[str], deadline: Optional[Deadline] = None
+    ) -> dict[str, tuple[bool, Optional[dict]]]:
+        """
+        Vérifie l'existence de plusieurs produits, par lots de PHARMAZON_BATCH_SIZE EAN
+        par requête (1 000 EAN = 10 requêtes au lieu de 1 000). Les EAN déjà présents
+        dans le cache ne sont pas redemandés.
 
         Args:
             eans: Liste des codes EAN à vérifier
+            deadline: Échéance bornant les timeouts des requêtes
 
         Returns:
-            Un dictionnaire avec les EAN comme clés et (existe, données) comme valeurs
+            Un dictionnaire avec les EAN comme clés et (existe, données) comme valeurs ;
+            les EAN d'un lot en erreur ou hors délai en sont absents (à revérifier
+            individuellement)
         """
-        results = {}
-
-        for ean in eans:
-            print(f"🔍 Vérification de l'EAN: {ean}")
-            exists, data = self.check_product_exists(ean)
-
-            if exists:
-                print(f"  ✅ Produit trouvé: {data.get('name', 'N/A')}")
+        deadline = deadline or Deadline()
+        results: dict[str, tuple[bool, Optional[dict]]] = {}
+        to_fetch: List[str] = []
+
+        for ean in dict.fromkeys(ean for ean in eans if ean):
+            cached = self.cache.get(ean)
+            if cached is not None:
+                results[ean] = cached
             else:
-                print(f"  ❌ Produit non trouvé")
-
-            results[ean] = (exists, data)
+                to_fetch.append(ean)
+
+        if results:
+            logger.info("♻️  %d EAN déjà vérifié(s) (cache)", len(results))
+
+        for start in range(0, len(to_fetch), PHARMAZON_BATCH_SIZE):
+            chunk = to_fetch[start:start + PHARMAZON_BATCH_SIZE]
+            logger.info("🔍 Vérification d'un lot de %d EAN (%d-%d/%d)", len(chunk), start + 1, start + len(chunk), len(to_fetch))
+
+            try:
+                found = self._fetch_batch(chunk, deadline)
+            except (requests.exceptions.RequestException, DeadlineExceeded) as e:
+                logger.warning("⚠️  Erreur lors de la vérification du lot (%d EAN revérifiés individuellement): %s", len(chunk), e)
+                if deadline.expired():
+                    break  # Budget épuisé : les lots suivants échoueraient aussi
+                continue
+
+            for ean in chunk:
+                results[ean] = (True, found[ean]) if ean in found else (False, None)
+                self.cache.set(ean, results[ean])
+            logger.info("✅ %d trouvé(s) / ❌ %d non trouvé(s)", len(found), len(chunk) - len(found))
 
         return results
@@ -6,21 +6,40 @@ Gère la réception des codes EAN depuis la page web et lance le scraping.
 
 from __future__ import annotations
 
-import json
+import logging
+import math
 import os
 import threading
-from typing import Dict, List
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Dict, List, Optional
 
+import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, render_template, request, send_from_directory
+from flask import Flask, Response, jsonify, render_template, request, send_from_directory
 from flask_cors import CORS
 
 from main import MasterScraper
 from api_checker import PharmazonAPIChecker
+from circuits import circuits_snapshot
+from concurrency import limiters_snapshot
+from config import EAN_TIME_BUDGET, FASTEST_HIT_SITE_ORDER, JOB_TIME_BUDGET, PROFILE_DIR, WEBHOOK_ASYNC
+from deadline import Deadline
+from logs import log_context, setup_logging
+from metrics import EAN_DURATION, EANS_TOTAL, JOBS_ACTIVE, Gauge, render as render_metrics
+from models import dumps
+from profiling import CPROFILE, MODES as PROFILE_MODES, JobProfiler, list_profiles
+from sites import get_hit_rate_stats, site_adapters
+from timing import JobTimings, end_timeline, span, start_timeline
+from tor_fleet import fleet_snapshot, get_tor_fleet
 from webhook_notifier import WebhookNotifier
+from webhook_queue import WebhookDeliveryQueue
 
 # Charger les variables d'environnement depuis le fichier .env
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__, static_folder="web", static_url_path="", template_folder="web")
 CORS(app)
@@ -31,121 +50,253 @@ WEBHOOK_URL_PDTS = os.getenv("WEBHOOK_URL_PDTS")
 
 # Initialiser les utilitaires
 api_checker = PharmazonAPIChecker()
-webhook_notifier = WebhookNotifier(WEBHOOK_URL, WEBHOOK_URL_PDTS)
+# Envoi asynchrone des webhooks : le scraping ne dépend plus de la lenteur de n8n
+webhook_queue = WebhookDeliveryQueue() if WEBHOOK_ASYNC else None
+webhook_notifier = WebhookNotifier(WEBHOOK_URL, WEBHOOK_URL_PDTS, webhook_queue)
 
+# Jauges lues au moment de la collecte /metrics
+Gauge("scraper_site_concurrency_limit", "Limite de concurrence AIMD par site", ["site"],
+      callback=lambda: {(site,): state["limit"] for site, state in limiters_snapshot().items()})
+Gauge("scraper_site_in_flight", "Requêtes en cours par site", ["site"],
+      callback=lambda: {(site,): state["in_flight"] for site, state in limiters_snapshot().items()})
 
-def process_scraping_task(data: dict):
+
+def _circuit_gauge(field: str, scale: float = 1.0) -> Callable[[], Dict]:
+    def collect() -> Dict:
+        return {
+            (index,): state[field] * scale
+            for index, state in circuits_snapshot()["circuits"].items()
+            if state[field] is not None
+        }
+    return collect
+
+
+Gauge("scraper_tor_circuit_score", "Coût relatif de chaque circuit Tor (1 = moyenne, plus bas = plus rapide)",
+      ["circuit"], callback=_circuit_gauge("score"))
+Gauge("scraper_tor_circuit_ttfb_seconds", "Temps jusqu'au premier octet (EWMA) de chaque circuit Tor",
+      ["circuit"], callback=_circuit_gauge("ttfb"))
+Gauge("scraper_tor_circuit_throughput_bytes", "Débit (EWMA, octets/s) de chaque circuit Tor",
+      ["circuit"], callback=_circuit_gauge("throughput_kbps", 1024))
+
+
+def _tor_daemons() -> Dict:
+    states = [daemon["state"] for daemon in fleet_snapshot().values()]
+    return {(state,): states.count(state) for state in set(states)}
+
+
+Gauge("scraper_tor_daemons", "Démons Tor de la flotte par état (ready, starting, down)", ["state"],
+      callback=_tor_daemons)
+if webhook_queue is not None:
+    Gauge("webhook_queue_depth", "Envois webhook en attente dans la file",
+          callback=lambda: {(): webhook_queue.depth()})
+
+    def _webhook_workers() -> Dict:
+        stats = webhook_queue.stats()
+        return {("total",): stats["workers"], ("busy",): stats["busy"]}
+
+    Gauge("webhook_workers", "Workers d'envoi des webhooks (total et en cours d'envoi)", ["state"],
+          callback=_webhook_workers)
+
+
+def process_scraping_task(data: dict, job_id: str = ""):
     """
     Fonction exécutée en arrière-plan pour traiter le scraping.
-    Cette fonction s'exécute dans un thread séparé.
+    Cette fonction s'exécute dans un thread séparé ; ses logs portent l'identifiant du job.
     """
+    JOBS_ACTIVE.inc()
     try:
-        print(f"\n{'=' * 70}")
-        print(f"🚀 DÉMARRAGE DU TRAITEMENT EN ARRIÈRE-PLAN")
-        print(f"{'=' * 70}\n")
+        with log_context(job=job_id):
+            profile_mode = data.get("profile")
+            if not profile_mode:
+                _run_scraping_job(data)
+                return
+            profiler = JobProfiler(
+                job_id or uuid.uuid4().hex[:12],
+                CPROFILE if profile_mode is True else profile_mode,
+                memory=bool(data.get("profile_memory")),
+            )
+            with profiler:
+                stats = _run_scraping_job(data, on_result=profiler.write_result)
+            profiler.save(asdict(stats) if stats is not None else None)
+    except Exception:
+        logger.exception("💥 Erreur critique lors du scraping")
+    finally:
+        JOBS_ACTIVE.dec()
+
+
+@dataclass
+class JobStats:
+    """Compteurs d'un job : seul état conservé d'un EAN à l'autre, quelle que soit la taille du job."""
+
+    received: int = 0
+    processed: int = 0
+    skipped: int = 0  # EAN vide
+    errors: int = 0
+    timed_out: int = 0
+    found: int = 0
+    not_found_scraping: int = 0
+    not_found_backend: List[str] = field(default_factory=list)  # EAN (résumé par email)
+
+
+def _run_scraping_job(data: dict, on_result: Optional[Callable[[Dict], None]] = None) -> Optional[JobStats]:
+    """
+    Traite un job de scraping : vérification backend, scraping et webhooks par EAN.
 
-        if not data or "eans" not in data:
-            print(f"❌ ERREUR: Format de données invalide - {data}")
-            return
+    Chaque résultat part vers ses destinations (webhook, fichier produit, `on_result`)
+    dès que l'EAN est traité puis est libéré : la mémoire du job ne croît pas avec
+    le nombre d'EAN.
 
-        eans_list = data["eans"]
-        ignored_3400 = data.get("ignored3400", [])
+    Args:
+        data: Corps de la requête /api/scrape
+        on_result: Appelée avec le résultat de chaque EAN (ex: écriture du profil)
 
-        if not isinstance(eans_list, list):
-            print(f"❌ ERREUR: Liste de codes EAN invalide - Type: {type(eans_list)}")
-            return
-
-        scraper = MasterScraper()
-        results = []
-        not_found_backend = []
-        processed_count = 0
-        skipped_count = 0
-        error_count = 0
-
-        print(f"\n{'=' * 70}")
-        print(f"📋 Produits ignorés (EAN commençant par 3400): {len(ignored_3400)}")
-        print(f"📋 Produits à traiter: {len(eans_list)}")
-        print(f"{'=' * 70}")
-
-        # Afficher tous les EAN reçus
-        print(f"\n🔍 LISTE DES EAN REÇUS:")
+    Returns:
+        Les compteurs du job (None si la requête est invalide)
+    """
+    if not data or "eans" not in data:
+        logger.error("❌ Format de données invalide")
+        return None
+
+    eans_list = data["eans"]
+    ignored_3400 = data.get("ignored3400", [])
+
+    if not isinstance(eans_list, list):
+        logger.error("❌ Liste de codes EAN invalide - Type: %s", type(eans_list).__name__)
+        return None
+
+    scraper = MasterScraper(data.get("sites"))
+    stats = JobStats(received=len(eans_list))
+    job_timings = JobTimings()
+
+    def emit(result_entry: Dict) -> None:
+        if result_entry.get("found"):
+            stats.found += 1
+        elif result_entry.get("backend_exists"):
+            stats.not_found_scraping += 1
+        if on_result is not None:
+            on_result(result_entry)
+
+    # Budgets de temps (surchargeables par requête)
+    ean_budget = data.get("ean_budget", EAN_TIME_BUDGET)
+    job_deadline = Deadline(data.get("job_budget", JOB_TIME_BUDGET), label="job")
+
+    # Mode "fastest" : un seul produit par EAN, le premier site validé
+    fastest = data.get("mode") == "fastest"
+    site_order = data.get("site_order")
+
+    def scrape(ean: str, deadline: Deadline) -> Dict[str, Dict]:
+        if fastest:
+            return scraper.scrape_fastest(ean, deadline, site_order)
+        search_results = scraper.search_all_sites(ean, deadline)
+        return scraper.extract_products(ean, search_results, deadline)
+
+    logger.info("🚀 Démarrage du job: %d produit(s) à traiter, %d ignoré(s) (EAN 3400)%s",
+                len(eans_list), len(ignored_3400),
+                f", mode premier trouvé ({', '.join(site_order or FASTEST_HIT_SITE_ORDER)})" if fastest else "")
+    if logger.isEnabledFor(logging.DEBUG):
         for idx, ean_entry in enumerate(eans_list, 1):
             primary = ean_entry.get("primary") if isinstance(ean_entry, dict) else ean_entry
             replacement = ean_entry.get("replacement") if isinstance(ean_entry, dict) else None
-            print(f"   #{idx}: Primary={primary}, Replacement={replacement}")
-        print(f"{'=' * 70}\n")
-
-        for idx, ean_entry in enumerate(eans_list, 1):
-            try:
-                print(f"\n{'🔄' * 35}")
-                print(f"🔄 TRAITEMENT DU PRODUIT #{idx}/{len(eans_list)}")
-                print(f"{'🔄' * 35}")
-
-                primary_ean = (ean_entry.get("primary") or "").strip()
-                replacement_ean = (ean_entry.get("replacement") or "").strip()
-
-                print(f"📝 EAN Primary: {primary_ean}")
-                print(f"📝 EAN Replacement: {replacement_ean if replacement_ean else 'Aucun'}")
+            logger.debug("#%d: Primary=%s, Replacement=%s", idx, primary, replacement)
+
+    # Pré-vérification backend de tout le job (requêtes groupées + cache partagé)
+    # afin que le scraping n'attende jamais l'API Pharmazon. Seul l'EAN principal est
+    # vérifié côté backend : l'EAN de remplacement ne sert qu'à la recherche sur les sites
+    job_eans = [
+        (ean_entry.get("primary") or "").strip() for ean_entry in eans_list if isinstance(ean_entry, dict)
+    ]
+    logger.info("🔎 Pré-vérification backend de %d EAN", len(set(filter(None, job_eans))))
+    with job_timings.measure("backend_prefetch"):
+        backend_checks = api_checker.batch_check_products(job_eans, job_deadline)
+
+    for idx, ean_entry in enumerate(eans_list, 1):
+        timeline = start_timeline()
+        primary_ean = replacement_ean = ""
+        try:
+            primary_ean = (ean_entry.get("primary") or "").strip()
+            replacement_ean = (ean_entry.get("replacement") or "").strip()
+            with log_context(ean=primary_ean or None):
+                logger.info("🔄 Produit #%d/%d (remplacement: %s)", idx, len(eans_list), replacement_ean or "aucun")
 
                 if not primary_ean:
-                    print(f"⚠️  SKIP: EAN vide - passage au produit suivant")
-                    skipped_count += 1
+                    logger.warning("⚠️  EAN vide - passage au produit suivant")
+                    stats.skipped += 1
                     continue
 
-                # Vérifier d'abord si le produit existe dans le backend
-                print(f"\n{'=' * 70}")
-                print(f"🔎 ÉTAPE 1: Vérification backend pour l'EAN: {primary_ean}")
-                print(f"{'=' * 70}")
+                if job_deadline.expired():
+                    logger.warning("⏱️  Budget du job épuisé - produit non traité")
+                    stats.timed_out += 1
+                    EANS_TOTAL.inc("timeout")
+                    emit({
+                        "primary_ean": primary_ean,
+                        "replacement_ean": replacement_ean if replacement_ean else None,
+                        "found": False,
+                        "backend_exists": False,
+                        "timed_out": True,
+                        "products": {},
+                    })
+                    continue
+
+                ean_deadline = job_deadline.child(ean_budget, label=f"EAN {primary_ean}")
 
-                exists, backend_data = api_checker.check_product_exists(primary_ean)
+                # Vérifier d'abord si le produit existe dans le backend
+                with span("backend"):
+                    # Entrées consommées retirées : le préfetch se vide au fil du job
+                    try:
+                        exists, backend_data = (
+                            backend_checks.pop(primary_ean, None)
+                            or api_checker.check_product_exists(primary_ean, ean_deadline)
+                        )
+                    except requests.RequestException as e:
+                        # Backend injoignable : erreur, et non produit absent du backend
+                        logger.error("❌ Backend indisponible pour l'EAN %s: %s", primary_ean, e)
+                        stats.errors += 1
+                        EANS_TOTAL.inc("error")
+                        emit({
+                            "primary_ean": primary_ean,
+                            "replacement_ean": replacement_ean if replacement_ean else None,
+                            "found": False,
+                            "backend_exists": None,
+                            "error": f"Backend indisponible: {e}",
+                            "products": {},
+                        })
+                        continue
 
                 if not exists:
-                    print(f"❌ Produit non trouvé côté backend - ignoré")
-                    not_found_backend.append(primary_ean)
+                    logger.info("❌ Produit non trouvé côté backend - ignoré")
+                    stats.not_found_backend.append(primary_ean)
+                    EANS_TOTAL.inc("not_in_backend")
 
-                    result_entry = {
+                    emit({
                         "primary_ean": primary_ean,
                         "replacement_ean": replacement_ean if replacement_ean else None,
                         "found": False,
                         "backend_exists": False,
                         "products": {},
-                    }
-                    results.append(result_entry)
-                    processed_count += 1
+                    })
+                    stats.processed += 1
                     continue
 
-                print(f"✅ Produit trouvé côté backend: {backend_data.get('name', 'N/A')}")
+                logger.debug("✅ Produit trouvé côté backend: %s", backend_data.get("name", "N/A"))
 
                 # Tenter avec le code EAN principal
-                print(f"\n{'=' * 70}")
-                print(f"🔎 ÉTAPE 2: Scraping pour l'EAN: {primary_ean}")
-                print(f"{'=' * 70}")
-
-                search_results = scraper.search_all_sites(primary_ean)
-                print(f"🔍 Résultats de recherche obtenus pour {len(search_results)} site(s)")
-
-                print(f"\n{'=' * 70}")
-                print(f"📦 ÉTAPE 3: Extraction des données")
-                print(f"{'=' * 70}")
-                products = scraper.extract_products(primary_ean, search_results)
-                print(f"✅ Extraction terminée - {len(products)} produit(s) extrait(s)")
+                products = scrape(primary_ean, ean_deadline)
 
                 # Si aucun produit trouvé et qu'il y a un code de remplacement
-                if not products and replacement_ean:
-                    print(f"\n⚠️  Aucun produit trouvé pour {primary_ean}")
-                    print(f"🔄 Tentative avec le code EAN de remplacement: {replacement_ean}\n")
+                if not products and replacement_ean and not ean_deadline.expired():
+                    logger.info("🔄 Aucun produit trouvé - tentative avec le code de remplacement %s", replacement_ean)
 
-                    search_results = scraper.search_all_sites(replacement_ean)
-                    products = scraper.extract_products(replacement_ean, search_results)
+                    with log_context(ean=replacement_ean):
+                        products = scrape(replacement_ean, ean_deadline)
 
                     if products:
                         # Indiquer qu'on a utilisé le code de remplacement
-                        print(f"✅ Produits trouvés avec le code de remplacement!")
+                        logger.info("✅ Produits trouvés avec le code de remplacement")
                         for site_key in products:
                             products[site_key]["used_replacement"] = True
                             products[site_key]["original_ean"] = primary_ean
                     else:
-                        print(f"❌ Aucun produit trouvé même avec le code de remplacement")
+                        logger.info("❌ Aucun produit trouvé même avec le code de remplacement")
 
                 # Ajouter le résultat
                 result_entry = {
@@ -153,17 +304,20 @@ def process_scraping_task(data: dict):
                     "replacement_ean": replacement_ean if replacement_ean else None,
                     "found": len(products) > 0,
                     "backend_exists": True,
-                    "backend_data": backend_data,
+                    # Identifiants seulement : l'article Magento complet n'est pas recopié
+                    "backend_data": {key: backend_data.get(key) for key in ("id", "sku", "name")},
                     "products": products,
+                    "timings": timeline.to_dict(),
                 }
+                if ean_deadline.timed_out:
+                    result_entry["timed_out"] = True
+                    result_entry["timed_out_steps"] = list(ean_deadline.timeouts)
+                    stats.timed_out += 1
+                    logger.warning("⏱️  Résultats partiels (hors délai: %s)", ", ".join(ean_deadline.timeouts))
 
-                results.append(result_entry)
-                processed_count += 1
-
-                # ÉTAPE 4: Sauvegarde et envoi webhook
-                print(f"\n{'=' * 70}")
-                print(f"💾 ÉTAPE 4: Sauvegarde et envoi webhook")
-                print(f"{'=' * 70}")
+                emit(result_entry)
+                stats.processed += 1
+                EANS_TOTAL.inc("found" if products else "not_found")
 
                 # Déterminer l'EAN utilisé pour la recherche (pour le nom de fichier)
                 ean_used_for_search = replacement_ean if (replacement_ean and any(p.get("used_replacement", False) for p in products.values())) else primary_ean
@@ -171,96 +325,68 @@ def process_scraping_task(data: dict):
                 if products:
                     # Produit trouvé : sauvegarder dans un fichier JSON
                     json_file = f"product_{ean_used_for_search}.json"
-                    with open(json_file, "w", encoding="utf-8") as f:
-                        json.dump(products, f, ensure_ascii=False, indent=2)
-                    print(f"💾 Résultats sauvegardés dans: {json_file}")
-                else:
-                    # Produit non trouvé mais existe côté backend : pas de sauvegarde JSON
-                    print(f"⚠️  Aucune donnée à sauvegarder (produit non trouvé sur les sites)")
+                    with open(json_file, "wb") as f:
+                        f.write(dumps(products, indent=True))
+                    logger.debug("💾 Résultats sauvegardés dans: %s", json_file)
 
                 # Envoyer TOUJOURS le webhook (même si products est vide)
                 # IMPORTANT: On envoie TOUJOURS le primary_ean (code EAN actuel) dans le webhook,
                 # même si le produit a été trouvé avec le code remplacé (ancien code EAN)
-                print(f"📤 Envoi du webhook pour l'EAN actuel {primary_ean} (trouvé via: {ean_used_for_search}, données: {'présentes' if products else 'vides'})")
-                webhook_notifier.send_product_data(primary_ean, products if products else {})
-
-                print(f"\n✅ PRODUIT #{idx} TERMINÉ AVEC SUCCÈS")
-
-            except Exception as e:
-                error_count += 1
-                print(f"\n{'❌' * 35}")
-                print(f"❌ ERREUR LORS DU TRAITEMENT DU PRODUIT #{idx}")
-                print(f"{'❌' * 35}")
-                print(f"EAN: {primary_ean if 'primary_ean' in locals() else 'N/A'}")
-                print(f"Type d'erreur: {type(e).__name__}")
-                print(f"Message: {str(e)}")
-                print(f"{'❌' * 35}\n")
-
-                # Ajouter un résultat d'erreur
-                result_entry = {
-                    "primary_ean": primary_ean if 'primary_ean' in locals() else None,
-                    "replacement_ean": replacement_ean if 'replacement_ean' in locals() else None,
-                    "found": False,
-                    "backend_exists": False,
-                    "error": str(e),
-                    "products": {},
-                }
-                results.append(result_entry)
-
-                # Continuer avec le produit suivant
-                continue
-
-        # Résumé final du traitement
-        print(f"\n{'🎯' * 35}")
-        print(f"🎯 RÉSUMÉ FINAL DU TRAITEMENT")
-        print(f"{'🎯' * 35}")
-        print(f"📊 Produits reçus: {len(eans_list)}")
-        print(f"✅ Produits traités avec succès: {processed_count}")
-        print(f"⚠️  Produits ignorés (EAN vide): {skipped_count}")
-        print(f"❌ Produits en erreur: {error_count}")
-        print(f"📦 Résultats au total: {len(results)}")
-        print(f"{'🎯' * 35}\n")
-
-        # Détail des résultats
-        success_count = sum(1 for r in results if r.get("found"))
-        not_found_scraping = sum(1 for r in results if r.get("backend_exists") and not r.get("found"))
-
-        print(f"📈 DÉTAIL DES RÉSULTATS:")
-        print(f"   ✅ Produits trouvés et scrapés: {success_count}")
-        print(f"   ❌ Produits non trouvés (backend): {len(not_found_backend)}")
-        print(f"   ❌ Produits non trouvés (scraping): {not_found_scraping}")
-        print(f"   🚫 Produits ignorés (EAN 3400): {len(ignored_3400)}")
-
-        # Envoyer la notification par webhook si nécessaire
-        print(f"\n{'=' * 70}")
-        print(f"🔍 VÉRIFICATION DES NOTIFICATIONS:")
-        print(f"   - Produits ignorés (3400): {len(ignored_3400)}")
-        print(f"   - Produits non trouvés (backend): {len(not_found_backend)}")
-        print(f"{'=' * 70}\n")
-
-        if ignored_3400 or not_found_backend:
-            print(f"\n{'=' * 70}")
-            print("📧 Envoi de la notification récapitulative...")
-            print(f"{'=' * 70}\n")
-            webhook_notifier.send_summary_email(ignored_3400, not_found_backend)
-        else:
-            print("ℹ️  Aucune notification d'erreur à envoyer")
-
-        print(f"\n{'✅' * 35}")
-        print(f"✅ TRAITEMENT COMPLET TERMINÉ")
-        print(f"{'✅' * 35}\n")
-
-    except Exception as exc:
-        print(f"\n{'💥' * 35}")
-        print(f"💥 ERREUR CRITIQUE LORS DU SCRAPING")
-        print(f"{'💥' * 35}")
-        print(f"Type d'erreur: {type(exc).__name__}")
-        print(f"Message: {str(exc)}")
-        print(f"{'💥' * 35}\n")
-
-        import traceback
-        print("📋 Traceback complet:")
-        traceback.print_exc()
+                # Le budget du job ne borne pas l'envoi : un produit déjà scrapé n'est pas perdu
+                if not webhook_notifier.send_product_data(
+                    primary_ean,
+                    products if products else {},
+                    timed_out=ean_deadline.timed_out,
+                ):
+                    stats.errors += 1
+
+                logger.info("✅ Produit #%d terminé: %d produit(s) (trouvé via %s)",
+                            idx, len(products), ean_used_for_search)
+
+        except Exception as e:
+            stats.errors += 1
+            EANS_TOTAL.inc("error")
+            logger.exception("❌ Erreur lors du traitement du produit #%d (EAN %s): %s: %s",
+                             idx, primary_ean or "N/A", type(e).__name__, e)
+
+            # Ajouter un résultat d'erreur
+            emit({
+                "primary_ean": primary_ean or None,
+                "replacement_ean": replacement_ean or None,
+                "found": False,
+                "backend_exists": False,
+                "error": str(e),
+                "products": {},
+            })
+
+            # Continuer avec le produit suivant
+            continue
+        finally:
+            end_timeline()
+            if timeline.stage_totals():
+                job_timings.add(timeline)
+                EAN_DURATION.observe(time.perf_counter() - timeline.started_at)
+
+    # Résumé final du traitement
+    logger.info(
+        "🎯 Résumé du job: %d reçu(s), ✅ %d traité(s), ⚠️  %d ignoré(s) (EAN vide), ❌ %d en erreur, "
+        "⏱️  %d hors délai | trouvés: %d, non trouvés backend: %d, non trouvés scraping: %d, EAN 3400: %d",
+        stats.received, stats.processed, stats.skipped, stats.errors, stats.timed_out,
+        stats.found, len(stats.not_found_backend), stats.not_found_scraping, len(ignored_3400),
+    )
+    logger.info("⏱️  Temps par étape et par EAN:\n%s", "\n".join(job_timings.format_lines()))
+
+    # Mode lot : envoi du dernier lot de produits incomplet
+    webhook_notifier.flush()
+    get_hit_rate_stats().save()
+
+    if ignored_3400 or stats.not_found_backend:
+        webhook_notifier.send_summary_email(ignored_3400, stats.not_found_backend)
+    else:
+        logger.debug("ℹ️  Aucune notification d'erreur à envoyer")
+
+    logger.info("✅ Traitement complet terminé")
+    return stats
 
 
 @app.route("/")
@@ -280,48 +406,81 @@ def scrape_products():
             {"primary": "3401548610299", "replacement": "3401548610298"},
             {"primary": "1234567890123", "replacement": null}
         ],
-        "ignored3400": ["3400123456789", ...]
+        "ignored3400": ["3400123456789", ...],
+        "sites": ["cocooncenter", "pharmagdd"],  // optionnel - sites interrogés (tous par défaut, cf. sites.py)
+        "ean_budget": 120,   // optionnel - budget en secondes par EAN (0 ou null = illimité)
+        "job_budget": 3600,  // optionnel - budget en secondes pour le job (0 ou null = illimité)
+        "mode": "fastest",   // optionnel - un seul produit par EAN : le premier site validé
+        "site_order": ["pharmagdd", "cocooncenter", "drakkars"],  // optionnel - préférence (mode fastest)
+        "profile": "cprofile",    // optionnel - profil du job ("cprofile" ou "sample"), cf. /api/profiles
+        "profile_memory": true    // optionnel - allocations mémoire autour des extractions (tracemalloc)
     }
 
-    Retourne immédiatement un 202 (Accepted) et traite la requête en arrière-plan.
+    Retourne immédiatement un 202 (Accepted) avec l'identifiant du job (`job_id`, présent
+    dans chaque ligne de log du job) et traite la requête en arrière-plan ; un 400 si
+    un champ est invalide (site inconnu, mode inconnu, budget négatif ou non numérique...).
     """
     try:
         data = request.get_json()
 
-        print(f"\n{'=' * 70}")
-        print(f"📥 RÉCEPTION DE LA REQUÊTE DE SCRAPING")
-        print(f"{'=' * 70}")
-        print(f"📦 Payload reçu: {json.dumps(data, indent=2, ensure_ascii=False)}")
-        print(f"{'=' * 70}\n")
-
         if not data or "eans" not in data:
-            print(f"❌ ERREUR: Format de données invalide - {data}")
+            logger.error("❌ Requête de scraping invalide: clé \"eans\" absente")
             return jsonify({"error": "Format de données invalide"}), 400
 
         eans_list = data.get("eans", [])
         ignored_3400 = data.get("ignored3400", [])
 
         if not isinstance(eans_list, list):
-            print(f"❌ ERREUR: Liste de codes EAN invalide - Type: {type(eans_list)}")
+            logger.error("❌ Liste de codes EAN invalide - Type: %s", type(eans_list).__name__)
             return jsonify({"error": "Liste de codes EAN invalide"}), 400
 
-        # Afficher les informations de la requête
-        print(f"📋 Produits ignorés (EAN commençant par 3400): {len(ignored_3400)}")
-        print(f"📋 Produits à traiter: {len(eans_list)}")
+        profile_mode = data.get("profile")
+        if profile_mode not in (None, False, True) + PROFILE_MODES:
+            return jsonify({"error": f"Mode de profilage invalide (attendu: {', '.join(PROFILE_MODES)})"}), 400
+
+        sites = data.get("sites")
+        known_sites = site_adapters()
+        if sites is not None and (
+            not isinstance(sites, list) or not sites
+            or not all(isinstance(site, str) and site in known_sites for site in sites)
+        ):
+            logger.error("❌ Liste de sites invalide: %r", sites)
+            return jsonify({"error": f"Liste de sites invalide (sites disponibles: {', '.join(known_sites)})"}), 400
+
+        mode = data.get("mode")
+        if mode not in (None, "fastest"):
+            logger.error("❌ Mode de scraping invalide: %r", mode)
+            return jsonify({"error": "Mode de scraping invalide (attendu: \"fastest\")"}), 400
+
+        site_order = data.get("site_order")
+        if site_order is not None and (
+            not isinstance(site_order, list) or not site_order
+            or not all(isinstance(site, str) and site in known_sites for site in site_order)
+        ):
+            logger.error("❌ Ordre des sites invalide: %r", site_order)
+            return jsonify({"error": f"Ordre des sites invalide (sites disponibles: {', '.join(known_sites)})"}), 400
+
+        for key in ("ean_budget", "job_budget"):
+            budget = data.get(key)
+            if budget is not None and (
+                isinstance(budget, bool) or not isinstance(budget, (int, float))
+                or not math.isfinite(budget) or budget < 0
+            ):
+                logger.error("❌ Budget %s invalide: %r", key, budget)
+                return jsonify({"error": f"Budget \"{key}\" invalide (nombre de secondes positif ou nul attendu)"}), 400
 
         # Lancer le traitement en arrière-plan dans un thread
+        job_id = uuid.uuid4().hex[:12]
         thread = threading.Thread(
             target=process_scraping_task,
-            args=(data,),
+            args=(data, job_id),
             daemon=True
         )
         thread.start()
 
-        print(f"\n{'✅' * 35}")
-        print(f"✅ TRAITEMENT LANCÉ EN ARRIÈRE-PLAN")
-        print(f"{'✅' * 35}")
-        print(f"Thread ID: {thread.ident}")
-        print(f"Les webhooks seront envoyés au fur et à mesure du traitement.\n")
+        with log_context(job=job_id):
+            logger.info("📥 Job reçu: %d produit(s) à traiter, %d ignoré(s) (EAN 3400)",
+                        len(eans_list), len(ignored_3400))
 
         # Retourner immédiatement une réponse 202 (Accepted)
         return jsonify({
@@ -329,37 +488,63 @@ def scrape_products():
             "message": "Scraping lancé en arrière-plan",
             "status": "processing",
             "total_products": len(eans_list),
+            "job_id": job_id,
             "thread_id": thread.ident
         }), 202
 
     except Exception as exc:
-        print(f"\n{'💥' * 35}")
-        print(f"💥 ERREUR LORS DU LANCEMENT DU SCRAPING")
-        print(f"{'💥' * 35}")
-        print(f"Type d'erreur: {type(exc).__name__}")
-        print(f"Message: {str(exc)}")
-        print(f"{'💥' * 35}\n")
-
-        import traceback
-        print("📋 Traceback complet:")
-        traceback.print_exc()
-
+        logger.exception("💥 Erreur lors du lancement du scraping")
         return jsonify({"error": str(exc), "type": type(exc).__name__}), 500
 
 
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    """Vérification que le serveur est en ligne."""
-    return jsonify({"status": "ok"})
+    """Vérification que le serveur est en ligne (avec l'état de la concurrence par site et des circuits Tor)."""
+    health = {
+        "status": "ok",
+        "concurrency": limiters_snapshot(),
+        "tor_circuits": circuits_snapshot(),
+        "site_hit_rates": get_hit_rate_stats().snapshot(),
+    }
+    fleet = fleet_snapshot()
+    if fleet:
+        health["tor_fleet"] = fleet
+    if webhook_queue is not None:
+        health["webhooks"] = webhook_queue.stats()
+    return jsonify(health)
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Métriques au format texte Prometheus (latences, taux de succès, blocages, files)."""
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.route("/api/profiles", methods=["GET"])
+def profiles():
+    """Liste les profils de jobs enregistrés (plus récents d'abord)."""
+    return jsonify({"profiles": list_profiles()})
+
+
+@app.route("/api/profiles/<job_id>/<path:filename>", methods=["GET"])
+def download_profile(job_id: str, filename: str):
+    """Télécharge un fichier de profil (profile.prof, profile.txt, samples.folded, memory.json...)."""
+    return send_from_directory(os.path.abspath(PROFILE_DIR), f"{job_id}/{filename}", as_attachment=True)
+
+
+@app.route("/api/webhooks/replay", methods=["POST"])
+def replay_webhooks():
+    """Rejoue les webhooks en échec stockés dans le spool disque."""
+    if webhook_queue is None:
+        return jsonify({"error": "Envoi asynchrone des webhooks désactivé"}), 400
+    replayed, failed = webhook_queue.replay_dead_letters()
+    return jsonify({"replayed": replayed, "failed": failed})
 
 
 if __name__ == "__main__":
-    print(f"╔{'═' * 68}╗")
-    print(f"║{'  SERVEUR WEB - Interface de scraping':^68}║")
-    print(f"╚{'═' * 68}╝\n")
-    print("📡 Serveur démarré sur http://127.0.0.1:8080")
-    print("🌐 Ouvrez votre navigateur à cette adresse\n")
-    print("⚠️  Mode debug désactivé pour éviter les doublons de webhooks\n")
+    # Démarrage des démons Tor de la flotte dès le lancement (TOR_FLEET_SIZE > 0)
+    get_tor_fleet()
+    logger.info("📡 Serveur démarré sur http://127.0.0.1:8080 (mode debug désactivé pour éviter les doublons de webhooks)")
 
     # debug=False pour éviter les redémarrages automatiques qui créent des doublons de webhooks
     app.run(debug=False, host="0.0.0.0", port=8080)
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Benchmark hors ligne de l'extraction (parse) sur un corpus de pages produit enregistrées.
+
+Mesure, par site : pages/seconde, temps moyen par champ et pic mémoire (tracemalloc),
+et compare à une référence (baseline.json) : régressions de débit et changements du
+résultat extrait. Aucun accès réseau.
+
+    python3 benchmarks/bench_extract.py                  # mesure + comparaison
+    python3 benchmarks/bench_extract.py --save-baseline  # enregistre la référence
+    python3 benchmarks/bench_extract.py --record cocooncenter URL EAN  # ajoute une page réelle
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from scrapers import BaseScraper, CocooncenterScraper, DrakkarsScraper, PharmaGDDScraper  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+MANIFEST_FILE = os.path.join(FIXTURES_DIR, "manifest.json")
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+SCRAPERS = {
+    "cocooncenter": CocooncenterScraper,
+    "pharmagdd": PharmaGDDScraper,
+    "drakkars": DrakkarsScraper,
+}
+
+
+def load_fixtures() -> List[Dict]:
+    """Charge le manifeste et le HTML de chaque page du corpus."""
+    with open(MANIFEST_FILE, "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    for entry in manifest:
+        with open(os.path.join(FIXTURES_DIR, entry["file"]), "r", encoding="utf-8") as handle:
+            entry["html"] = handle.read()
+    return manifest
+
+
+def result_digest(product: Dict) -> str:
+    """Empreinte du résultat extrait (détecte toute modification de la sortie)."""
+    encoded = json.dumps(product.to_dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def bench_site(scraper: BaseScraper, pages: List[Dict], iterations: int) -> Dict:
+    """Mesure le débit, le temps par champ et le pic mémoire d'un site."""
+    digests = {page["file"]: result_digest(scraper.parse(page["html"], page["url"], page["ean"])) for page in pages}
+
+    # Passe de mesure du temps (sans tracemalloc, qui ralentit fortement l'exécution)
+    scraper.field_timings = {}
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for page in pages:
+            scraper.parse(page["html"], page["url"], page["ean"])
+    elapsed = time.perf_counter() - start
+    count = iterations * len(pages)
+    fields_ms = {
+        name: round(total / count * 1000, 4)
+        for name, total in sorted(scraper.field_timings.items(), key=lambda item: -item[1])
+    }
+    scraper.field_timings = None
+
+    # Passe de mesure mémoire : pic par page
+    peak = 0
+    for page in pages:
+        tracemalloc.start()
+        scraper.parse(page["html"], page["url"], page["ean"])
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    return {
+        "pages": count,
+        "pages_per_sec": round(count / elapsed, 1),
+        "ms_per_page": round(elapsed / count * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+        "fields_ms": fields_ms,
+        "digests": digests,
+    }
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> bool:
+    """Affiche l'écart à la référence ; False en cas de régression ou de sortie modifiée."""
+    ok = True
+    print(f"\n📏 Comparaison avec la référence (tolérance {tolerance:.0%})")
+    for site, result in results.items():
+        reference = baseline.get(site)
+        if reference is None:
+            print(f"   ➖ {site}: absent de la référence")
+            continue
+        speed = result["pages_per_sec"] / reference["pages_per_sec"] - 1
+        memory = result["peak_kb"] / reference["peak_kb"] - 1 if reference["peak_kb"] else 0.0
+        status = "✅" if speed >= -tolerance else "❌"
+        ok = ok and speed >= -tolerance
+        print(f"   {status} {site}: débit {speed:+.1%}, pic mémoire {memory:+.1%}")
+
+        changed = [
+            name for name, digest in result["digests"].items()
+            if reference["digests"].get(name) not in (None, digest)
+        ]
+        for name in changed:
+            ok = False
+            print(f"      ❌ Résultat extrait modifié: {name}")
+    return ok
+
+
+def record_fixture(site: str, url: str, ean: str) -> None:
+    """Télécharge une page produit réelle et l'ajoute au corpus."""
+    scraper = SCRAPERS[site]()
+    html = scraper._fetch_with_retry(url).text
+    scraper.parse(html, url, ean)  # Vérifie que la page est exploitable
+
+    path = f"{site}/{ean}.html"
+    os.makedirs(os.path.join(FIXTURES_DIR, site), exist_ok=True)
+    with open(os.path.join(FIXTURES_DIR, path), "w", encoding="utf-8") as handle:
+        handle.write(html)
+
+    with open(MANIFEST_FILE, "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    manifest = [entry for entry in manifest if entry["file"] != path]
+    manifest.append({"site": site, "ean": ean, "url": url, "file": path})
+    with open(MANIFEST_FILE, "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, ensure_ascii=False, indent=2)
+        handle.write("\n")
+    print(f"💾 Page enregistrée: {path} ({len(html) // 1024} Ko)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark hors ligne de l'extraction")
+    parser.add_argument("--iterations", type=int, default=20, help="Passes sur le corpus (défaut: 20)")
+    parser.add_argument("--site", choices=sorted(SCRAPERS), help="Limiter à un site")
+    parser.add_argument("--save-baseline", action="store_true", help="Enregistrer les résultats comme référence")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Fichier de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Baisse de débit tolérée (défaut: 0.2)")
+    parser.add_argument("--record", nargs=3, metavar=("SITE", "URL", "EAN"), help="Enregistrer une page réelle")
+    args = parser.parse_args()
+
+    if args.record:
+        record_fixture(*args.record)
+        return
+
+    fixtures = load_fixtures()
+    results: Dict[str, Dict] = {}
+    for site, scraper_class in SCRAPERS.items():
+        if args.site and site != args.site:
+            continue
+        pages = [page for page in fixtures if page["site"] == site]
+        if not pages:
+            continue
+        result = bench_site(scraper_class(), pages, args.iterations)
+        results[site] = result
+        print(f"\n📦 {site}: {result['pages_per_sec']} pages/s, {result['ms_per_page']} ms/page, "
+              f"pic mémoire {result['peak_kb']} Ko")
+        for name, ms in list(result["fields_ms"].items())[:6]:
+            print(f"   ⏱️  {name:<20} {ms:.3f} ms")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as handle:
+            json.dump(results, handle, ensure_ascii=False, indent=2)
+            handle.write("\n")
+        print(f"\n💾 Référence enregistrée: {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("\nℹ️  Aucune référence (lancer avec --save-baseline)")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as handle:
+        baseline = json.load(handle)
+    if not compare(results, baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Plafond mémoire d'un gros job : `_run_scraping_job` sur N EAN contre le serveur simulé.
+
+Le serveur simulé (benchmarks/mock_pharmacy.py) est lancé sans latence sur un port
+libre ; le job tourne dans ce processus, dans un répertoire temporaire (fichiers
+produits, état des deltas, statistiques des sites). La mémoire résidente (RSS) est
+relevée au fil des résultats : après l'échauffement, elle doit rester plate quel que
+soit le nombre d'EAN. Code de sortie 1 si la croissance dépasse --max-growth-mb.
+
+    python3 benchmarks/bench_job_memory.py                     # 10 000 EAN
+    python3 benchmarks/bench_job_memory.py --eans 2000 --sites cocooncenter
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from load_driver import generate_eans, mock_environment  # noqa: E402
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def rss_mb() -> float:
+    """Mémoire résidente actuelle du processus (Mo)."""
+    with open("/proc/self/statm", "r", encoding="ascii") as handle:
+        return int(handle.read().split()[1]) * PAGE_SIZE / (1024 * 1024)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_mock(port: int) -> subprocess.Popen:
+    """Lance le serveur simulé (sans latence) et attend qu'il réponde."""
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, "mock_pharmacy.py"), "--port", str(port),
+         "--latency", "0", "--jitter", "0"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/_mock/stats", timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("Serveur simulé injoignable")
+
+
+def run(eans: List[str], sites: List[str], sample_every: int, warmup: int) -> Dict:
+    import app  # Import après la configuration de l'environnement (lu par config)
+
+    samples: List[Dict] = []
+    state = {"results": 0, "found": 0}
+
+    def on_result(entry: Dict) -> None:
+        state["results"] += 1
+        state["found"] += bool(entry.get("found"))
+        if state["results"] % sample_every == 0:
+            samples.append({"results": state["results"], "rss_mb": round(rss_mb(), 1)})
+            print(f"   {state['results']:>6} EAN  RSS {samples[-1]['rss_mb']:>7.1f} Mo", end="\r", flush=True)
+
+    start_rss = rss_mb()
+    start = time.perf_counter()
+    stats = app._run_scraping_job(
+        {"eans": [{"primary": ean} for ean in eans], "sites": sites}, on_result=on_result
+    )
+    elapsed = time.perf_counter() - start
+    if app.webhook_queue is not None:
+        app.webhook_queue.flush(timeout=60)  # Webhooks encore en file : envoyés avant l'arrêt du serveur
+    print()
+
+    after_warmup = [sample["rss_mb"] for sample in samples if sample["results"] >= warmup]
+    baseline = after_warmup[0] if after_warmup else start_rss
+    final = samples[-1]["rss_mb"] if samples else rss_mb()
+    return {
+        "eans": len(eans),
+        "processed": stats.processed if stats else 0,
+        "found": state["found"],
+        "seconds": round(elapsed, 1),
+        "rss_start_mb": round(start_rss, 1),
+        "rss_after_warmup_mb": baseline,
+        "rss_final_mb": final,
+        "rss_max_mb": max(after_warmup, default=final),
+        "growth_mb": round(max(after_warmup, default=final) - baseline, 1),
+        "samples": samples,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eans", type=int, default=10000, help="Nombre d'EAN du job")
+    parser.add_argument("--sites", default="cocooncenter,pharmagdd",
+                        help="Sites interrogés (drakkars nécessite Firefox)")
+    parser.add_argument("--sample-every", type=int, default=250, help="Relevé RSS tous les N résultats")
+    parser.add_argument("--warmup", type=int, default=500, help="EAN d'échauffement (caches, pools, imports)")
+    parser.add_argument("--max-growth-mb", type=float, default=20, help="Croissance RSS tolérée après échauffement")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    port = free_port()
+    mock = start_mock(port)
+    workdir = tempfile.mkdtemp(prefix="bench_job_memory_")
+    try:
+        # Les URLs et fichiers d'état sont lus par config à l'import : environnement à définir avant
+        os.environ.update(mock_environment(f"http://127.0.0.1:{port}"))
+        os.environ.setdefault("LOG_LEVEL", "WARNING")
+        os.chdir(workdir)
+        result = run(generate_eans(args.eans), args.sites.split(","), args.sample_every, args.warmup)
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{result['processed']}/{result['eans']} EAN traités ({result['found']} trouvés) en {result['seconds']}s")
+        print(f"RSS : départ {result['rss_start_mb']} Mo, après échauffement {result['rss_after_warmup_mb']} Mo, "
+              f"final {result['rss_final_mb']} Mo, max {result['rss_max_mb']} Mo")
+        print(f"Croissance après échauffement : {result['growth_mb']} Mo (seuil {args.max_growth_mb} Mo)")
+        print(f"Fichiers dans {workdir}")
+    sys.exit(1 if result["growth_mb"] > args.max_growth_mb else 0)
+
+
+if __name__ == "__main__":
+    main()
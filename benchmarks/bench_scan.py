@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark de l'extraction par motifs (html_scan) sur le corpus de pages enregistrées.
+
+Compare, par page et par site, l'ancienne méthode (un `re.search` par champ, nettoyage
+par 17 `str.replace` puis `re.sub`) au parcours unique `FieldScanner.scan()` suivi de
+`clean_text()`, dans les deux cas rencontrés :
+- JSON-LD lisible : seuls les champs qu'il ne fournit pas sont cherchés ;
+- sans JSON-LD : tous les champs sont cherchés.
+Vérifie au passage que les deux méthodes donnent les mêmes valeurs. Aucun accès réseau.
+
+    python3 benchmarks/bench_scan.py
+    python3 benchmarks/bench_scan.py --site drakkars --iterations 2000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from bench_extract import load_fixtures  # noqa: E402
+from html_scan import clean_text  # noqa: E402
+from models import ProductRecord  # noqa: E402
+from scrapers import DrakkarsScraper, PharmaGDDScraper  # noqa: E402
+
+SCRAPERS = {
+    "pharmagdd": PharmaGDDScraper,
+    "drakkars": DrakkarsScraper,
+}
+
+# Motifs avant html_scan : une recherche par champ
+LEGACY_PATTERNS = {
+    "pharmagdd": {
+        "titre": r'"name":"([^"]*)"',
+        "description": r'"description":"([^"]*)"',
+        "note": r'"ratingValue":([0-9.]+)',
+        "nb_avis": r'"reviewCount":([0-9]+)',
+        "prix": r'<span data-js-product-price[^>]*>([^<]*)',
+        "ean_verif": r'<span data-js-product-reference[^>]*>([^<]*)',
+        "code_custom": r'<span data-js-custom-code[^>]*>([^<]*)',
+        "marque": r'<a class="brand"[^>]*title="[^"]*"[^>]*>([^<]*)',
+    },
+    "drakkars": {
+        "prix": r'class="pdt-detail-price[^>]*><strong>([0-9,]+)',
+        "note": r'<span class="text-bold">([0-9]/[0-9])</span>',
+        "nb_avis": r'<span class="text-bold">[0-9]/[0-9]</span>\s*\|\s*<span>([0-9]+)',
+        "pourcentage_reco": r'class="fa-4x text-bold has-color-theme">([0-9]+%)',
+        "date_avis": r'class="gris-clair">\s*([0-9.]+)',
+    },
+}
+
+LEGACY_ENTITIES = {
+    "&eacute;": "é", "&egrave;": "è", "&agrave;": "à", "&ugrave;": "ù", "&acirc;": "â",
+    "&ocirc;": "ô", "&icirc;": "î", "&ecirc;": "ê", "&nbsp;": " ", "&#39;": "'",
+    "&rsquo;": "'", "&amp;": "&", "&ccedil;": "ç", "\\u00e9": "é", "\\u00e8": "è",
+    "\\u00e0": "à", "\\u00e7": "ç",
+}
+
+
+def legacy_clean(text: str) -> str:
+    """Nettoyage avant html_scan : un remplacement par entité, puis les espaces."""
+    for old, new in LEGACY_ENTITIES.items():
+        text = text.replace(old, new)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def legacy_scan(html: str, patterns: Dict[str, str], skip: Iterable[str]) -> Dict[str, str]:
+    skipped = set(skip)
+    found = {}
+    for name, pattern in patterns.items():
+        if name in skipped:
+            continue
+        match = re.search(pattern, html)
+        if match:
+            found[name] = match.group(1)
+    return found
+
+
+def per_page_us(function: Callable[[], object], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def bench_page(site: str, html: str, iterations: int, skip: List[str]) -> Dict:
+    scanner = SCRAPERS[site].scanner
+    patterns = LEGACY_PATTERNS[site]
+
+    def old() -> Dict[str, str]:
+        return {name: legacy_clean(value) for name, value in legacy_scan(html, patterns, skip).items()}
+
+    def new() -> Dict[str, str]:
+        return {name: clean_text(value) for name, value in scanner.scan(html, skip=skip).items()}
+
+    if old() != new():
+        raise AssertionError(f"{site}: résultats différents\n  avant: {old()}\n  après: {new()}")
+    before = per_page_us(old, iterations)
+    after = per_page_us(new, iterations)
+    return {"fields": len(new()), "before_us": round(before, 1), "after_us": round(after, 1)}
+
+
+def bench_clean(texts: List[str], iterations: int) -> Dict:
+    """Nettoyage seul, sur des textes réels du corpus (titres, descriptions, avis)."""
+    for text in texts:
+        if legacy_clean(text) != clean_text(text):
+            raise AssertionError(f"Nettoyage différent : {text[:80]!r}")
+    before = per_page_us(lambda: [legacy_clean(text) for text in texts], iterations)
+    after = per_page_us(lambda: [clean_text(text) for text in texts], iterations)
+    return {"texts": len(texts), "before_us": round(before, 1), "after_us": round(after, 1)}
+
+
+def corpus_texts(fixtures: List[Dict]) -> List[str]:
+    """Textes bruts que les scrapers nettoient : texte des éléments et valeurs extraites."""
+    from bs4 import BeautifulSoup
+
+    texts: List[str] = []
+    for page in fixtures:
+        soup = BeautifulSoup(page["html"], "html.parser")
+        for element in soup.find_all(["title", "p", "td", "article", "span"]):
+            text = element.get_text(separator=" ", strip=True)
+            if text:
+                texts.append(text)
+        soup.decompose()
+    return texts
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Micro-benchmark du parcours unique des motifs")
+    parser.add_argument("--iterations", type=int, default=500, help="Répétitions par page (défaut: 500)")
+    parser.add_argument("--site", choices=sorted(SCRAPERS), help="Limiter à un site")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args(argv)
+
+    fixtures = load_fixtures()
+    results: Dict[str, Dict] = {}
+    for site, scraper_class in SCRAPERS.items():
+        if args.site and site != args.site:
+            continue
+        scraper = scraper_class()
+        for page in (page for page in fixtures if page["site"] == site):
+            # Champs fournis par le JSON-LD de la page : ni cherchés avant, ni après
+            product = ProductRecord()
+            scraper._apply_jsonld(product, page["html"])
+            results[page["file"]] = {
+                "jsonld": bench_page(site, page["html"], args.iterations, product.keys()),
+                "sans_jsonld": bench_page(site, page["html"], args.iterations, []),
+            }
+
+    pages = [page for page in fixtures if not args.site or page["site"] == args.site]
+    results["clean_text"] = bench_clean(corpus_texts(pages), max(1, args.iterations // 50))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, result in results.items():
+        cases = result.items() if name != "clean_text" else [("nettoyage", result)]
+        print(f"\n📄 {name}")
+        for case, values in cases:
+            gain = values["before_us"] / values["after_us"] if values["after_us"] else 0.0
+            print(f"   {case:<12} {values['before_us']:>9.1f} µs → {values['after_us']:>8.1f} µs  (×{gain:.1f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark du démarrage des points d'entrée (CLI et API).
+
+Chaque scénario est exécuté dans un interpréteur neuf, plusieurs fois : temps de
+démarrage (médiane, min), pic mémoire du processus et modules lourds effectivement
+chargés (Selenium, BeautifulSoup). Aucun accès réseau.
+
+    python3 benchmarks/bench_startup.py              # tous les scénarios, 5 exécutions
+    python3 benchmarks/bench_startup.py --runs 10 --scenario health
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("selenium", "bs4", "flask")
+
+SCENARIOS = {
+    # Import du module CLI (main.py)
+    "cli": "import main",
+    # Import de l'API (app.py) : redémarrage d'un worker
+    "api": "import app",
+    # Démarrage de l'API puis une vérification de santé
+    "health": "import app\napp.app.test_client().get('/api/health')",
+    # CLI limitée à un site : seuls son searcher et son scraper sont créés
+    "one-site": (
+        "from main import MasterScraper\n"
+        "scraper = MasterScraper()\n"
+        "scraper.searchers['cocooncenter']\n"
+        "scraper.scrapers['cocooncenter']"
+    ),
+    # Pire cas : les trois sites sont utilisés
+    "all-sites": (
+        "from main import MasterScraper\n"
+        "scraper = MasterScraper()\n"
+        "for site in scraper.site_names:\n"
+        "    scraper.searchers[site]\n"
+        "    scraper.scrapers[site]"
+    ),
+}
+
+# Ajouté à chaque scénario : rapport du processus enfant (pic mémoire, modules chargés)
+REPORT = """
+import json, resource, sys
+print(json.dumps({
+    "rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def run_scenario(code: str) -> Dict:
+    """Exécute un scénario dans un nouvel interpréteur et retourne ses mesures."""
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1", LOG_LEVEL="WARNING")
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-c", code + "\n" + REPORT],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    elapsed = time.perf_counter() - start
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    report["seconds"] = elapsed
+    return report
+
+
+def bench(name: str, runs: int) -> Dict:
+    samples: List[Dict] = [run_scenario(SCENARIOS[name]) for _ in range(runs)]
+    durations = [sample["seconds"] for sample in samples]
+    return {
+        "scenario": name,
+        "median_ms": round(statistics.median(durations) * 1000, 1),
+        "min_ms": round(min(durations) * 1000, 1),
+        "rss_mb": round(max(sample["rss_kb"] for sample in samples) / 1024, 1),
+        "modules": samples[-1]["modules"],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Exécutions par scénario")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append", help="Scénario(s) à mesurer")
+    parser.add_argument("--json", action="store_true", help="Sortie JSON")
+    args = parser.parse_args()
+
+    run_scenario("pass")  # préchauffe le cache disque
+    results = [bench(name, args.runs) for name in (args.scenario or SCENARIOS)]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'scénario':<12} {'médiane':>10} {'min':>10} {'mémoire':>10}  modules lourds chargés")
+    for result in results:
+        print(
+            f"{result['scenario']:<12} {result['median_ms']:>8.1f}ms {result['min_ms']:>8.1f}ms "
+            f"{result['rss_mb']:>8.1f}Mo  {', '.join(result['modules']) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Test de charge du pipeline contre le serveur simulé (benchmarks/mock_pharmacy.py).
+
+Deux modes :
+- scraper : recherche + extraction via MasterScraper, en parallèle dans ce processus
+- api     : envoie un job à /api/scrape (app.py lancé avec les variables d'environnement
+            du serveur simulé) et mesure l'arrivée des webhooks produits
+
+    python3 benchmarks/mock_pharmacy.py &
+    python3 benchmarks/load_driver.py --mode scraper --eans 2000 --concurrency 16
+    python3 benchmarks/load_driver.py --mode api --eans 2000 --app-url http://127.0.0.1:5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+import requests
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+SITES = ("cocooncenter", "pharmagdd", "drakkars")
+
+
+def mock_environment(mock_url: str) -> Dict[str, str]:
+    """Variables d'environnement pointant le scraper vers le serveur simulé."""
+    return {
+        "COCOONCENTER_BASE_URL": f"{mock_url}/cocooncenter",
+        "PHARMAGDD_BASE_URL": f"{mock_url}/pharmagdd",
+        "DRAKKARS_BASE_URL": f"{mock_url}/drakkars",
+        "DRAKKARS_USE_TOR": "0",
+        "PHARMAZON_BASE_URL": f"{mock_url}/pharmazon/rest/V1/products",
+        "WEBHOOK_URL": f"{mock_url}/webhook/summary",
+        "WEBHOOK_URL_PDTS": f"{mock_url}/webhook/products",
+        "TRANSPORT_MODE": "direct",
+    }
+
+
+def generate_eans(count: int, seed: int = 42) -> List[str]:
+    """Génère des EAN-13 valides (clé de contrôle calculée), hors préfixe 3400."""
+    rng = random.Random(seed)
+    eans = []
+    while len(eans) < count:
+        body = "376" + "".join(str(rng.randint(0, 9)) for _ in range(9))
+        total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(body))
+        ean = body + str((10 - total % 10) % 10)
+        if ean not in eans:
+            eans.append(ean)
+    return eans
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Percentile par rang le plus proche."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def report(title: str, latencies: List[float], elapsed: float, extra: Dict) -> None:
+    print(f"\n{'=' * 70}")
+    print(f"📊 {title}")
+    print(f"{'=' * 70}")
+    print(f"   EAN traités : {len(latencies)} en {elapsed:.1f}s ({len(latencies) / elapsed:.1f} EAN/s)")
+    for label, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+        print(f"   {label:<11} : {percentile(latencies, fraction) * 1000:.0f} ms")
+    print(f"   max         : {max(latencies, default=0) * 1000:.0f} ms")
+    for key, value in extra.items():
+        print(f"   {key:<11} : {value}")
+
+
+def run_scraper(eans: List[str], sites: List[str], concurrency: int, fastest: bool, verbose: bool) -> None:
+    """Pousse les EAN dans MasterScraper (un MasterScraper par thread, comme un job de l'API)."""
+    from concurrency import limiters_snapshot
+    from config import EAN_TIME_BUDGET
+    from deadline import Deadline
+    from main import MasterScraper
+
+    local = threading.local()
+    latencies: List[float] = []
+    found = errors = 0
+    lock = threading.Lock()
+
+    def work(ean: str) -> None:
+        nonlocal found, errors
+        if not hasattr(local, "scraper"):
+            local.scraper = MasterScraper()
+            for site in SITES:
+                if site not in sites:
+                    local.scraper.searchers.pop(site, None)
+        scraper = local.scraper
+        start = time.perf_counter()
+        try:
+            deadline = Deadline(EAN_TIME_BUDGET, label=f"EAN {ean}")
+            if fastest:
+                products = scraper.scrape_fastest(ean, deadline)
+            else:
+                products = scraper.extract_products(ean, scraper.search_all_sites(ean, deadline), deadline)
+        except Exception:  # noqa: BLE001
+            products = None
+        latency = time.perf_counter() - start
+        with lock:
+            latencies.append(latency)
+            if products is None:
+                errors += 1
+            elif products:
+                found += 1
+
+    if verbose:
+        from logs import setup_logging
+        setup_logging()
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    start = time.perf_counter()
+    with output, ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(work, eans))
+    elapsed = time.perf_counter() - start
+
+    report("MasterScraper (recherche + extraction)", latencies, elapsed, {
+        "trouvés": found,
+        "erreurs": errors,
+        "concurrence": json.dumps(limiters_snapshot()),
+    })
+
+
+def run_api(eans: List[str], app_url: str, mock_url: str, fastest: bool, timeout: float) -> None:
+    """Envoie un job à /api/scrape et attend les webhooks produits sur le récepteur simulé."""
+    requests.post(f"{mock_url}/_mock/reset", timeout=10)
+    payload = {"eans": [{"primary": ean, "replacement": None} for ean in eans]}
+    if fastest:
+        payload["mode"] = "fastest"
+
+    submitted_at = time.time()
+    response = requests.post(f"{app_url}/api/scrape", json=payload, timeout=30)
+    response.raise_for_status()
+    print(f"🚀 Job accepté ({response.status_code}) - attente des webhooks...")
+
+    expected = set(eans)
+    received: Dict[str, float] = {}
+    while len(received) < len(expected) and time.time() - submitted_at < timeout:
+        time.sleep(1)
+        stats = requests.get(f"{mock_url}/_mock/stats", timeout=10).json()
+        for hook in stats["webhooks"]:
+            if hook["name"] == "products" and hook["ean"] in expected:
+                received.setdefault(hook["ean"], hook["received_at"])
+        print(f"   📥 {len(received)}/{len(expected)} webhooks produits reçus", end="\r")
+
+    completion = [received_at - submitted_at for received_at in received.values()]
+    elapsed = max(completion, default=time.time() - submitted_at)
+    report("/api/scrape (temps jusqu'au webhook de chaque EAN)", completion, elapsed, {
+        "manquants": len(expected) - len(received),
+        "requêtes": json.dumps(stats["routes"]),
+    })
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Test de charge contre le serveur simulé")
+    parser.add_argument("--mode", choices=("scraper", "api"), default="scraper")
+    parser.add_argument("--eans", type=int, default=1000, help="Nombre d'EAN générés")
+    parser.add_argument("--concurrency", type=int, default=8, help="EAN traités en parallèle (mode scraper)")
+    parser.add_argument("--sites", default="cocooncenter,pharmagdd",
+                        help="Sites recherchés en mode scraper (drakkars nécessite Firefox)")
+    parser.add_argument("--fastest", action="store_true", help="Mode « premier trouvé »")
+    parser.add_argument("--mock-url", default="http://127.0.0.1:8099")
+    parser.add_argument("--app-url", default="http://127.0.0.1:5000")
+    parser.add_argument("--timeout", type=float, default=3600, help="Attente maximale des webhooks (mode api)")
+    parser.add_argument("--verbose", action="store_true", help="Afficher les logs du scraper")
+    args = parser.parse_args()
+
+    eans = generate_eans(args.eans)
+    if args.mode == "api":
+        run_api(eans, args.app_url, args.mock_url, args.fastest, args.timeout)
+        return
+
+    # Les URLs des sites sont lues par config à l'import : environnement à définir avant
+    for key, value in mock_environment(args.mock_url).items():
+        os.environ.setdefault(key, value)
+    run_scraper(eans, args.sites.split(","), args.concurrency, args.fastest, args.verbose)
+
+
+if __name__ == "__main__":
+    main()
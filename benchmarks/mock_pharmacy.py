@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Serveur local simulant les trois pharmacies, l'API Pharmazon et le récepteur de webhooks,
+pour tester la charge du pipeline sans solliciter les vrais sites.
+
+Routes simulées (préfixe = un site) :
+- /cocooncenter/index/search/searchVue (POST) et /cocooncenter/p/<ean>.html
+- /pharmagdd/fr/search/autocomplete?s=<ean> et /pharmagdd/fr/p/<ean>
+- /drakkars/ (page d'accueil + couche de recherche JS façon Doofinder), /drakkars/dfd/search?q=<ean>
+  et /drakkars/p/<ean>.html
+- /pharmazon/rest/V1/products (searchCriteria Magento, filtres "eq" et "in", pagination)
+- /webhook/<nom> (POST, corps JSON éventuellement gzip)
+- /_mock/stats, /_mock/config (POST), /_mock/reset (POST)
+
+Latence, taux de 403 (page de challenge), taux d'erreurs 500 et taux de produits
+introuvables sont réglables en ligne de commande ou à chaud via /_mock/config :
+
+    python3 benchmarks/mock_pharmacy.py --port 8099 --latency 0.2 --block-rate 0.05
+
+Variables d'environnement correspondantes pour le scraper :
+
+    COCOONCENTER_BASE_URL=http://127.0.0.1:8099/cocooncenter
+    PHARMAGDD_BASE_URL=http://127.0.0.1:8099/pharmagdd
+    DRAKKARS_BASE_URL=http://127.0.0.1:8099/drakkars DRAKKARS_USE_TOR=0
+    PHARMAZON_BASE_URL=http://127.0.0.1:8099/pharmazon/rest/V1/products
+    WEBHOOK_URL=http://127.0.0.1:8099/webhook/summary
+    WEBHOOK_URL_PDTS=http://127.0.0.1:8099/webhook/products
+    TRANSPORT_MODE=direct
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from typing import Dict, List
+
+from flask import Flask, Response, abort, jsonify, request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, "fixtures")
+
+SITE_PREFIXES = ("/cocooncenter", "/pharmagdd", "/drakkars", "/pharmazon")
+
+# Page de challenge renvoyée avec les 403 simulés (reconnue par transport.detect_block)
+CHALLENGE_PAGE = (
+    "<!DOCTYPE html><html><head><title>Attention Required! | Cloudflare</title></head>"
+    "<body><script>window._cf_chl_opt={cvId:'3'};</script></body></html>"
+)
+
+DRAKKARS_HOME = """<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>Pharmacie des Drakkars</title></head>
+<body>
+<header><input id="form-search-keywords" type="text" placeholder="Rechercher un produit"></header>
+<div id="dfd-root"></div>
+<script>
+(function () {
+  var base = "__BASE__";
+  var root = document.getElementById("dfd-root");
+
+  function render(results) {
+    var container = document.createElement("div");
+    container.className = "dfd-results";
+    container.innerHTML = results.map(function (r) {
+      return '<div class="dfd-card" dfd-value-link="' + r.link + '">'
+        + '<a class="dfd-card-link" href="' + r.link + '">' + r.title + '</a></div>';
+    }).join("");
+    var previous = root.querySelector(".dfd-results");
+    if (previous) { previous.remove(); }
+    root.querySelector(".dfd-layer").appendChild(container);
+  }
+
+  function search(query) {
+    fetch(base + "/dfd/search?q=" + encodeURIComponent(query))
+      .then(function (response) { return response.json(); })
+      .then(function (data) { render(data.results || []); });
+  }
+
+  function mount(query) {
+    if (!root.querySelector(".dfd-layer")) {
+      root.innerHTML = '<div class="dfd-layer"><form class="dfd-searchbox">'
+        + '<input class="dfd-searchbox-input" type="search" autocomplete="off"></form></div>';
+      root.querySelector("form").addEventListener("submit", function (event) {
+        event.preventDefault();
+        search(root.querySelector(".dfd-searchbox-input").value);
+      });
+    }
+    if (query) { search(query); }
+  }
+
+  document.getElementById("form-search-keywords").addEventListener("click", function () { mount(); });
+  var match = /q=([0-9]+)/.exec(window.location.hash);
+  if (match) { mount(match[1]); }
+})();
+</script>
+</body></html>
+"""
+
+app = Flask(__name__)
+
+settings: Dict[str, float] = {
+    "latency": 0.05,  # Latence de base (secondes)
+    "jitter": 0.05,  # Latence aléatoire supplémentaire (secondes, uniforme)
+    "block_rate": 0.0,  # Proportion de 403 (page de challenge)
+    "error_rate": 0.0,  # Proportion d'erreurs 500
+    "not_found_rate": 0.1,  # Proportion d'EAN introuvables sur chaque site
+    "backend_missing_rate": 0.0,  # Proportion d'EAN absents de l'API Pharmazon
+    "webhook_error_rate": 0.0,  # Proportion d'erreurs 503 du récepteur de webhooks
+}
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+_webhooks: List[Dict] = []
+_templates: Dict[str, Dict[str, str]] = {}
+
+
+def _count(route: str, outcome: str) -> None:
+    with _stats_lock:
+        counters = _stats.setdefault(route, {})
+        counters[outcome] = counters.get(outcome, 0) + 1
+
+
+def _hashed_ratio(*parts: str) -> float:
+    """Valeur pseudo-aléatoire stable dans [0, 1) (un EAN introuvable le reste)."""
+    digest = hashlib.blake2b("|".join(parts).encode(), digest_size=4).digest()
+    return int.from_bytes(digest, "big") / 2 ** 32
+
+
+def _exists(site: str, ean: str) -> bool:
+    return _hashed_ratio(site, ean) >= settings["not_found_rate"]
+
+
+def _load_templates() -> None:
+    """Charge une page du corpus par site ; l'EAN d'origine est remplacé à la volée."""
+    with open(os.path.join(FIXTURES_DIR, "manifest.json"), "r", encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    for entry in manifest:
+        if entry["site"] in _templates:
+            continue
+        with open(os.path.join(FIXTURES_DIR, entry["file"]), "r", encoding="utf-8") as handle:
+            _templates[entry["site"]] = {"ean": entry["ean"], "html": handle.read()}
+
+
+def _product_page(site: str, ean: str) -> Response:
+    if not _exists(site, ean):
+        abort(404)
+    template = _templates[site]
+    return Response(template["html"].replace(template["ean"], ean), mimetype="text/html")
+
+
+@app.before_request
+def inject_faults():
+    """Latence, 403 et erreurs 500 simulés sur les routes des sites et de l'API."""
+    if not request.path.startswith(SITE_PREFIXES):
+        return None
+    time.sleep(settings["latency"] + random.uniform(0, settings["jitter"]))
+    route = request.path.split("/")[1]
+    draw = random.random()
+    if draw < settings["block_rate"]:
+        _count(route, "blocked")
+        return Response(CHALLENGE_PAGE, status=403, mimetype="text/html")
+    if draw < settings["block_rate"] + settings["error_rate"]:
+        _count(route, "error")
+        return Response("Internal Server Error", status=500)
+    _count(route, "ok")
+    return None
+
+
+@app.route("/cocooncenter/index/search/searchVue", methods=["POST"])
+def cocooncenter_search():
+    ean = request.form.get("recherche", "")
+    if not _exists("cocooncenter", ean):
+        return jsonify({"nb_total": 0, "vue": ""})
+    vue = (
+        '<div class="search-results"><a href="/c/soins-visage.html">Soins visage</a>'
+        f'<a href="/p/produit-{ean}.html"><span>Produit {ean}</span></a></div>'
+    )
+    return jsonify({"nb_total": 1, "vue": vue})
+
+
+@app.route("/cocooncenter/p/produit-<ean>.html")
+def cocooncenter_product(ean: str):
+    return _product_page("cocooncenter", ean)
+
+
+@app.route("/pharmagdd/fr/search/autocomplete")
+def pharmagdd_search():
+    ean = request.args.get("s", "")
+    if not _exists("pharmagdd", ean):
+        return jsonify({"length": 0})
+    return jsonify({"length": 1, f"variant_{ean[-6:]}": {"href": f"/fr/p/{ean}", "label": f"Produit {ean}"}})
+
+
+@app.route("/pharmagdd/fr/p/<ean>")
+def pharmagdd_product(ean: str):
+    return _product_page("pharmagdd", ean)
+
+
+@app.route("/drakkars/")
+def drakkars_home():
+    base = request.host_url.rstrip("/") + "/drakkars"
+    return Response(DRAKKARS_HOME.replace("__BASE__", base), mimetype="text/html")
+
+
+@app.route("/drakkars/dfd/search")
+def drakkars_search():
+    ean = request.args.get("q", "")
+    base = request.host_url.rstrip("/") + "/drakkars"
+    results = [{"link": f"{base}/c/parapharmacie", "title": "Parapharmacie"}]
+    if _exists("drakkars", ean):
+        results.insert(0, {"link": f"{base}/p/{ean}.html?mcs=search", "title": f"Produit {ean}"})
+    return jsonify({"results": results})
+
+
+@app.route("/drakkars/p/<ean>.html")
+def drakkars_product(ean: str):
+    return _product_page("drakkars", ean)
+
+
+@app.route("/pharmazon/rest/V1/products")
+def pharmazon_products():
+    """Recherche Magento : filtre ean "eq" ou "in", pagination searchCriteria."""
+    prefix = "searchCriteria[filter_groups][0][filters][0]"
+    value = request.args.get(f"{prefix}[value]", "")
+    eans = value.split(",") if request.args.get(f"{prefix}[condition_type]") == "in" else [value]
+    found = [ean for ean in eans if _hashed_ratio("backend", ean) >= settings["backend_missing_rate"]]
+
+    page_size = int(request.args.get("searchCriteria[pageSize]", 0) or len(found) or 1)
+    page = int(request.args.get("searchCriteria[currentPage]", 1))
+    items = [
+        {
+            "id": int(ean[-9:]),
+            "sku": f"PZ{ean}",
+            "name": f"Produit {ean}",
+            "status": 1,
+            "custom_attributes": [{"attribute_code": "ean", "value": ean}],
+        }
+        for ean in found[(page - 1) * page_size:page * page_size]
+    ]
+    return jsonify({"items": items, "total_count": len(found)})
+
+
+@app.route("/webhook/<name>", methods=["POST"])
+def webhook_sink(name: str):
+    """Récepteur de webhooks : enregistre l'heure d'arrivée de chaque EAN reçu."""
+    if random.random() < settings["webhook_error_rate"]:
+        _count("webhook", "error")
+        return Response("Service Unavailable", status=503)
+
+    body = request.get_data()
+    if request.headers.get("Content-Encoding") == "gzip":
+        body = gzip.decompress(body)
+    payload = json.loads(body or b"{}")
+    items = payload.get("items", []) if payload.get("batch") else [payload]
+    received_at = time.time()
+    with _stats_lock:
+        for item in items:
+            _webhooks.append({"name": name, "ean": item.get("ean"), "received_at": received_at})
+    _count("webhook", "ok")
+    return jsonify({"received": len(items)})
+
+
+@app.route("/_mock/stats")
+def mock_stats():
+    with _stats_lock:
+        return jsonify({"settings": settings, "routes": _stats, "webhooks": _webhooks})
+
+
+@app.route("/_mock/config", methods=["POST"])
+def mock_config():
+    for key, value in (request.get_json() or {}).items():
+        if key in settings:
+            settings[key] = float(value)
+    return jsonify(settings)
+
+
+@app.route("/_mock/reset", methods=["POST"])
+def mock_reset():
+    with _stats_lock:
+        _stats.clear()
+        _webhooks.clear()
+    return jsonify({"reset": True})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serveur simulé des pharmacies")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    for key, value in settings.items():
+        parser.add_argument(f"--{key.replace('_', '-')}", type=float, default=value, dest=key)
+    args = parser.parse_args()
+    for key in settings:
+        settings[key] = getattr(args, key)
+
+    _load_templates()
+    print(f"🏥 Serveur simulé sur http://{args.host}:{args.port} - {json.dumps(settings)}")
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Cassette HTTP : enregistrement et rejeu des échanges HTTP d'une exécution.
+
+En mode "record", chaque requête (recherches, extractions, API Pharmazon, webhooks)
+et sa réponse sont écrites avec leur durée dans une archive JSONL compressée (gzip).
+En mode "replay", les réponses sont servies depuis l'archive, sans réseau, soit à la
+vitesse enregistrée (CASSETTE_REPLAY_SPEED = 1), soit aussi vite que possible (0).
+
+    CASSETTE_MODE=record CASSETTE_PATH=cassettes/job.jsonl.gz python3 main.py
+    CASSETTE_MODE=replay CASSETTE_PATH=cassettes/job.jsonl.gz python3 main.py
+    python3 cassette.py cassettes/job.jsonl.gz   # résumé de l'archive
+"""
+
+from __future__ import annotations
+
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from config import CASSETTE_MODE, CASSETTE_PATH, CASSETTE_REPLAY_SPEED
+
+logger = logging.getLogger(__name__)
+
+OFF = "off"
+RECORD = "record"
+REPLAY = "replay"
+
+# En-têtes de transport invalides une fois le corps décompressé
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+
+def _body_digest(body: Any) -> str:
+    if body is None:
+        return ""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.blake2b(body, digest_size=8).hexdigest()
+
+
+def _encode_body(content: bytes) -> Tuple[str, bool]:
+    """Corps en texte si possible, sinon en base64 (second élément = True)."""
+    try:
+        return content.decode("utf-8"), False
+    except UnicodeDecodeError:
+        return base64.b64encode(content).decode("ascii"), True
+
+
+class Cassette:
+    """Archive d'échanges HTTP (thread-safe) : écriture en mode record, lecture en mode replay."""
+
+    def __init__(self, path: str, mode: str, speed: float = CASSETTE_REPLAY_SPEED) -> None:
+        """
+        Args:
+            path: Fichier de l'archive (JSONL gzip)
+            mode: "record" ou "replay"
+            speed: Facteur appliqué aux durées enregistrées au rejeu (0 = sans attente)
+        """
+        self.path = path
+        self.mode = mode
+        self.speed = speed
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._handle = None
+        self._exact: Dict[Tuple[str, str, str], Deque[Dict]] = defaultdict(deque)
+        self._by_url: Dict[Tuple[str, str], Deque[Dict]] = defaultdict(deque)
+        self._calls: Dict[str, Deque[Dict]] = defaultdict(deque)
+        self.recorded = 0
+        self.replayed = 0
+        self.missing = 0
+
+        if mode == RECORD:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._handle = gzip.open(path, "wt", encoding="utf-8")
+            atexit.register(self.close)
+        else:
+            self._load()
+
+    def _load(self) -> None:
+        with gzip.open(self.path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if entry.get("kind") == "call":
+                    self._calls[entry["key"]].append(entry)
+                    continue
+                self._exact[(entry["method"], entry["url"], entry["body_digest"])].append(entry)
+                self._by_url[(entry["method"], entry["url"])].append(entry)
+
+    def _write(self, entry: Dict) -> None:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            if self._handle is not None:
+                self._handle.write(line + "\n")
+                self.recorded += 1
+
+    def close(self) -> None:
+        """Termine l'archive (mode record)."""
+        with self._lock:
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+    def _wait(self, elapsed: float) -> None:
+        if self.speed > 0 and elapsed > 0:
+            time.sleep(elapsed * self.speed)
+
+    def record_exchange(self, request: requests.PreparedRequest, response: requests.Response, elapsed: float) -> None:
+        """Enregistre une requête et sa réponse."""
+        body, is_b64 = _encode_body(response.content)
+        self._write({
+            "method": request.method,
+            "url": request.url,
+            "body_digest": _body_digest(request.body),
+            "offset": round(time.monotonic() - self.started_at - elapsed, 4),
+            "elapsed": round(elapsed, 4),
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                key: value for key, value in response.headers.items()
+                if key.lower() not in DROPPED_HEADERS
+            },
+            "body": body,
+            "b64": is_b64,
+        })
+
+    def replay_exchange(self, request: requests.PreparedRequest) -> Dict:
+        """
+        Retourne l'échange enregistré correspondant à la requête.
+
+        Les échanges identiques (méthode, URL, corps) sont servis dans l'ordre
+        d'enregistrement ; à défaut, la correspondance se fait sur méthode + URL
+        (ex: webhooks dont le corps contient des horodatages).
+
+        Raises:
+            requests.ConnectionError: si la requête n'a pas été enregistrée
+        """
+        exact_key = (request.method, request.url, _body_digest(request.body))
+        url_key = (request.method, request.url)
+        with self._lock:
+            candidates = self._exact.get(exact_key)
+            entry = candidates.popleft() if candidates else None
+            if entry is not None:
+                self._by_url[url_key].remove(entry)
+            else:
+                fallback = self._by_url.get(url_key)
+                entry = fallback.popleft() if fallback else None
+                if entry is not None:
+                    self._exact[(entry["method"], entry["url"], entry["body_digest"])].remove(entry)
+            if entry is None:
+                self.missing += 1
+                raise requests.ConnectionError(f"Requête absente de la cassette: {request.method} {request.url}")
+            self.replayed += 1
+        self._wait(entry["elapsed"])
+        return entry
+
+    def call(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Enregistre ou rejoue le résultat d'un appel hors HTTP (ex: recherche Selenium).
+
+        Le résultat doit être sérialisable en JSON.
+        """
+        if self.mode == RECORD:
+            start = time.monotonic()
+            result = func()
+            self._write({
+                "kind": "call",
+                "key": key,
+                "offset": round(start - self.started_at, 4),
+                "elapsed": round(time.monotonic() - start, 4),
+                "result": result,
+            })
+            return result
+
+        with self._lock:
+            entries = self._calls.get(key)
+            entry = entries.popleft() if entries else None
+            if entry is None:
+                self.missing += 1
+            else:
+                self.replayed += 1
+        if entry is None:
+            raise requests.ConnectionError(f"Appel absent de la cassette: {key}")
+        self._wait(entry["elapsed"])
+        return entry["result"]
+
+    def stats(self) -> Dict[str, Any]:
+        """Compteurs de la cassette (mode, enregistrés, rejoués, absents)."""
+        return {
+            "mode": self.mode,
+            "path": self.path,
+            "recorded": self.recorded,
+            "replayed": self.replayed,
+            "missing": self.missing,
+        }
+
+
+class CassetteAdapter(HTTPAdapter):
+    """Adaptateur requests qui enregistre (record) ou sert (replay) les échanges via une cassette."""
+
+    def __init__(self, cassette: Cassette, **kwargs: Any) -> None:
+        self.cassette = cassette
+        super().__init__(**kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:
+        if self.cassette.mode == REPLAY:
+            return self._build_response(request, self.cassette.replay_exchange(request))
+
+        start = time.monotonic()
+        response = super().send(request, **kwargs)
+        response.content  # Lecture complète du corps : la durée inclut le transfert
+        self.cassette.record_exchange(request, response, time.monotonic() - start)
+        return response
+
+    @staticmethod
+    def _build_response(request: requests.PreparedRequest, entry: Dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = entry["status"]
+        response.reason = entry.get("reason")
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        response._content = base64.b64decode(entry["body"]) if entry["b64"] else entry["body"].encode("utf-8")
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=entry["elapsed"])
+        return response
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Retourne la cassette du processus (None si CASSETTE_MODE vaut "off")."""
+    global _cassette
+    if CASSETTE_MODE not in (RECORD, REPLAY):
+        return None
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE)
+            logger.info("📼 Cassette HTTP (%s): %s", CASSETTE_MODE, CASSETTE_PATH)
+        return _cassette
+
+
+def mount_cassette(session: requests.Session, **adapter_kwargs: Any) -> requests.Session:
+    """Monte l'adaptateur cassette sur une session si le mode record/replay est actif."""
+    cassette = get_cassette()
+    if cassette is not None:
+        adapter = CassetteAdapter(cassette, **adapter_kwargs)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+    return session
+
+
+def main() -> None:
+    """Point d'entrée CLI : résumé d'une archive (requêtes par hôte, durées)."""
+    if len(sys.argv) != 2:
+        print("Usage: python3 cassette.py <archive.jsonl.gz>")
+        sys.exit(1)
+
+    per_host: Dict[str, list] = defaultdict(list)
+    with gzip.open(sys.argv[1], "rt", encoding="utf-8") as handle:
+        for line in handle:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            host = entry["key"].split(":")[0] if entry.get("kind") == "call" else entry["url"].split("/")[2]
+            per_host[host].append(entry["elapsed"])
+
+    print(f"📼 {sys.argv[1]}")
+    for host, durations in sorted(per_host.items()):
+        durations.sort()
+        print(f"   {host:<40} {len(durations):>6} échanges, "
+              f"médiane {durations[len(durations) // 2] * 1000:.0f} ms, total {sum(durations):.1f}s")
+
+
+if __name__ == "__main__":
+    main()
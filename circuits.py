@@ -0,0 +1,290 @@
+"""
+Sélection des circuits Tor par latence mesurée.
+
+Les récupérations via Tor sont réparties sur un petit nombre d'emplacements d'isolation
+(un identifiant SOCKS distinct = un circuit distinct, cf. `TorSession.isolated_proxy`).
+Chaque emplacement suit une moyenne mobile exponentielle (EWMA) de son temps jusqu'au
+premier octet (TTFB) et de son débit, rapportés à la moyenne du domaine visé pour que
+les circuits restent comparables d'un site à l'autre. Les nouvelles récupérations vont
+au circuit sain le mieux noté ; un circuit nettement plus lent que la moyenne ou en
+échec répété est retiré (nouvel identifiant d'isolation, donc nouveau circuit).
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from config import (
+    CIRCUIT_EWMA_ALPHA,
+    CIRCUIT_EXPLORE,
+    CIRCUIT_MAX_FAILURES,
+    CIRCUIT_MIN_SAMPLES,
+    CIRCUIT_POOL_SIZE,
+    CIRCUIT_RETIRE_FACTOR,
+    TOR_FLEET_SIZE,
+)
+from deadline import Deadline
+from metrics import TOR_CIRCUIT_RETIREMENTS_TOTAL
+
+# Crée une session Tor isolée (identifiant d'isolation, échéance de l'appelant)
+SessionFactory = Callable[[str, Optional[Deadline]], requests.Session]
+
+logger = logging.getLogger(__name__)
+
+# Durée minimale prise en compte pour le transfert du corps (évite les débits infinis
+# des petites pages reçues dans le même paquet que les en-têtes)
+MIN_BODY_SECONDS = 0.05
+
+
+def _ewma(current: Optional[float], value: float, alpha: float = CIRCUIT_EWMA_ALPHA) -> float:
+    return value if current is None else current + alpha * (value - current)
+
+
+class Circuit:
+    """Emplacement d'isolation Tor et ses mesures (modifiées sous le verrou du pool)."""
+
+    def __init__(self, index: int, isolation: str, session_factory: SessionFactory) -> None:
+        self.index = index
+        self.isolation = isolation
+        self._session_factory = session_factory
+        self._session: Optional[requests.Session] = None
+        # Création paresseuse de la session : une seule par circuit même sous concurrence
+        self._session_lock = threading.Lock()
+        self.ttfb: Optional[float] = None  # EWMA (secondes)
+        self.throughput: Optional[float] = None  # EWMA (octets/seconde)
+        self.relative_ttfb: Optional[float] = None  # EWMA du TTFB / moyenne du domaine
+        self.relative_throughput: Optional[float] = None  # EWMA du débit / moyenne du domaine
+        self.samples = 0
+        self.failures = 0  # Échecs consécutifs
+        self.in_flight = 0
+        self.created_at = time.monotonic()
+
+    @property
+    def session(self) -> requests.Session:
+        return self.open_session()
+
+    def open_session(self, deadline: Optional[Deadline] = None) -> requests.Session:
+        """Session du circuit, créée au premier usage (dans la limite de `deadline`)."""
+        with self._session_lock:
+            if self._session is None:
+                self._session = self._session_factory(self.isolation, deadline)
+            return self._session
+
+    def score(self) -> float:
+        """
+        Coût relatif du circuit (1 = moyenne des circuits, plus bas = plus rapide) : le plus
+        défavorable du TTFB relatif et de l'inverse du débit relatif.
+        """
+        if self.relative_ttfb is None:
+            return 0.5  # jamais mesuré : essayé en priorité
+        return max(self.relative_ttfb, 1.0 / max(self.relative_throughput or 1.0, 0.01))
+
+    def close(self) -> None:
+        with self._session_lock:
+            session, self._session = self._session, None
+        if session is not None:
+            session.close()
+
+    def snapshot(self) -> Dict:
+        return {
+            "isolation": self.isolation,
+            "score": round(self.score(), 3),
+            "ttfb": None if self.ttfb is None else round(self.ttfb, 3),
+            "throughput_kbps": None if self.throughput is None else round(self.throughput / 1024, 1),
+            "samples": self.samples,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "age": round(time.monotonic() - self.created_at, 1),
+        }
+
+
+class _DomainBaseline:
+    """Moyennes (EWMA, tous circuits confondus) du TTFB et du débit d'un domaine."""
+
+    __slots__ = ("ttfb", "throughput")
+
+    def __init__(self) -> None:
+        self.ttfb: Optional[float] = None
+        self.throughput: Optional[float] = None
+
+
+class MeasuredSession:
+    """Session du circuit réservé : ses GET alimentent les mesures du pool."""
+
+    def __init__(self, pool: "CircuitPool", circuit: Circuit, deadline: Optional[Deadline] = None) -> None:
+        self.pool = pool
+        self.circuit = circuit
+        self.deadline = deadline
+
+    def get(self, url: str, timeout: float) -> requests.Response:
+        return self.pool.measured_get(self.circuit, url, timeout, self.deadline)
+
+
+class CircuitPool:
+    """Répartit les récupérations Tor sur les circuits les plus rapides (thread-safe)."""
+
+    def __init__(
+        self,
+        session_factory: SessionFactory,
+        size: int = CIRCUIT_POOL_SIZE,
+        retire_factor: float = CIRCUIT_RETIRE_FACTOR,
+        max_failures: int = CIRCUIT_MAX_FAILURES,
+    ) -> None:
+        """
+        Args:
+            session_factory: Crée une session Tor isolée à partir d'un identifiant d'isolation
+                (et de l'échéance de l'appelant)
+            size: Nombre d'emplacements d'isolation (circuits utilisés simultanément)
+            retire_factor: Coût relatif au-delà duquel un circuit mesuré est retiré
+            max_failures: Échecs consécutifs (erreur réseau, 403, 5xx) avant retrait
+        """
+        self.session_factory = session_factory
+        self.retire_factor = retire_factor
+        self.max_failures = max_failures
+        self._generations = itertools.count(1)
+        self._circuits: List[Circuit] = [self._new_circuit(index) for index in range(max(1, size))]
+        self._baselines: Dict[str, _DomainBaseline] = {}
+        self._lock = threading.Lock()
+        self.retirements = 0
+
+    def _new_circuit(self, index: int) -> Circuit:
+        return Circuit(index, f"circuit-{index}-{next(self._generations)}", self.session_factory)
+
+    def _choose(self) -> Circuit:
+        """Circuit le mieux noté, pénalisé par ses requêtes en cours (appelé sous verrou)."""
+        if random.random() < CIRCUIT_EXPLORE:
+            # Exploration : les circuits délaissés gardent des mesures à jour
+            return random.choice(self._circuits)
+        return min(self._circuits, key=lambda circuit: circuit.score() * (1 + circuit.in_flight))
+
+    @contextmanager
+    def session(self, deadline: Optional[Deadline] = None) -> Iterator["MeasuredSession"]:
+        """Réserve le meilleur circuit le temps d'une récupération (échéance de l'appelant)."""
+        with self._lock:
+            circuit = self._choose()
+            circuit.in_flight += 1
+        try:
+            yield MeasuredSession(self, circuit, deadline)
+        finally:
+            with self._lock:
+                circuit.in_flight -= 1
+                retired = circuit.in_flight == 0 and self._circuits[circuit.index] is not circuit
+            if retired:
+                circuit.close()
+
+    def measured_get(
+        self, circuit: Circuit, url: str, timeout: float, deadline: Optional[Deadline] = None
+    ) -> requests.Response:
+        """GET sur `circuit` ; une erreur réseau, un 403 ou un 5xx compte comme un échec."""
+        session = circuit.open_session(deadline)
+        started = time.monotonic()
+        try:
+            response = session.get(url, timeout=timeout)
+        except requests.RequestException:
+            self.record_failure(circuit, "error")
+            raise
+        if response.status_code == 403 or response.status_code >= 500:
+            self.record_failure(circuit, "blocked" if response.status_code == 403 else "error")
+        else:
+            total = time.monotonic() - started
+            ttfb = min(response.elapsed.total_seconds(), total)
+            self.record(circuit, url, ttfb, len(response.content) / max(total - ttfb, MIN_BODY_SECONDS))
+        return response
+
+    def record(self, circuit: Circuit, url: str, ttfb: float, throughput: float) -> None:
+        """Enregistre une récupération réussie et retire le circuit s'il est trop lent."""
+        domain = urlparse(url).netloc
+        with self._lock:
+            if circuit not in self._circuits:
+                return  # retiré entre-temps
+            baseline = self._baselines.setdefault(domain, _DomainBaseline())
+            baseline.ttfb = _ewma(baseline.ttfb, ttfb)
+            baseline.throughput = _ewma(baseline.throughput, throughput)
+            circuit.ttfb = _ewma(circuit.ttfb, ttfb)
+            circuit.throughput = _ewma(circuit.throughput, throughput)
+            circuit.relative_ttfb = _ewma(circuit.relative_ttfb, ttfb / max(baseline.ttfb, 1e-3))
+            circuit.relative_throughput = _ewma(
+                circuit.relative_throughput, throughput / max(baseline.throughput, 1.0)
+            )
+            circuit.samples += 1
+            circuit.failures = 0
+            if circuit.samples >= CIRCUIT_MIN_SAMPLES and circuit.score() > self.retire_factor:
+                self._retire(circuit, "slow")
+
+    def record_failure(self, circuit: Circuit, reason: str) -> None:
+        """Enregistre un échec ; le circuit est retiré après `max_failures` échecs consécutifs."""
+        with self._lock:
+            if circuit not in self._circuits:
+                return
+            circuit.failures += 1
+            if circuit.failures >= self.max_failures:
+                self._retire(circuit, reason)
+
+    def _retire(self, circuit: Circuit, reason: str) -> None:
+        """Remplace un circuit par un nouvel emplacement d'isolation (appelé sous verrou)."""
+        self._circuits[circuit.index] = self._new_circuit(circuit.index)
+        self.retirements += 1
+        TOR_CIRCUIT_RETIREMENTS_TOTAL.inc(reason)
+        logger.info(
+            "♻️  Circuit Tor %s retiré (%s, coût %.2f, TTFB %s) - nouveau circuit",
+            circuit.isolation, reason, circuit.score(),
+            "n/a" if circuit.ttfb is None else f"{circuit.ttfb:.2f}s",
+        )
+        # Les requêtes en cours sur l'ancienne session se terminent normalement
+        # (la session est fermée à la libération du dernier emplacement)
+        if circuit.in_flight == 0:
+            circuit.close()
+
+    def reset(self) -> None:
+        """
+        Oublie toutes les mesures (après un renouvellement d'identité, les circuits changent)
+        et ferme les sessions inactives, dont les connexions restent sur les anciens circuits.
+        """
+        with self._lock:
+            for circuit in self._circuits:
+                circuit.ttfb = circuit.throughput = None
+                circuit.relative_ttfb = circuit.relative_throughput = None
+                circuit.samples = circuit.failures = 0
+                if circuit.in_flight == 0:
+                    circuit.close()
+
+    def snapshot(self) -> Dict:
+        """État des circuits (exposé par /api/health et /metrics)."""
+        with self._lock:
+            return {
+                "circuits": {str(circuit.index): circuit.snapshot() for circuit in self._circuits},
+                "retirements": self.retirements,
+            }
+
+
+_shared_pool: Optional[CircuitPool] = None
+_shared_lock = threading.Lock()
+
+
+def get_circuit_pool() -> CircuitPool:
+    """Retourne le pool de circuits partagé par tous les scrapers."""
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            # Import local : scrapers importe ce module
+            from scrapers import TorSession
+
+            # Au moins un circuit par démon de la flotte pour que tous servent
+            _shared_pool = CircuitPool(TorSession.create_session, size=max(CIRCUIT_POOL_SIZE, TOR_FLEET_SIZE))
+        return _shared_pool
+
+
+def circuits_snapshot() -> Dict:
+    """État des circuits, sans créer le pool s'il n'a pas encore servi."""
+    with _shared_lock:
+        pool = _shared_pool
+    return pool.snapshot() if pool is not None else {"circuits": {}, "retirements": 0}
@@ -0,0 +1,162 @@
+"""
+Limitation adaptative de la concurrence par pharmacie (AIMD).
+La limite de requêtes simultanées d'un site augmente de façon additive tant que
+les réponses aboutissent et diminue de façon multiplicative sur un 403, un
+timeout ou une page captcha, afin que chaque site tourne près de sa tolérance réelle.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator, Optional
+
+import requests
+
+from config import (
+    AIMD_DECREASE,
+    AIMD_DECREASE_INTERVAL,
+    AIMD_INCREASE,
+    AIMD_INITIAL_LIMIT,
+    AIMD_MAX_LIMIT,
+    AIMD_MIN_LIMIT,
+    AIMD_SITE_LIMITS,
+    AIMD_WINDOW,
+)
+from deadline import Deadline, DeadlineExceeded
+from metrics import SITE_REQUESTS_TOTAL
+
+SUCCESS = "success"
+BLOCKED = "blocked"
+TIMEOUT = "timeout"
+ERROR = "error"
+# Budget de l'appelant épuisé ou annulé (mode fastest) : rien à reprocher au site
+CANCELLED = "cancelled"
+
+
+class Slot:
+    """Emplacement de concurrence acquis ; `outcome` est lu à la libération."""
+
+    __slots__ = ("outcome",)
+
+    def __init__(self) -> None:
+        self.outcome = SUCCESS
+
+
+class AIMDLimiter:
+    """Limiteur de concurrence AIMD d'un site (thread-safe)."""
+
+    def __init__(
+        self,
+        site: str,
+        initial: float = AIMD_INITIAL_LIMIT,
+        minimum: float = AIMD_MIN_LIMIT,
+        maximum: float = AIMD_MAX_LIMIT,
+    ) -> None:
+        self.site = site
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.in_flight = 0
+        self._outcomes: Deque[str] = deque(maxlen=AIMD_WINDOW)
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> None:
+        """Attend qu'un emplacement se libère (dans la limite de l'échéance)."""
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = deadline.remaining() if deadline else None
+                if remaining is not None and remaining <= 0:
+                    raise DeadlineExceeded(f"Budget de temps épuisé en attente d'un créneau {self.site}")
+                self._condition.wait(timeout=remaining)
+            self.in_flight += 1
+
+    def release(self, outcome: str) -> None:
+        """Libère un emplacement et ajuste la limite selon le résultat."""
+        with self._condition:
+            # La limite n'augmente que si elle est réellement atteinte
+            saturated = self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if outcome != CANCELLED:
+                self._outcomes.append(outcome)
+            if outcome == SUCCESS and saturated:
+                # Croissance additive : +AIMD_INCREASE par "fenêtre" complète de succès
+                self.limit = min(self.maximum, self.limit + AIMD_INCREASE / self.limit)
+            elif outcome in (BLOCKED, TIMEOUT):
+                # Décroissance multiplicative, une seule fois par intervalle
+                # (les requêtes déjà en vol échouent souvent ensemble)
+                now = time.monotonic()
+                if now - self._last_decrease >= AIMD_DECREASE_INTERVAL:
+                    self._last_decrease = now
+                    self.limit = max(self.minimum, self.limit * AIMD_DECREASE)
+            self._condition.notify_all()
+        SITE_REQUESTS_TOTAL.inc(self.site, outcome)
+
+    @contextmanager
+    def slot(self, deadline: Optional[Deadline] = None) -> Iterator[Slot]:
+        """
+        Contexte d'une requête : acquiert un emplacement puis le libère.
+
+        Le résultat est pris dans `slot.outcome` (succès par défaut) ; un timeout de
+        transport compte comme TIMEOUT, toute autre exception comme ERROR. L'épuisement
+        ou l'annulation de l'échéance de l'appelant (DeadlineExceeded, ou timeout raccourci
+        par une échéance désormais expirée) est neutre : la limite du site n'en dépend pas.
+        """
+        self.acquire(deadline)
+        slot = Slot()
+        try:
+            yield slot
+        except DeadlineExceeded:
+            slot.outcome = CANCELLED
+            raise
+        except (requests.Timeout, TimeoutError):
+            slot.outcome = CANCELLED if deadline is not None and deadline.expired() else TIMEOUT
+            raise
+        except Exception:
+            if slot.outcome == SUCCESS:
+                slot.outcome = ERROR
+            raise
+        finally:
+            self.release(slot.outcome)
+
+    def snapshot(self) -> Dict:
+        """Limite courante, requêtes en vol et taux de blocage sur la fenêtre récente."""
+        with self._condition:
+            total = len(self._outcomes)
+            blocked = sum(1 for outcome in self._outcomes if outcome == BLOCKED)
+            timeouts = sum(1 for outcome in self._outcomes if outcome == TIMEOUT)
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "samples": total,
+                "block_rate": round(blocked / total, 3) if total else 0.0,
+                "timeout_rate": round(timeouts / total, 3) if total else 0.0,
+            }
+
+
+_limiters: Dict[str, AIMDLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_site_limiter(site: str) -> AIMDLimiter:
+    """Retourne le limiteur partagé d'un site (créé à la demande)."""
+    with _limiters_lock:
+        if site not in _limiters:
+            overrides = AIMD_SITE_LIMITS.get(site, {})
+            _limiters[site] = AIMDLimiter(
+                site,
+                initial=overrides.get("initial", AIMD_INITIAL_LIMIT),
+                minimum=overrides.get("min", AIMD_MIN_LIMIT),
+                maximum=overrides.get("max", AIMD_MAX_LIMIT),
+            )
+        return _limiters[site]
+
+
+def limiters_snapshot() -> Dict[str, Dict]:
+    """État de tous les limiteurs, par site."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {site: limiter.snapshot() for site, limiter in sorted(limiters.items())}
@@ -3,17 +3,121 @@ Configuration globale du scraper multi-pharmacies.
 Regroupe les constantes utilisées par les modules de recherche et d'extraction.
 """
 
+import os
+
 TOR_PROXY = "socks5h://127.0.0.1:9050"
 TOR_CONTROL_HOST = "127.0.0.1"
 TOR_CONTROL_PORT = 9051
 TOR_CONTROL_PASSWORD = ""  # Laisser vide si l'authentification cookie est désactivée
 TOR_RENEW_DELAY = 3  # secondes
 
+# Flotte de démons Tor locaux (tor_fleet.py) : TOR_FLEET_SIZE processus `tor` lancés et
+# supervisés par le service, chacun avec son DataDirectory, son SocksPort et son
+# ControlPort (0 = démon système TOR_PROXY / TOR_CONTROL_PORT)
+TOR_FLEET_SIZE = int(os.getenv("TOR_FLEET_SIZE", "0"))
+TOR_FLEET_BINARY = os.getenv("TOR_FLEET_BINARY", "tor")
+TOR_FLEET_DIR = os.getenv("TOR_FLEET_DIR", "tor_fleet")
+TOR_FLEET_SOCKS_PORT_BASE = int(os.getenv("TOR_FLEET_SOCKS_PORT_BASE", "19050"))  # Démon i : base + i
+TOR_FLEET_CONTROL_PORT_BASE = int(os.getenv("TOR_FLEET_CONTROL_PORT_BASE", "19150"))
+TOR_FLEET_BOOTSTRAP_TIMEOUT = 120  # Démarrage complet maximal d'un démon (secondes)
+TOR_FLEET_CHECK_INTERVAL = 5  # Période de supervision (secondes), base du délai de relance
+
+# Transport des extractions : "adaptive" (direct d'abord, Tor après un blocage),
+# "direct" (jamais Tor) ou "tor" (toujours Tor)
+TRANSPORT_MODE = os.getenv("TRANSPORT_MODE", "adaptive")
+TRANSPORT_TOR_COOLDOWN = 900  # Durée (secondes) en Tor après un blocage avant de retenter en direct
+TRANSPORT_DIRECT_PROXY = ""  # Proxy HTTP(S) simple optionnel pour le mode direct (ex: "http://proxy:3128")
+
+# Concurrence adaptative par site (AIMD) : +AIMD_INCREASE par fenêtre de succès,
+# x AIMD_DECREASE sur 403 / timeout / captcha
+AIMD_INITIAL_LIMIT = 2
+AIMD_MIN_LIMIT = 1
+AIMD_MAX_LIMIT = 8
+AIMD_INCREASE = 1.0
+AIMD_DECREASE = 0.5
+AIMD_DECREASE_INTERVAL = 5  # secondes minimum entre deux réductions
+AIMD_WINDOW = 100  # Nombre de réponses prises en compte pour le taux de blocage
+AIMD_SITE_LIMITS = {
+    # Pharma-GDD bloque après plusieurs requêtes rapides (voir TODO.md)
+    "pharmagdd": {"initial": 1, "max": 4},
+}
+
+# Requêtes Tor couvertes (hedging) : duplication sur un circuit isolé si la réponse tarde
+HEDGE_ENABLED = False
+HEDGE_PERCENTILE = 0.9  # Seuil de duplication = ce percentile des latences récentes
+HEDGE_DEFAULT_DELAY = 8  # Seuil (secondes) tant que l'historique est insuffisant
+HEDGE_MIN_SAMPLES = 10  # Nombre de mesures avant d'utiliser le percentile
+HEDGE_WINDOW = 200  # Taille de la fenêtre glissante des latences (par domaine)
+HEDGE_MAX_PER_FETCH = 1  # Requêtes dupliquées maximum par récupération
+HEDGE_MAX_INFLIGHT = 4  # Requêtes dupliquées simultanées maximum (tous scrapers)
+
+# Sélection des circuits Tor par latence (circuits.py) : les récupérations Tor sont
+# réparties sur CIRCUIT_POOL_SIZE circuits isolés notés par TTFB et débit (0 = désactivé)
+CIRCUIT_POOL_SIZE = int(os.getenv("CIRCUIT_POOL_SIZE", "4"))
+CIRCUIT_EWMA_ALPHA = 0.3  # Poids de la dernière mesure dans les moyennes mobiles
+CIRCUIT_MIN_SAMPLES = 3  # Mesures avant qu'un circuit puisse être retiré pour lenteur
+CIRCUIT_RETIRE_FACTOR = 2.0  # Retrait si le coût relatif dépasse ce facteur (1 = moyenne)
+CIRCUIT_MAX_FAILURES = 2  # Échecs consécutifs (erreur réseau, 403, 5xx) avant retrait
+CIRCUIT_EXPLORE = 0.05  # Part des récupérations envoyées à un circuit au hasard
+
 REQUEST_TIMEOUT = 30  # Timeout par défaut pour les requêtes HTTP
 SEARCH_TIMEOUT = 15  # Timeout spécifique aux recherches rapides
 MAX_RETRIES = 5  # Nombre de tentatives d'extraction
 RETRY_DELAY = 5  # Délai entre les tentatives (en secondes)
 
+# Budgets de temps (secondes, 0 = illimité)
+EAN_TIME_BUDGET = 120  # Budget total par EAN (recherche + extraction + remplacement)
+JOB_TIME_BUDGET = 0  # Budget total par job (lot d'EAN)
+
+# API backend Pharmazon (Magento)
+PHARMAZON_TIMEOUT = 10  # Timeout des requêtes (secondes)
+PHARMAZON_BATCH_SIZE = 100  # Nombre d'EAN par requête (filtre "in") et taille de page
+PHARMAZON_POOL_SIZE = 4  # Connexions keep-alive conservées par la session
+# Projection Magento : seuls les champs utilisés sont demandés
+PHARMAZON_FIELDS = "items[id,sku,name,status,custom_attributes[attribute_code,value]],total_count"
+
+# Cache des vérifications backend, partagé entre les jobs
+BACKEND_CACHE_TTL = 900  # Durée de vie (secondes) d'un produit trouvé
+BACKEND_CACHE_NEGATIVE_TTL = 300  # Durée de vie (secondes) d'un produit absent
+BACKEND_CACHE_MAX_ENTRIES = 50000
+
+# Envoi des webhooks (file asynchrone, retry exponentiel, spool disque des échecs)
+WEBHOOK_ASYNC = True
+WEBHOOK_WORKERS = 4  # Threads d'envoi
+WEBHOOK_QUEUE_SIZE = 1000  # Taille maximale de la file en mémoire
+WEBHOOK_ENQUEUE_TIMEOUT = 5  # Attente (secondes) si la file est pleine avant écriture dans le spool
+WEBHOOK_TIMEOUT = 10  # Timeout d'un envoi (secondes)
+WEBHOOK_MAX_ATTEMPTS = 5
+WEBHOOK_RETRY_BASE_DELAY = 2  # Délai initial (secondes), doublé à chaque essai
+WEBHOOK_RETRY_MAX_DELAY = 60
+WEBHOOK_SPOOL_DIR = "webhook_spool"  # Envois en échec, rejouables (python3 webhook_queue.py --replay)
+
+# Mode lot des webhooks produits (optionnel) : plusieurs produits par requête
+WEBHOOK_BATCH_ENABLED = False
+WEBHOOK_BATCH_MAX_ITEMS = 50  # Produits maximum par lot
+WEBHOOK_BATCH_MAX_BYTES = 512 * 1024  # Taille maximale (JSON non compressé) d'un lot
+WEBHOOK_BATCH_WINDOW = 10  # Délai maximal (secondes) avant l'envoi d'un lot incomplet
+WEBHOOK_GZIP = True  # Corps des lots compressés (Content-Encoding: gzip)
+
+# Webhooks différentiels : "full" (envoi complet), "changed" (envoi complet seulement
+# si le produit a changé) ou "diff" (seuls les champs modifiés sont envoyés)
+WEBHOOK_DELTA_MODE = "full"
+WEBHOOK_DELTA_STATE_FILE = "webhook_delta_state.json"  # Empreintes persistées ("" = mémoire uniquement)
+WEBHOOK_DELTA_IGNORED_FIELDS = frozenset({"timings"})  # Champs volatils exclus de la comparaison
+
+# Statistiques de succès par site et préfixe d'EAN (sites.py) : un site qui ne trouve
+# presque jamais les EAN d'un préfixe (marque) est ignoré pour ce préfixe, sauf exploration
+SITE_STATS_FILE = os.getenv("SITE_STATS_FILE", "site_stats.json")  # "" = mémoire uniquement
+SITE_STATS_PREFIX_LENGTHS = (3, 7)  # Préfixe pays GS1, puis préfixe entreprise (marque)
+SITE_STATS_PRIOR_WEIGHT = 2  # Poids du taux du niveau supérieur dans l'estimation d'un préfixe
+SITE_STATS_MAX_TRIALS = 500  # Au-delà, les compteurs d'un préfixe sont divisés par deux
+SITE_SKIP_THRESHOLD = float(os.getenv("SITE_SKIP_THRESHOLD", "0.05"))  # Taux estimé sous lequel le site est ignoré (0 = jamais)
+SITE_SKIP_MIN_TRIALS = 20  # Recherches observées sur le préfixe avant d'ignorer un site
+SITE_EXPLORE_RATE = 0.1  # Part des recherches ignorables effectuées quand même
+
+# Mode « premier trouvé » : ordre de préférence des sites (départage des arrivées simultanées)
+FASTEST_HIT_SITE_ORDER = ["cocooncenter", "pharmagdd", "drakkars"]
+
 DEFAULT_USER_AGENT = (
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
     "(KHTML, like Gecko) Chrome/120.0 Safari/537.36"
@@ -30,5 +134,32 @@ IOS_USER_AGENT = (
     "Mobile/15E148 Safari/604.1"
 )
 
+# URLs de base des sites (surchargeables par variable d'environnement, par exemple pour
+# viser le serveur simulé benchmarks/mock_pharmacy.py lors des tests de charge)
+COCOONCENTER_BASE_URL = os.getenv("COCOONCENTER_BASE_URL", "https://www.cocooncenter.com")
+PHARMAGDD_BASE_URL = os.getenv("PHARMAGDD_BASE_URL", "https://www.pharma-gdd.com")
+DRAKKARS_BASE_URL = os.getenv("DRAKKARS_BASE_URL", "https://www.pharmaciedesdrakkars.com")
+DRAKKARS_USE_TOR = os.getenv("DRAKKARS_USE_TOR", "1") != "0"  # Navigateur de recherche Drakkars via Tor
+
+# Cassette HTTP (cassette.py) : "off", "record" (enregistre tous les échanges) ou
+# "replay" (rejoue l'archive sans réseau)
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off")
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", "cassettes/run.jsonl.gz")
+CASSETTE_REPLAY_SPEED = float(os.getenv("CASSETTE_REPLAY_SPEED", "1"))  # 1 = vitesse enregistrée, 0 = sans attente
+
+# Journalisation (logs.py) : niveau, format "text" (console) ou "json" (une ligne JSON
+# par événement, avec identifiants job / EAN / site), fichier optionnel (vide = stdout)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+LOG_FILE = os.getenv("LOG_FILE", "")
+LOG_VERBOSE = os.getenv("LOG_VERBOSE", "0") == "1"  # Mode verbose : détail de chaque étape (DEBUG)
+
+# Profilage à la demande (profiling.py) : "cprofile" (déterministe) ou "sample" (échantillonnage
+# des piles), avec instantanés mémoire tracemalloc optionnels ; un répertoire par job
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_SAMPLE_INTERVAL = 0.005  # Période d'échantillonnage (secondes)
+PROFILE_TOP = 40  # Fonctions listées dans le résumé texte
+PROFILE_MEMORY_TOP = 25  # Lignes de code les plus allocatrices listées
+
 TOR_CHECK_URL = "https://check.torproject.org"
 IP_CHECK_URL = "https://ipinfo.io/ip"
@@ -0,0 +1,98 @@
+"""
+Budgets de temps (deadlines) propagés à travers le pipeline de scraping.
+Un budget global par job et un budget par EAN sont transmis aux recherches,
+aux extractions, aux renouvellements Tor et aux webhooks : chaque étape réduit
+ses timeouts au temps restant au lieu d'utiliser les valeurs par défaut.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import List, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """Levée lorsqu'une étape démarre alors que le budget de temps est épuisé."""
+
+
+class Deadline:
+    """Échéance monotone, éventuellement rattachée à une échéance parente."""
+
+    def __init__(
+        self,
+        budget: Optional[float] = None,
+        parent: Optional["Deadline"] = None,
+        label: str = "",
+    ) -> None:
+        """
+        Args:
+            budget: Budget en secondes (None ou 0 = illimité)
+            parent: Échéance englobante (ex: celle du job pour un EAN)
+            label: Nom affiché dans les messages (ex: "EAN 3401548610299")
+        """
+        self.expires_at = time.monotonic() + budget if budget else None
+        self.parent = parent
+        self.label = label
+        self.timeouts: List[str] = []
+        self.cancelled = False
+
+    def child(self, budget: Optional[float] = None, label: str = "") -> "Deadline":
+        """Crée une échéance fille qui ne peut pas dépasser celle-ci."""
+        return Deadline(budget, parent=self, label=label)
+
+    def cancel(self) -> None:
+        """Annule l'échéance : elle (et ses filles) sont considérées comme expirées."""
+        self.cancelled = True
+
+    def remaining(self) -> Optional[float]:
+        """Temps restant en secondes (None si aucune limite)."""
+        if self.cancelled:
+            return 0.0
+        remaining = None
+        if self.expires_at is not None:
+            remaining = max(0.0, self.expires_at - time.monotonic())
+        if self.parent is not None:
+            parent_remaining = self.parent.remaining()
+            if parent_remaining is not None:
+                remaining = parent_remaining if remaining is None else min(remaining, parent_remaining)
+        return remaining
+
+    def expired(self) -> bool:
+        """Indique si le budget est épuisé."""
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self, step: str = "") -> None:
+        """Lève DeadlineExceeded si le budget est épuisé."""
+        if self.expired():
+            self.mark_timeout(step)
+            raise DeadlineExceeded(
+                f"Budget de temps épuisé{' (' + self.label + ')' if self.label else ''}"
+                f"{' avant: ' + step if step else ''}"
+            )
+
+    def timeout(self, default: float, step: str = "") -> float:
+        """Retourne le timeout à utiliser pour une étape, borné par le temps restant."""
+        self.check(step)
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        return min(default, remaining)
+
+    def sleep(self, seconds: float) -> None:
+        """Attend `seconds` sans dépasser l'échéance."""
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def mark_timeout(self, step: str) -> None:
+        """Enregistre une étape interrompue faute de temps."""
+        if step and step not in self.timeouts:
+            self.timeouts.append(step)
+
+    @property
+    def timed_out(self) -> bool:
+        """True si au moins une étape a été interrompue par l'échéance."""
+        return bool(self.timeouts)
@@ -0,0 +1,199 @@
+"""
+Requêtes Tor « couvertes » (hedged requests) pour réduire la latence de queue.
+Si une récupération n'a pas répondu après un seuil calculé sur les latences
+récentes (percentile), une requête dupliquée part sur un autre circuit Tor isolé.
+La première réponse exploitable l'emporte, l'autre est abandonnée.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, List, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from config import (
+    HEDGE_DEFAULT_DELAY,
+    HEDGE_MAX_INFLIGHT,
+    HEDGE_MAX_PER_FETCH,
+    HEDGE_MIN_SAMPLES,
+    HEDGE_PERCENTILE,
+    HEDGE_WINDOW,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyTracker:
+    """Fenêtre glissante des latences observées (thread-safe)."""
+
+    def __init__(self, window: int = HEDGE_WINDOW) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """Retourne le percentile demandé (None tant que l'échantillon est trop petit)."""
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class HedgedFetcher:
+    """Exécute des GET avec duplication sur un circuit isolé au-delà d'un seuil de latence."""
+
+    def __init__(
+        self,
+        max_hedges: int = HEDGE_MAX_PER_FETCH,
+        max_inflight: int = HEDGE_MAX_INFLIGHT,
+    ) -> None:
+        """
+        Args:
+            max_hedges: Nombre maximal de requêtes dupliquées par récupération
+            max_inflight: Nombre maximal de requêtes dupliquées simultanées (tous threads)
+        """
+        self.max_hedges = max_hedges
+        self._inflight = threading.BoundedSemaphore(max_inflight)
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(4, (max_hedges + 1) * max_inflight * 2),
+            thread_name_prefix="hedge",
+        )
+        self._trackers: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+        self._isolation_ids = itertools.count(1)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def _tracker(self, url: str) -> LatencyTracker:
+        domain = urlparse(url).netloc
+        with self._lock:
+            if domain not in self._trackers:
+                self._trackers[domain] = LatencyTracker()
+            return self._trackers[domain]
+
+    def threshold(self, url: str) -> float:
+        """Seuil (secondes) au-delà duquel une requête dupliquée est envoyée."""
+        value = self._tracker(url).percentile(HEDGE_PERCENTILE)
+        return HEDGE_DEFAULT_DELAY if value is None else value
+
+    @staticmethod
+    def _timed_get(
+        tracker: LatencyTracker, session: requests.Session, url: str, timeout: float
+    ) -> requests.Response:
+        """GET dont la latence alimente le tracker (y compris pour les requêtes perdantes)."""
+        started = time.monotonic()
+        response = session.get(url, timeout=timeout)
+        if response.status_code < 400:
+            tracker.record(time.monotonic() - started)
+        return response
+
+    @staticmethod
+    def _usable(future: Future) -> bool:
+        """Une réponse est exploitable si elle n'a pas échoué et n'est pas un 403/5xx."""
+        if future.exception() is not None:
+            return False
+        status = future.result().status_code
+        return status != 403 and status < 500
+
+    def fetch(
+        self,
+        session: requests.Session,
+        url: str,
+        timeout: float,
+        hedge_session_factory: Callable[[str], requests.Session],
+    ) -> requests.Response:
+        """
+        Effectue un GET couvert.
+
+        Args:
+            session: Session principale (circuit courant)
+            url: URL à récupérer
+            timeout: Timeout total de la récupération
+            hedge_session_factory: Crée une session sur un circuit isolé à partir
+                d'un identifiant d'isolation
+
+        Returns:
+            La première réponse exploitable (ou la dernière reçue si aucune ne l'est)
+        """
+        tracker = self._tracker(url)
+        started = time.monotonic()
+        delay = min(self.threshold(url), timeout)
+
+        pending: List[Future] = [self._executor.submit(self._timed_get, tracker, session, url, timeout)]
+        hedge_sessions: Dict[Future, requests.Session] = {}
+        finished: List[Future] = []
+        hedges = 0
+
+        try:
+            while pending:
+                elapsed = time.monotonic() - started
+                can_hedge = hedges < self.max_hedges and elapsed < timeout
+                wait_for = max(0.0, delay - elapsed) if can_hedge else max(0.0, timeout - elapsed)
+                done, _ = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    pending.remove(future)
+                    finished.append(future)
+                    if self._usable(future):
+                        if future in hedge_sessions:
+                            self.hedges_won += 1
+                        return future.result()
+
+                if done:
+                    continue
+
+                elapsed = time.monotonic() - started
+                if can_hedge and self._inflight.acquire(blocking=False):
+                    hedges += 1
+                    self.hedges_sent += 1
+                    isolation = f"hedge-{next(self._isolation_ids)}"
+                    hedge_session = hedge_session_factory(isolation)
+                    future = self._executor.submit(
+                        self._timed_get, tracker, hedge_session, url, max(0.1, timeout - elapsed)
+                    )
+                    future.add_done_callback(lambda _f: self._inflight.release())
+                    hedge_sessions[future] = hedge_session
+                    pending.append(future)
+                    logger.info("⏩ Requête dupliquée sur un circuit isolé (%s) après %.1fs", isolation, elapsed)
+                elif not can_hedge:
+                    if elapsed >= timeout:
+                        break
+                else:
+                    # Plafond global atteint : on attend la réponse principale
+                    hedges = self.max_hedges
+        finally:
+            # Abandon des requêtes perdantes : fermeture de leurs sessions isolées
+            for future in pending:
+                future.cancel()
+            for hedge_session in hedge_sessions.values():
+                hedge_session.close()
+
+        if finished:
+            # Aucune réponse exploitable : on renvoie la dernière reçue (ou son erreur)
+            return finished[-1].result()
+        raise requests.Timeout(f"Aucune réponse de {url} en {timeout:.1f}s")
+
+
+_shared_fetcher: Optional[HedgedFetcher] = None
+_shared_lock = threading.Lock()
+
+
+def get_hedged_fetcher() -> HedgedFetcher:
+    """Retourne l'instance partagée (les latences sont mutualisées entre scrapers)."""
+    global _shared_fetcher
+    with _shared_lock:
+        if _shared_fetcher is None:
+            _shared_fetcher = HedgedFetcher()
+        return _shared_fetcher
@@ -0,0 +1,128 @@
+"""
+Extraction par motifs en un seul passage sur le HTML brut.
+
+Un `FieldScanner` regroupe les motifs d'un site en une seule expression (alternative de
+groupes nommés), compilée une fois à l'import du scraper : la page est parcourue une
+seule fois au lieu d'un `re.search` par champ, et le parcours s'arrête dès que tous les
+champs ont été trouvés. Pour chaque champ, la valeur retenue est la première
+occurrence, comme avec `re.search`.
+
+Contraintes d'écriture des motifs :
+- deux motifs ne doivent pas pouvoir commencer au même endroit de la page
+  (l'alternative ne retient que le premier qui correspond) : des champs qui partagent
+  un préfixe s'écrivent dans un même motif (groupe optionnel ou lookahead) ;
+- le moteur `re` ne saute rapidement jusqu'aux positions candidates que si toutes les
+  alternatives commencent par le même texte littéral (`class="`, `<span `...) ; sinon
+  chaque position est essayée avec chaque motif, ce qui coûte plus cher que des
+  recherches séparées. Un lookbehind placé après le préfixe commun permet de
+  conserver un contexte plus large (`class="x">(?<=<span class="x">)`).
+
+`clean_text()` décode les entités HTML courantes et normalise les espaces.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, FrozenSet, Iterable, Set, Tuple
+
+# Entités et séquences JSON échappées rencontrées dans les pages des sites
+ENTITIES = {
+    "&eacute;": "é",
+    "&egrave;": "è",
+    "&agrave;": "à",
+    "&ugrave;": "ù",
+    "&acirc;": "â",
+    "&ocirc;": "ô",
+    "&icirc;": "î",
+    "&ecirc;": "ê",
+    "&nbsp;": " ",
+    "&#39;": "'",
+    "&rsquo;": "'",
+    "&amp;": "&",
+    "&ccedil;": "ç",
+    "\\u00e9": "é",
+    "\\u00e8": "è",
+    "\\u00e0": "à",
+    "\\u00e7": "ç",
+}
+_ENTITY_RE = re.compile("|".join(map(re.escape, ENTITIES)))
+
+
+def _decode_entity(match: re.Match) -> str:
+    return ENTITIES[match.group()]
+
+
+def clean_text(text: str) -> str:
+    """
+    Décode les entités (un seul passage, `&amp;` décodé une seule fois) et réduit
+    chaque suite d'espaces à un espace, sans espaces en bord de texte.
+    """
+    if "&" in text or "\\" in text:
+        text = _ENTITY_RE.sub(_decode_entity, text)
+    # str.split() et \s reconnaissent les mêmes espaces Unicode (dont l'espace insécable)
+    return " ".join(text.split())
+
+
+class FieldScanner:
+    """Motifs d'un site réunis en une expression parcourue une seule fois."""
+
+    def __init__(self, *patterns: str, flags: int = 0) -> None:
+        """
+        Args:
+            patterns: Motifs dont chaque groupe nommé `(?P<champ>...)` est un champ extrait
+            flags: Options re communes (les options propres à un motif s'écrivent `(?i:...)`)
+        """
+        self.patterns = patterns
+        self.flags = flags
+        # Champs de chaque motif (un motif peut en capturer plusieurs)
+        self.pattern_fields: Tuple[FrozenSet[str], ...] = tuple(
+            frozenset(re.compile(pattern, flags).groupindex) for pattern in patterns
+        )
+        self.fields: FrozenSet[str] = frozenset().union(*self.pattern_fields)
+        if not self.fields:
+            raise ValueError("FieldScanner : aucun groupe nommé dans les motifs")
+        self._regexes: Dict[Tuple[int, ...], re.Pattern] = {}
+        self._regex(tuple(range(len(patterns))))  # Expression complète compilée (et validée) d'emblée
+
+    def _regex(self, active: Tuple[int, ...]) -> re.Pattern:
+        """Expression réunissant les motifs `active` (compilée une fois par combinaison)."""
+        regex = self._regexes.get(active)
+        if regex is None:
+            regex = re.compile("|".join(f"(?:{self.patterns[index]})" for index in active), self.flags)
+            self._regexes[active] = regex
+        return regex
+
+    def _active(self, remaining: Set[str]) -> Tuple[int, ...]:
+        return tuple(
+            index for index, fields in enumerate(self.pattern_fields) if not fields.isdisjoint(remaining)
+        )
+
+    def scan(self, html: str, skip: Iterable[str] = ()) -> Dict[str, str]:
+        """
+        Première occurrence de chaque champ (champs absents de la page omis).
+
+        Seuls les motifs des champs encore cherchés font partie de l'expression : les
+        alternatives sans préfixe commun coûtent un essai par position candidate. Dès
+        qu'un motif n'a plus de champ à trouver, le parcours continue, à partir de la
+        même position, avec l'expression réduite.
+
+        Args:
+            html: Page à parcourir
+            skip: Champs déjà connus (leurs motifs sont ignorés)
+        """
+        found: Dict[str, str] = {}
+        remaining = set(self.fields.difference(skip))
+        active = self._active(remaining)
+        position = 0
+        while active:
+            match = self._regex(active).search(html, position)
+            if match is None:
+                break
+            for name, value in match.groupdict().items():
+                if value is not None and name in remaining:
+                    found[name] = value
+                    remaining.discard(name)
+            # Correspondance vide (groupes optionnels) : avancer d'un caractère
+            position = match.end() if match.end() > match.start() else match.start() + 1
+            active = self._active(remaining)
+        return found
@@ -0,0 +1,135 @@
+"""
+Extraction JSON-LD (schema.org) commune aux scrapers.
+
+Les blocs `<script type="application/ld+json">` sont repérés par simple recherche de
+chaîne (aucune expression régulière sur la page entière), décodés une seule fois, puis
+le nœud Product est réduit à ses champs utiles : nom, description, GTIN, marque, offre
+(prix), note moyenne (AggregateRating) et avis (Review). Contrairement aux motifs
+`"price":"..."` appliqués au HTML brut, le décodage JSON gère les guillemets échappés,
+l'ordre des clés et les objets imbriqués.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, Optional
+
+MARKER = "application/ld+json"
+
+# Identifiants produit, du plus courant au moins courant
+GTIN_KEYS = ("gtin13", "gtin", "gtin14", "gtin12", "gtin8")
+
+# strict=False : retours à la ligne bruts fréquents dans les descriptions ; décodeur
+# unique (json.loads avec options en recrée un à chaque appel)
+_decoder = json.JSONDecoder(strict=False)
+
+
+def iter_blocks(html: str) -> Iterator[str]:
+    """Contenu brut de chaque bloc JSON-LD de la page."""
+    start = html.find(MARKER)
+    while start != -1:
+        content_start = html.find(">", start) + 1
+        content_end = html.find("</script>", content_start)
+        if content_start == 0 or content_end == -1:
+            return
+        yield html[content_start:content_end]
+        start = html.find(MARKER, content_end)
+
+
+def parse_blocks(html: str) -> List[Any]:
+    """Blocs JSON-LD décodés (les blocs invalides sont ignorés)."""
+    blocks = []
+    for content in iter_blocks(html):
+        try:
+            blocks.append(_decoder.decode(content))
+        except ValueError:
+            continue
+    return blocks
+
+
+def _nodes(obj: Any) -> Iterator[Dict[str, Any]]:
+    """Nœuds de premier niveau (listes et @graph dépliés)."""
+    if isinstance(obj, list):
+        for item in obj:
+            yield from _nodes(item)
+    elif isinstance(obj, dict):
+        if "@graph" in obj:
+            yield from _nodes(obj["@graph"])
+        else:
+            yield obj
+
+
+def _is_type(node: Dict[str, Any], type_name: str) -> bool:
+    node_type = node.get("@type")
+    if isinstance(node_type, list):
+        return type_name in node_type
+    return node_type == type_name
+
+
+def _first(value: Any) -> Any:
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _as_list(value: Any) -> List[Any]:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def product_data(html: str) -> Optional[Dict[str, Any]]:
+    """
+    Champs schema.org du premier Product de la page.
+
+    Returns:
+        Valeurs brutes (non nettoyées) parmi name, description, gtin, brand, price,
+        currency, rating, review_count et reviews (nœuds Review) ; None sans Product
+    """
+    nodes = [node for block in parse_blocks(html) for node in _nodes(block)]
+    product = next((node for node in nodes if _is_type(node, "Product")), None)
+    if product is None:
+        return None
+
+    data: Dict[str, Any] = {
+        "name": product.get("name"),
+        "description": product.get("description"),
+        "gtin": next((product[key] for key in GTIN_KEYS if product.get(key)), None),
+    }
+
+    brand = _first(product.get("brand"))
+    data["brand"] = brand.get("name") if isinstance(brand, dict) else brand
+
+    offer = _first(product.get("offers"))
+    if isinstance(offer, dict):
+        # AggregateOffer : prix le plus bas
+        data["price"] = offer.get("price", offer.get("lowPrice"))
+        data["currency"] = offer.get("priceCurrency")
+
+    rating = product.get("aggregateRating")
+    if isinstance(rating, dict):
+        data["rating"] = rating.get("ratingValue")
+        data["review_count"] = rating.get("reviewCount", rating.get("ratingCount"))
+
+    # Avis du produit, puis avis publiés comme nœuds séparés
+    reviews = [review for review in _as_list(product.get("review") or product.get("reviews"))
+               if isinstance(review, dict)]
+    reviews.extend(node for node in nodes if _is_type(node, "Review"))
+    data["reviews"] = reviews
+
+    return {key: value for key, value in data.items() if value not in (None, "", [])}
+
+
+def review_rating(review: Dict[str, Any]) -> Any:
+    """Note d'un avis (reviewRating.ratingValue, ou ratingValue porté par l'avis)."""
+    rating = review.get("reviewRating")
+    if isinstance(rating, dict):
+        return rating.get("ratingValue")
+    return rating if rating is not None else review.get("ratingValue")
+
+
+def review_author(review: Dict[str, Any]) -> Optional[str]:
+    author = _first(review.get("author"))
+    if isinstance(author, dict):
+        return author.get("name")
+    return author
@@ -0,0 +1,148 @@
+"""
+Journalisation structurée du scraper.
+
+Les modules écrivent via `logging.getLogger(__name__)` ; `setup_logging()` (appelé par
+les points d'entrée) installe un QueueHandler non bloquant : le formatage et l'écriture
+se font dans un thread dédié (QueueListener), les threads de scraping ne font que
+déposer l'événement dans la file.
+
+Chaque événement porte les identifiants de corrélation du contexte courant (job, EAN,
+site), définis par `log_context()` et propagés aux pools de threads par `timing.bind`.
+Format "text" pour la console, "json" pour une ligne JSON par événement.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterator, Optional
+
+from config import LOG_FILE, LOG_FORMAT, LOG_LEVEL, LOG_VERBOSE
+
+job_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("job_id", default="")
+ean_var: contextvars.ContextVar[str] = contextvars.ContextVar("ean", default="")
+site_var: contextvars.ContextVar[str] = contextvars.ContextVar("site", default="")
+
+_CONTEXT_VARS = {"job": job_id_var, "ean": ean_var, "site": site_var}
+
+# Attributs standards d'un LogRecord (le reste vient de `extra=` et part dans le JSON)
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "job", "ean", "site"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+
+
+@contextmanager
+def log_context(**fields: Optional[str]) -> Iterator[None]:
+    """Définit les identifiants de corrélation (job, ean, site) le temps du bloc."""
+    tokens = [
+        (_CONTEXT_VARS[name], _CONTEXT_VARS[name].set(value))
+        for name, value in fields.items()
+        if value is not None
+    ]
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copie les identifiants de corrélation du thread émetteur dans l'événement."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for name, var in _CONTEXT_VARS.items():
+            if not hasattr(record, name):
+                setattr(record, name, var.get())
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par événement."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for name in _CONTEXT_VARS:
+            value = getattr(record, name, "")
+            if value:
+                entry[name] = value
+        entry.update({
+            key: value for key, value in vars(record).items()
+            if key not in _RECORD_ATTRS and not key.startswith("_")
+        })
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format console : heure, niveau, [job ean site], message."""
+
+    def __init__(self) -> None:
+        super().__init__("%(asctime)s %(levelname)-7s %(context)s%(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        context = " ".join(filter(None, (getattr(record, name, "") for name in _CONTEXT_VARS)))
+        record.context = f"[{context}] " if context else ""
+        return super().format(record)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui conserve la trace d'exception à part (champ "exc" du JSON)."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging(verbose: Optional[bool] = None, log_format: Optional[str] = None) -> None:
+    """
+    Configure la journalisation du processus (idempotent).
+
+    Args:
+        verbose: Niveau DEBUG (détail de chaque étape) ; LOG_VERBOSE par défaut
+        log_format: "text" ou "json" ; LOG_FORMAT par défaut
+    """
+    global _listener
+    with _setup_lock:
+        verbose = LOG_VERBOSE if verbose is None else verbose
+        level = logging.DEBUG if verbose else getattr(logging, LOG_LEVEL.upper(), logging.INFO)
+        root = logging.getLogger()
+        root.setLevel(level)
+        if _listener is not None:
+            return
+
+        output = logging.FileHandler(LOG_FILE, encoding="utf-8") if LOG_FILE else logging.StreamHandler(sys.stdout)
+        output.setFormatter(JsonFormatter() if (log_format or LOG_FORMAT) == "json" else TextFormatter())
+
+        log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+        handler = _QueueHandler(log_queue)
+        handler.addFilter(ContextFilter())
+        root.handlers = [handler]
+
+        _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        # Bibliothèques bavardes : avertissements seulement, sauf en mode verbose
+        for name in ("urllib3", "selenium", "werkzeug"):
+            logging.getLogger(name).setLevel(logging.DEBUG if verbose else logging.WARNING)
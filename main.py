@@ -6,12 +6,25 @@ Recherche les produits par EAN et orchestre les scrapers spécifiques.
 
 from __future__ import annotations
 
-import json
+import argparse
+import contextlib
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
 
-from searchers import CocooncenterSearcher, DrakkarsSearcher, PharmaGDDSearcher
-from scrapers import CocooncenterScraper, DrakkarsScraper, PharmaGDDScraper
+from config import EAN_TIME_BUDGET, FASTEST_HIT_SITE_ORDER, JOB_TIME_BUDGET
+from deadline import Deadline, DeadlineExceeded
+from logs import log_context, setup_logging
+from metrics import EXTRACT_DURATION, EXTRACT_TOTAL, SEARCH_DURATION, SEARCH_TOTAL
+from models import dumps
+from profiling import MODES as PROFILE_MODES, JobProfiler, memory_probe
+from sites import SiteRegistry, get_hit_rate_stats, site_adapters
+from timing import JobTimings, attach_timings, bind, current_timeline, end_timeline, span, start_timeline
+from tor_fleet import get_tor_fleet
+
+logger = logging.getLogger(__name__)
 
 
 @dataclass
@@ -22,132 +35,293 @@ class SearchResult:
     found: bool
     url: str = ""
     label: str = ""
+    timed_out: bool = False
+    skipped: bool = False  # Non interrogé : taux de succès estimé quasi nul pour ce préfixe
 
 
 class MasterScraper:
     """Orchestrateur principal des recherches et extractions."""
 
-    def __init__(self) -> None:
+    def __init__(self, sites: Optional[List[str]] = None) -> None:
+        """
+        Args:
+            sites: Sites à interroger (tous les sites déclarés dans sites.py par défaut) ;
+                searchers et scrapers ne sont créés qu'à leur première utilisation
+        """
+        adapters = [adapter for key, adapter in site_adapters().items() if sites is None or key in sites]
+        self.site_names = {adapter.key: adapter.name for adapter in adapters}
+
         # Phase de recherche rapide (sans Tor)
-        self.searchers = {
-            "cocooncenter": CocooncenterSearcher(),
-            "pharmagdd": PharmaGDDSearcher(),
-            "drakkars": DrakkarsSearcher(),
-        }
+        self.searchers = SiteRegistry({adapter.key: adapter.searcher for adapter in adapters})
 
         # Phase d'extraction complète (via Tor)
-        self.scrapers = {
-            "cocooncenter": CocooncenterScraper(),
-            "pharmagdd": PharmaGDDScraper(),
-            "drakkars": DrakkarsScraper(),
-        }
+        self.scrapers = SiteRegistry({adapter.key: adapter.scraper for adapter in adapters})
 
-    def search_all_sites(self, ean: str) -> Dict[str, SearchResult]:
-        """Recherche le produit sur l'ensemble des sites supportés."""
-        print(f"\n{'=' * 70}")
-        print(f"🔎 PHASE 1 : RECHERCHE DU PRODUIT - EAN: {ean}")
-        print(f"{'=' * 70}\n")
+        # Taux de succès par site et préfixe d'EAN (sites ignorés ou réordonnés)
+        self.hit_rates = get_hit_rate_stats()
 
-        results: Dict[str, SearchResult] = {}
+    def _search_site(self, site_key: str, ean: str, deadline: Deadline) -> SearchResult:
+        """Recherche le produit sur un site (résultat marqué hors délai si le budget est épuisé)."""
+        site = self.site_names[site_key]
+        logger.debug("🔍 Recherche sur %s", site)
 
-        # Cocooncenter
-        print("🔍 Recherche sur Cocooncenter...")
-        found, url = self.searchers["cocooncenter"].search(ean)
-        results["cocooncenter"] = SearchResult(
-            site="Cocooncenter",
-            found=found,
-            url=url or "",
-        )
-        print(f"   {'✅ Trouvé' if found else '❌ Non trouvé'}\n")
-
-        # Pharma-GDD
-        print("🔍 Recherche sur Pharma-GDD...")
-        found, url, label = self.searchers["pharmagdd"].search(ean)
-        results["pharmagdd"] = SearchResult(
-            site="Pharma-GDD",
-            found=found,
+        if deadline.expired():
+            deadline.mark_timeout(f"recherche {site}")
+            logger.warning("⏱️  Budget de temps épuisé - recherche %s ignorée", site)
+            return SearchResult(site=site, found=False, timed_out=True)
+
+        # Les searchers retournent (found, url) ou (found, url, label)
+        start = time.perf_counter()
+        try:
+            with span("search", site_key):
+                outcome = self.searchers[site_key].search(ean, deadline)
+        except Exception:
+            SEARCH_TOTAL.inc(site_key, "error")
+            raise
+        finally:
+            SEARCH_DURATION.observe(time.perf_counter() - start, site_key)
+        found, url = outcome[0], outcome[1]  # found = None : recherche non concluante
+        label = outcome[2] if len(outcome) > 2 else None
+        result = SearchResult(
+            site=site,
+            found=bool(found),
             url=url or "",
             label=label or "",
+            timed_out=not found and deadline.expired(),
         )
-        print(f"   {'✅ Trouvé: ' + label if found else '❌ Non trouvé'}\n")
-
-        # Pharmacie des Drakkars
-        print("🔍 Recherche sur Pharmacie des Drakkars...")
-        found, url = self.searchers["drakkars"].search(ean)
-        results["drakkars"] = SearchResult(
-            site="Pharmacie des Drakkars",
-            found=found,
-            url=url or "",
-        )
-        print(f"   {'✅ Trouvé' if found else '❌ Non trouvé'}\n")
-
+        if result.timed_out:
+            deadline.mark_timeout(f"recherche {site}")
+        elif found is not None:
+            self.hit_rates.record(site_key, ean, found)
+        SEARCH_TOTAL.inc(site_key, "found" if found else "timeout" if result.timed_out else "not_found")
+
+        if found:
+            logger.info("✅ Trouvé sur %s%s", site, f": {label}" if label else "")
+        else:
+            logger.debug("❌ Non trouvé sur %s", site)
+        return result
+
+    def search_all_sites(
+        self, ean: str, deadline: Optional[Deadline] = None
+    ) -> Dict[str, SearchResult]:
+        """
+        Recherche le produit sur les sites supportés, les plus susceptibles de le
+        référencer d'abord ; les sites au taux de succès quasi nul pour ce préfixe
+        d'EAN sont ignorés (résultat marqué `skipped`).
+        """
+        deadline = deadline or Deadline()
+        logger.debug("🔎 Phase 1 : recherche du produit %s", ean)
+
+        planned, skipped = self.hit_rates.plan(self.searchers, ean)
+        results = {}
+        for site_key in skipped:
+            logger.debug("⏭️  %s ignoré (produits de ce préfixe jamais trouvés)", self.site_names[site_key])
+            results[site_key] = SearchResult(site=self.site_names[site_key], found=False, skipped=True)
+        for site_key in planned:
+            with log_context(site=site_key):
+                results[site_key] = self._search_site(site_key, ean, deadline)
         return results
 
+    def _extract_site(self, site_key: str, url: str, ean: str, deadline: Deadline) -> Optional[Dict]:
+        """Extrait le produit d'un site (durée et résultat comptés dans les métriques)."""
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with memory_probe(f"extract:{site_key}"):
+                product = self.scrapers[site_key].extract(url, ean, deadline)
+            outcome = "success" if product else "empty"
+            if product:
+                attach_timings(product, site_key)
+            return product
+        except DeadlineExceeded:
+            outcome = "timeout"
+            raise
+        except ValueError:  # EAN validation error
+            outcome = "invalid_ean"
+            raise
+        except Exception:
+            if deadline.expired():
+                outcome = "timeout"
+            raise
+        finally:
+            EXTRACT_DURATION.observe(time.perf_counter() - start, site_key)
+            EXTRACT_TOTAL.inc(site_key, outcome)
+
     def extract_products(
-        self, ean: str, search_results: Dict[str, SearchResult]
+        self,
+        ean: str,
+        search_results: Dict[str, SearchResult],
+        deadline: Optional[Deadline] = None,
     ) -> Dict[str, Dict]:
-        """Extrait les informations complètes pour chaque site où le produit est trouvé."""
-        print(f"\n{'=' * 70}")
-        print("📦 PHASE 2 : EXTRACTION DES DONNÉES (via Tor)")
-        print(f"{'=' * 70}\n")
+        """
+        Extrait les informations complètes pour chaque site où le produit est trouvé.
 
+        Si le budget de temps est épuisé, les sites restants sont ignorés et
+        marqués hors délai dans `deadline` ; les produits déjà extraits sont retournés.
+        """
+        deadline = deadline or Deadline()
         found_sites = [key for key, result in search_results.items() if result.found]
 
         if not found_sites:
-            print("❌ Aucun produit trouvé sur les sites\n")
+            logger.info("❌ Aucun produit trouvé sur les sites")
             return {}
 
         found_names = ", ".join(search_results[key].site for key in found_sites)
-        print(f"✅ Produit trouvé sur {len(found_sites)} site(s): {found_names}\n")
+        logger.debug("📦 Phase 2 : extraction depuis %d site(s): %s", len(found_sites), found_names)
 
         products: Dict[str, Dict] = {}
         extraction_count = 0
         extraction_errors = 0
+        extraction_timeouts = 0
 
         for idx, site_key in enumerate(found_sites, 1):
             result = search_results[site_key]
-            print(f"{'─' * 70}")
-            print(f"🏪 [{idx}/{len(found_sites)}] Extraction depuis {result.site}...")
-            print(f"🔗 URL: {result.url}")
-            print(f"{'─' * 70}")
-
-            try:
-                print(f"🚀 Début de l'extraction pour {site_key}...")
-                product_data = self.scrapers[site_key].extract(result.url, ean)
-
-                if product_data:
-                    products[site_key] = product_data
-                    extraction_count += 1
-                    print(f"✅ Extraction réussie pour {result.site}")
-                    print(f"📦 Données extraites: Titre='{product_data.get('titre', 'N/A')}', Prix={product_data.get('prix', 'N/A')}")
-                else:
-                    print(f"⚠️  Extraction a retourné des données vides pour {result.site}")
+            with log_context(site=site_key):
+                if deadline.expired():
+                    extraction_timeouts += 1
+                    deadline.mark_timeout(f"extraction {result.site}")
+                    logger.warning("⏱️  Budget de temps épuisé - extraction %s ignorée", result.site)
+                    continue
+
+                logger.debug("🏪 [%d/%d] Extraction depuis %s: %s", idx, len(found_sites), result.site, result.url)
+                try:
+                    product_data = self._extract_site(site_key, result.url, ean, deadline)
+
+                    if product_data:
+                        products[site_key] = product_data
+                        extraction_count += 1
+                        logger.info("✅ Extraction réussie pour %s (titre=%r, prix=%s)", result.site,
+                                    product_data.get("titre", "N/A"), product_data.get("prix", "N/A"))
+                    else:
+                        logger.warning("⚠️  Extraction a retourné des données vides pour %s", result.site)
+                        extraction_errors += 1
+                except DeadlineExceeded as exc:
+                    extraction_timeouts += 1
+                    deadline.mark_timeout(f"extraction {result.site}")
+                    logger.warning("⏱️  Extraction interrompue (%s): %s", result.site, exc)
+                except ValueError as exc:  # EAN validation error
                     extraction_errors += 1
-
-                print()
-            except ValueError as exc:  # EAN validation error
-                extraction_errors += 1
-                print(f"❌ ERREUR DE VALIDATION: {exc}")
-                print(f"   Site: {result.site}")
-                print(f"   EAN: {ean}\n")
-            except Exception as exc:  # noqa: BLE001
-                extraction_errors += 1
-                print(f"❌ ERREUR LORS DE L'EXTRACTION: {type(exc).__name__}")
-                print(f"   Site: {result.site}")
-                print(f"   Message: {str(exc)}")
-                import traceback
-                print(f"   Traceback:")
-                traceback.print_exc()
-                print()
-
-        print(f"{'=' * 70}")
-        print(f"📊 BILAN EXTRACTION:")
-        print(f"   ✅ Succès: {extraction_count}/{len(found_sites)}")
-        print(f"   ❌ Erreurs: {extraction_errors}/{len(found_sites)}")
-        print(f"{'=' * 70}\n")
+                    logger.error("❌ Erreur de validation (%s, EAN %s): %s", result.site, ean, exc)
+                except Exception as exc:  # noqa: BLE001
+                    if deadline.expired():
+                        extraction_timeouts += 1
+                        deadline.mark_timeout(f"extraction {result.site}")
+                        logger.warning("⏱️  Extraction interrompue (%s, budget épuisé): %s",
+                                       result.site, type(exc).__name__)
+                        continue
+                    extraction_errors += 1
+                    logger.exception("❌ Erreur lors de l'extraction (%s): %s: %s",
+                                     result.site, type(exc).__name__, exc)
+
+        timeline = current_timeline()
+        stages = ""
+        if timeline is not None:
+            stages = " | " + ", ".join(
+                f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in timeline.stage_totals().items()
+            )
+        logger.info("📊 Bilan extraction: ✅ %d/%d, ❌ %d%s%s", extraction_count, len(found_sites),
+                    extraction_errors, f", ⏱️  {extraction_timeouts} hors délai" if extraction_timeouts else "",
+                    stages)
 
         return products
 
+    def _search_and_extract(
+        self, site_key: str, ean: str, deadline: Deadline
+    ) -> Optional[Dict]:
+        """Recherche puis extrait le produit sur un seul site (mode « premier trouvé »)."""
+        with log_context(site=site_key):
+            result = self._search_site(site_key, ean, deadline)
+            if not result.found:
+                return None
+            return self._extract_site(site_key, result.url, ean, deadline)
+
+    @staticmethod
+    def _ean_verified(product: Dict, ean: str) -> bool:
+        """Indique si la page extraite affiche explicitement l'EAN recherché."""
+        return ean in (product.get("ean_verif"), product.get("reference"))
+
+    def scrape_fastest(
+        self,
+        ean: str,
+        deadline: Optional[Deadline] = None,
+        site_order: Optional[List[str]] = None,
+    ) -> Dict[str, Dict]:
+        """
+        Mode « premier trouvé » : interroge tous les sites en parallèle et retourne
+        dès la première extraction dont l'EAN est validé.
+
+        Les travaux encore en cours sur les autres sites sont annulés (leur échéance
+        est annulée, ils s'arrêtent à la prochaine étape). En cas d'arrivées
+        simultanées, l'ordre de préférence `site_order` départage les sites.
+
+        Returns:
+            Un dictionnaire {site_key: produit} contenant au plus un produit
+        """
+        deadline = deadline or Deadline()
+        order = [key for key in (site_order or FASTEST_HIT_SITE_ORDER) if key in self.searchers]
+        order += [key for key in self.searchers if key not in order]
+        _, skipped = self.hit_rates.plan(order, ean)
+        order = [key for key in order if key not in skipped]
+        if not order:
+            logger.info("⏭️  Aucun site susceptible de référencer ce produit")
+            return {}
+
+        logger.debug("⚡ Mode premier trouvé - ordre de préférence: %s%s", ", ".join(order),
+                     f" (ignorés: {', '.join(skipped)})" if skipped else "")
+
+        site_deadlines = {key: deadline.child(label=f"{key} {ean}") for key in order}
+        executor = ThreadPoolExecutor(max_workers=len(order), thread_name_prefix="fastest")
+        futures: Dict[Future, str] = {
+            executor.submit(bind(self._search_and_extract), key, ean, site_deadlines[key]): key
+            for key in order
+        }
+        pending = set(futures)
+        fallback: Optional[Tuple[str, Dict]] = None
+        winner: Optional[Tuple[str, Dict]] = None
+
+        try:
+            while pending and winner is None:
+                done, pending = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+                if not done:
+                    break  # budget épuisé
+
+                # Départage des arrivées simultanées selon l'ordre de préférence
+                for future in sorted(done, key=lambda f: order.index(futures[f])):
+                    site_key = futures[future]
+                    try:
+                        product = future.result()
+                    except ValueError as exc:  # EAN validation error
+                        logger.error("❌ %s: %s", self.site_names[site_key], exc)
+                        continue
+                    except Exception as exc:  # noqa: BLE001
+                        logger.warning("⚠️  %s: %s: %s", self.site_names[site_key], type(exc).__name__, exc)
+                        continue
+                    if not product:
+                        continue
+                    if self._ean_verified(product, ean):
+                        winner = (site_key, product)
+                        break
+                    if fallback is None:
+                        fallback = (site_key, product)
+        finally:
+            # Annulation des sites encore en cours
+            for key, site_deadline in site_deadlines.items():
+                if winner is None or key != winner[0]:
+                    site_deadline.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        selected = winner or fallback
+        if selected is None:
+            if deadline.expired():
+                deadline.mark_timeout("recherche premier trouvé")
+            logger.info("❌ Aucun produit validé sur les sites")
+            return {}
+
+        site_key, product = selected
+        logger.info("⚡ Premier produit validé: %s (titre=%r, prix=%s, %d site(s) annulé(s))",
+                    self.site_names[site_key], product.get("titre", "N/A"), product.get("prix", "N/A"), len(pending))
+        return {site_key: product}
+
     def display_results(self, products: Dict[str, Dict], ean: str) -> None:
         """Affiche les informations extraites et les sauvegarde en JSON."""
         print(f"\n{'=' * 70}")
@@ -197,36 +371,66 @@ class MasterScraper:
             print()
 
         json_file = f"product_{ean}.json"
-        with open(json_file, "w", encoding="utf-8") as handle:
-            json.dump(products, handle, ensure_ascii=False, indent=2)
+        with open(json_file, "wb") as handle:
+            handle.write(dumps(products, indent=True))
 
         print(f"💾 Résultats sauvegardés dans: {json_file}\n")
 
-    def process_ean(self, ean: str) -> None:
-        """Traite un code EAN complet."""
-        search_results = self.search_all_sites(ean)
-        products = self.extract_products(ean, search_results)
+    def process_ean(
+        self, ean: str, deadline: Optional[Deadline] = None, fastest: bool = False
+    ) -> None:
+        """Traite un code EAN complet dans son budget de temps."""
+        if deadline is None:
+            deadline = Deadline(EAN_TIME_BUDGET, label=f"EAN {ean}")
+        with log_context(ean=ean):
+            if fastest:
+                products = self.scrape_fastest(ean, deadline)
+            else:
+                search_results = self.search_all_sites(ean, deadline)
+                products = self.extract_products(ean, search_results, deadline)
+        if deadline.timed_out:
+            logger.warning("⏱️  Résultats partiels pour %s (hors délai: %s)", ean, ", ".join(deadline.timeouts))
         self.display_results(products, ean)
 
-    def process_multiple_eans(self, eans: List[str]) -> None:
+    def process_multiple_eans(self, eans: List[str], fastest: bool = False) -> None:
         """Traite plusieurs codes EAN."""
-        print(f"╔{'═' * 68}╗")
-        print(f"║{'  SCRAPER MULTI-PHARMACIES - Traitement par lot':^68}║")
-        print(f"╚{'═' * 68}╝")
+        logger.info("🚀 Traitement par lot de %d EAN", len(eans))
+        job_deadline = Deadline(JOB_TIME_BUDGET, label="job")
+        job_timings = JobTimings()
 
         for index, ean in enumerate(eans, start=1):
-            print(f"\n\n{'#' * 70}")
-            print(f"# TRAITEMENT {index}/{len(eans)}")
-            print(f"{'#' * 70}")
-            self.process_ean(ean)
+            if job_deadline.expired():
+                logger.warning("⏱️  Budget du job épuisé - %d EAN non traité(s)", len(eans) - index + 1)
+                break
 
-        print(f"\n{'=' * 70}")
-        print(f"✨ TRAITEMENT TERMINÉ - {len(eans)} produit(s) traité(s)")
-        print(f"{'=' * 70}\n")
+            logger.info("🔄 Traitement %d/%d: %s", index, len(eans), ean)
+            start_timeline(ean)
+            try:
+                self.process_ean(ean, job_deadline.child(EAN_TIME_BUDGET, label=f"EAN {ean}"), fastest)
+            finally:
+                job_timings.add(end_timeline())
+
+        logger.info("✨ Traitement terminé - %d produit(s) traité(s)\n⏱️  Temps par étape et par EAN:\n%s",
+                    len(eans), "\n".join(job_timings.format_lines()))
 
 
 def main() -> None:
     """Point d'entrée CLI."""
+    parser = argparse.ArgumentParser(description="Scraper multi-pharmacies - recherche par EAN")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Détail de chaque étape (logs DEBUG)")
+    parser.add_argument("--profile", choices=PROFILE_MODES,
+                        help="Profile le traitement (profil enregistré dans PROFILE_DIR)")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="Avec --profile : allocations mémoire autour des extractions (tracemalloc)")
+    parser.add_argument("--sites", type=lambda value: [site.strip() for site in value.split(",") if site.strip()],
+                        help=f"Sites à interroger, séparés par des virgules (défaut: {','.join(site_adapters())})")
+    args = parser.parse_args()
+    unknown = set(args.sites or []) - set(site_adapters())
+    if unknown:
+        parser.error(f"site(s) inconnu(s): {', '.join(sorted(unknown))}")
+    setup_logging(verbose=args.verbose or None)
+    get_tor_fleet()  # Les démons de la flotte (TOR_FLEET_SIZE > 0) démarrent pendant la saisie
+
     print(f"╔{'═' * 68}╗")
     print(f"║{'  SCRAPER MULTI-PHARMACIES - Recherche par EAN':^68}║")
     print(f"╚{'═' * 68}╝\n")
@@ -237,12 +441,13 @@ def main() -> None:
     print("3. Charger depuis un fichier (eans.txt)\n")
 
     choice = input("Votre choix (1/2/3): ").strip()
-    scraper = MasterScraper()
+    scraper = MasterScraper(args.sites)
+    eans: List[str] = []
 
     if choice == "1":
         ean = input("\n🔢 Entrez le code EAN: ").strip()
         if ean:
-            scraper.process_ean(ean)
+            eans = [ean]
         else:
             print("❌ Code EAN vide")
     elif choice == "2":
@@ -250,9 +455,7 @@ def main() -> None:
             "\n🔢 Entrez les codes EAN (séparés par des virgules): "
         ).strip()
         eans = [ean.strip() for ean in eans_input.split(",") if ean.strip()]
-        if eans:
-            scraper.process_multiple_eans(eans)
-        else:
+        if not eans:
             print("❌ Aucun code EAN valide")
     elif choice == "3":
         try:
@@ -260,7 +463,6 @@ def main() -> None:
                 eans = [line.strip() for line in handle if line.strip() and not line.startswith("#")]
             if eans:
                 print(f"\n✅ {len(eans)} code(s) EAN chargé(s) depuis eans.txt")
-                scraper.process_multiple_eans(eans)
             else:
                 print("❌ Fichier vide")
         except FileNotFoundError:
@@ -268,6 +470,20 @@ def main() -> None:
     else:
         print("❌ Choix invalide")
 
+    if not eans:
+        return
+
+    profiler = None
+    if args.profile:
+        profiler = JobProfiler(time.strftime("cli-%Y%m%d-%H%M%S"), args.profile, args.profile_memory)
+    with profiler or contextlib.nullcontext():
+        if choice == "1":
+            scraper.process_ean(eans[0])
+        else:
+            scraper.process_multiple_eans(eans)
+    if profiler is not None:
+        print(f"🔬 Profil enregistré dans: {profiler.save()}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,202 @@
+"""
+Métriques au format Prometheus (texte 0.0.4), exposées par l'endpoint /metrics.
+
+Compteurs, jauges et histogrammes thread-safe et peu coûteux (un verrou par métrique,
+pas de dépendance externe) : ils peuvent être alimentés depuis le chemin critique.
+Les valeurs de labels sont passées dans l'ordre de déclaration des labels.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+# Bornes (secondes) des histogrammes de latence
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_registry: List["Metric"] = []
+_registry_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """Base commune : nom, aide, labels, enregistrement dans le registre."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        with _registry_lock:
+            _registry.append(self)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Compteur monotone."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values]
+
+
+class Gauge(Metric):
+    """Jauge ; `callback` (optionnel) fournit les valeurs au moment de la collecte."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        callback: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self.callback = callback
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        if self.callback is not None:
+            try:
+                values.update(self.callback())
+            except Exception:  # noqa: BLE001 - une collecte ne doit jamais faire échouer /metrics
+                pass
+        return [f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Histogram(Metric):
+    """Histogramme cumulatif (buckets, somme, nombre d'observations)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Par jeu de labels : [compteurs par bucket (+Inf inclus), somme]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(entry[0]), entry[1]) for key, entry in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+
+def render() -> str:
+    """Texte d'exposition Prometheus de toutes les métriques enregistrées."""
+    with _registry_lock:
+        metrics = list(_registry)
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.header())
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+# --- Métriques du pipeline ---------------------------------------------------------
+
+SEARCH_DURATION = Histogram("scraper_search_duration_seconds", "Durée des recherches par site", ["site"])
+SEARCH_TOTAL = Counter("scraper_searches_total", "Recherches par site et résultat (found, not_found, timeout)", ["site", "outcome"])
+EXTRACT_DURATION = Histogram("scraper_extract_duration_seconds", "Durée des extractions par site", ["site"])
+EXTRACT_TOTAL = Counter(
+    "scraper_extractions_total",
+    "Extractions par site et résultat (success, empty, invalid_ean, timeout, error)",
+    ["site", "outcome"],
+)
+SITE_REQUESTS_TOTAL = Counter(
+    "scraper_site_requests_total",
+    "Requêtes vers les sites par résultat (success, blocked = 403/429/captcha, timeout, error, cancelled = budget de l'appelant)",
+    ["site", "outcome"],
+)
+TOR_RENEWALS_TOTAL = Counter("scraper_tor_renewals_total", "Renouvellements d'identité Tor", ["result"])
+TOR_DAEMON_RESTARTS_TOTAL = Counter("scraper_tor_daemon_restarts_total", "Relances de démons Tor de la flotte")
+TOR_CIRCUIT_RETIREMENTS_TOTAL = Counter(
+    "scraper_tor_circuit_retirements_total", "Circuits Tor retirés par motif (slow, blocked, error)", ["reason"]
+)
+SITE_SKIPS_TOTAL = Counter(
+    "scraper_site_skips_total", "Recherches évitées (taux de succès estimé quasi nul pour le préfixe de l'EAN)", ["site"]
+)
+EAN_DURATION = Histogram("scraper_ean_duration_seconds", "Durée de traitement complète d'un EAN")
+JOBS_ACTIVE = Gauge("scraper_jobs_active", "Jobs de scraping en cours")
+EANS_TOTAL = Counter("scraper_eans_total", "EAN traités par résultat (found, not_found, not_in_backend, timeout, error)", ["outcome"])
+WEBHOOK_DELIVERIES_TOTAL = Counter(
+    "webhook_deliveries_total", "Envois webhook par résultat (delivered, retried, spooled)", ["outcome"]
+)
+WEBHOOK_DELIVERY_LAG = Histogram(
+    "webhook_delivery_lag_seconds", "Délai entre la mise en file et la livraison d'un webhook"
+)
@@ -0,0 +1,295 @@
+"""
+Enregistrements produit et avis à attributs fixes (`__slots__`), communs aux scrapers.
+
+Un `ProductRecord` remplace le dictionnaire construit champ par champ dans chaque
+`parse()` : pas de dictionnaire par instance, champs connus d'avance. Il garde
+l'interface d'un dictionnaire (`product["titre"]`, `.get()`, `in`, `.items()`) : le
+code existant (orchestrateur, webhooks, deltas) l'utilise sans changement, et
+`to_dict()` redonne exactement la forme historique (champs absents omis).
+
+Sérialisation :
+- `dumps()` : JSON rapide (orjson s'il est installé, module json sinon), qui accepte
+  directement les enregistrements ;
+- `ProductRecord.pack()` / `ProductRecord.unpack()` : encodage binaire compact
+  (marshal) pour les files et caches internes au processus ; le format dépend de la
+  version de Python, il n'est pas destiné au stockage durable ni aux échanges.
+"""
+
+from __future__ import annotations
+
+import json
+import marshal
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # dépendance optionnelle : encodage JSON plus rapide
+    orjson = None
+
+_MISSING = object()  # Valeur d'un champ non renseigné
+
+# Version de l'encodage binaire (premier octet de `pack()`)
+PACK_VERSION = 1
+MARSHAL_VERSION = 4
+
+
+class _Record:
+    """
+    Base des enregistrements : champs en `__slots__`, interface de dictionnaire.
+
+    Pas d'héritage de MutableMapping (métaclasse ABC : isinstance() plus lent dans
+    les boucles de sérialisation) ; la classe y est enregistrée comme sous-classe virtuelle.
+    """
+
+    __slots__ = ()
+    FIELDS: Tuple[str, ...] = ()
+
+    def __init__(self, **values: Any) -> None:
+        # Tous les slots sont affectés : lire un champ absent ne lève pas d'AttributeError
+        for key in self.FIELDS:
+            setattr(self, key, _MISSING)
+        for key, value in values.items():
+            self[key] = value
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        try:
+            return self._extra_get(key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in self._field_set:
+            setattr(self, key, value)
+        else:
+            self._extra_set(key, value)
+
+    def __delitem__(self, key: str) -> None:
+        if key in self._field_set:
+            if getattr(self, key) is _MISSING:
+                raise KeyError(key)
+            setattr(self, key, _MISSING)
+            return
+        try:
+            self._extra_del(key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            self[key]  # type: ignore[index]
+        except (KeyError, TypeError):
+            return False
+        return True
+
+    def __iter__(self) -> Iterator[str]:
+        for key in self.FIELDS:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        yield from self._extra_keys()
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self) -> List[str]:
+        return list(self)
+
+    def values(self) -> List[Any]:
+        return [self[key] for key in self]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        return [(key, self[key]) for key in self]
+
+    def update(self, values: Any = (), **kwargs: Any) -> None:
+        for key, value in dict(values, **kwargs).items():
+            self[key] = value
+
+    def pop(self, key: str, *default: Any) -> Any:
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        del self[key]
+        return value
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, _Record):
+            other = other.to_dict()
+        return isinstance(other, dict) and self.to_dict() == other
+
+    __hash__ = None  # type: ignore[assignment]  # mutable, comme un dict
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Forme dictionnaire historique (champs renseignés uniquement)."""
+        data = {}
+        for key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not _MISSING:
+                data[key] = value
+        return data
+
+    # Champs hors schéma : refusés par défaut (voir ProductRecord)
+    def _extra_get(self, key: str) -> Any:
+        raise AttributeError(key)
+
+    def _extra_set(self, key: str, value: Any) -> None:
+        raise KeyError(f"{type(self).__name__}: champ inconnu {key!r}")
+
+    def _extra_del(self, key: str) -> None:
+        raise AttributeError(key)
+
+    def _extra_keys(self) -> Iterator[str]:
+        return iter(())
+
+
+MutableMapping.register(_Record)
+
+
+class Review(_Record):
+    """Avis client (note "4/5", date telle qu'affichée par le site)."""
+
+    FIELDS = ("auteur", "titre", "avis", "note", "date")
+    __slots__ = FIELDS
+    _field_set = frozenset(FIELDS)
+
+    def to_tuple(self) -> Tuple[Any, ...]:
+        """Valeurs dans l'ordre des champs (champ absent : None)."""
+        return tuple(None if value is _MISSING else value for value in map(self.__getattribute__, self.FIELDS))
+
+    @classmethod
+    def from_tuple(cls, values: Tuple[Any, ...]) -> "Review":
+        return cls(**{key: value for key, value in zip(cls.FIELDS, values) if value is not None})
+
+
+class ProductRecord(_Record):
+    """
+    Produit extrait d'une page, tous sites confondus.
+
+    Les champs propres à l'orchestrateur (timings, used_replacement...) vont dans un
+    dictionnaire annexe créé seulement s'il sert.
+    """
+
+    FIELDS = (
+        "site", "ean", "url", "titre", "prix", "marque", "description", "ean_verif",
+        "reference", "code_custom", "contenance", "forme", "variantes", "note", "nb_avis",
+        "pourcentage_reco", "composition", "conseils", "conseils_pharmacien", "avis_clients",
+    )
+    __slots__ = FIELDS + ("_extra",)
+    _field_set = frozenset(FIELDS)
+
+    def __init__(self, **values: Any) -> None:
+        self._extra: Optional[Dict[str, Any]] = None
+        super().__init__(**values)
+
+    def _extra_get(self, key: str) -> Any:
+        if self._extra is None or key not in self._extra:
+            raise AttributeError(key)
+        return self._extra[key]
+
+    def _extra_set(self, key: str, value: Any) -> None:
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def _extra_del(self, key: str) -> None:
+        if self._extra is None or key not in self._extra:
+            raise AttributeError(key)
+        del self._extra[key]
+
+    def _extra_keys(self) -> Iterator[str]:
+        return iter(list(self._extra)) if self._extra else iter(())
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = super().to_dict()
+        reviews = data.get("avis_clients")
+        if reviews:
+            data["avis_clients"] = [
+                review.to_dict() if type(review) is Review else review for review in reviews
+            ]
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def add_review(self, **values: Any) -> Review:
+        """Ajoute un avis client et le retourne."""
+        review = Review(**values)
+        reviews = self.avis_clients
+        if reviews is _MISSING:
+            self.avis_clients = reviews = []
+        reviews.append(review)
+        return review
+
+    def pack(self) -> bytes:
+        """Encodage binaire compact (valeurs dans l'ordre des champs, avis en tuples)."""
+        values: List[Any] = []
+        for key in self.FIELDS:
+            value = getattr(self, key)
+            if value is _MISSING:
+                value = None
+            elif key == "avis_clients":
+                value = tuple(
+                    review.to_tuple() if isinstance(review, Review) else Review(**review).to_tuple()
+                    for review in value
+                )
+            values.append(value)
+        return bytes((PACK_VERSION,)) + marshal.dumps((tuple(values), self._extra), MARSHAL_VERSION)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "ProductRecord":
+        """Reconstruit un produit encodé par `pack()`."""
+        if not data or data[0] != PACK_VERSION:
+            raise ValueError(f"Encodage produit inconnu (version {data[:1]!r})")
+        values, extra = marshal.loads(data[1:])
+        product = cls()
+        for key, value in zip(cls.FIELDS, values):
+            if value is None:
+                continue
+            if key == "avis_clients":
+                value = [Review.from_tuple(review) for review in value]
+            setattr(product, key, value)
+        product._extra = extra
+        return product
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, _Record):
+        return value.to_dict()
+    raise TypeError(f"Type non sérialisable en JSON: {type(value).__name__}")
+
+
+def dumps(value: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Encode en JSON UTF-8 (caractères non ASCII conservés), enregistrements compris.
+
+    Args:
+        value: Valeur à encoder (dictionnaires, listes, ProductRecord, Review...)
+        indent: Indentation de 2 espaces (fichiers lisibles)
+        sort_keys: Clés triées (empreintes stables)
+    """
+    if orjson is not None:
+        option = (orjson.OPT_INDENT_2 if indent else 0) | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(value, default=_default, option=option)
+    return json.dumps(
+        value,
+        default=_default,
+        ensure_ascii=False,
+        indent=2 if indent else None,
+        sort_keys=sort_keys,
+        separators=None if indent else (",", ":"),
+    ).encode("utf-8")
@@ -0,0 +1,330 @@
+"""
+Profilage à la demande des jobs de scraping, sans redémarrer le service.
+
+Un `JobProfiler` actif (contexte du job) profile le thread du job et les travaux que
+celui-ci délègue aux pools via `timing.bind` :
+- "cprofile" : profil déterministe (cProfile), sauvegardé en .prof (pstats, snakeviz)
+  et en résumé texte trié par temps cumulé ;
+- "sample" : échantillonnage périodique des piles (surcoût faible), sauvegardé au
+  format « folded » (flamegraph.pl, speedscope) et en résumé par fonction.
+
+Avec `memory=True`, tracemalloc mesure les allocations autour de `extract()` et du
+parsing BeautifulSoup (`memory_probe`), et les lignes les plus allocatrices du job.
+Les mesures mémoire de jobs simultanés se recouvrent (tracemalloc est global).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import PROFILE_DIR, PROFILE_MEMORY_TOP, PROFILE_SAMPLE_INTERVAL, PROFILE_TOP
+from models import dumps
+
+logger = logging.getLogger(__name__)
+
+CPROFILE = "cprofile"
+SAMPLE = "sample"
+MODES = (CPROFILE, SAMPLE)
+
+_active: contextvars.ContextVar[Optional["JobProfiler"]] = contextvars.ContextVar("profiler", default=None)
+
+# tracemalloc est global : démarré au premier job qui le demande, arrêté au dernier
+# (sauf s'il était déjà actif, ex: benchmark)
+_tracemalloc_users = 0
+_tracemalloc_owned = False
+_tracemalloc_lock = threading.Lock()
+
+
+class StackSampler:
+    """Échantillonne la pile des threads enregistrés toutes les `interval` secondes."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL) -> None:
+        self.interval = interval
+        self.samples = 0
+        self._threads: Counter = Counter()
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] += 1
+
+    def unregister(self, ident: int) -> None:
+        with self._lock:
+            self._threads[ident] -= 1
+            if self._threads[ident] <= 0:
+                del self._threads[ident]
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="profiler-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                idents = list(self._threads)
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+
+    def folded(self) -> str:
+        """Piles au format « folded » : une ligne "f1;f2;f3 nombre" par pile."""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+    def summary(self, limit: int = PROFILE_TOP) -> str:
+        """Fonctions par nombre d'échantillons : en cours d'exécution (propre) et sur la pile (cumulé)."""
+        own: Counter = Counter()
+        cumulative: Counter = Counter()
+        for stack, count in self._stacks.items():
+            functions = stack.split(";")
+            own[functions[-1]] += count
+            for function in set(functions):
+                cumulative[function] += count
+        total = max(self.samples, 1)
+        lines = [f"{self.samples} échantillons ({self.interval * 1000:.0f} ms)", "", "   propre   cumulé  fonction"]
+        for function, count in cumulative.most_common(limit):
+            lines.append(f"{own[function] / total:>8.1%} {count / total:>8.1%}  {function}")
+        return "\n".join(lines) + "\n"
+
+
+class JobProfiler:
+    """Profileur d'un job, actif dans son contexte (`with JobProfiler(...)`)."""
+
+    def __init__(self, job_id: str, mode: str = CPROFILE, memory: bool = False, directory: str = PROFILE_DIR) -> None:
+        """
+        Args:
+            job_id: Identifiant du job (nom du répertoire du profil)
+            mode: "cprofile" (déterministe) ou "sample" (échantillonnage)
+            memory: Mesure des allocations (tracemalloc) autour des extractions et du parsing
+            directory: Répertoire racine des profils
+        """
+        if mode not in MODES:
+            raise ValueError(f"Mode de profilage inconnu: {mode} (attendu: {', '.join(MODES)})")
+        self.job_id = job_id
+        self.mode = mode
+        self.memory = memory
+        self.directory = os.path.join(directory, job_id)
+        self.started_at = time.time()
+        self.duration = 0.0
+        self._owner = threading.get_ident()
+        self._profile: Optional[cProfile.Profile] = None
+        self._thread_profiles: List[cProfile.Profile] = []
+        self._sampler: Optional[StackSampler] = None
+        self._probes: Dict[str, Dict[str, float]] = {}
+        self._top_allocations: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._token: Optional[contextvars.Token] = None
+        self._results: Optional[io.BufferedWriter] = None
+        self.results_written = 0
+
+    def __enter__(self) -> "JobProfiler":
+        global _tracemalloc_users, _tracemalloc_owned
+        self._token = _active.set(self)
+        self._owner = threading.get_ident()
+        if self.memory:
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0:
+                    _tracemalloc_owned = not tracemalloc.is_tracing()
+                    if _tracemalloc_owned:
+                        tracemalloc.start()
+                _tracemalloc_users += 1
+        if self.mode == CPROFILE:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler()
+            self._sampler.register(self._owner)
+            self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        global _tracemalloc_users
+        self.duration = time.time() - self.started_at
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self.memory:
+            self._top_allocations = [
+                {
+                    "where": str(stat.traceback[0]),
+                    "size_kb": round(stat.size / 1024, 1),
+                    "count": stat.count,
+                }
+                for stat in tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_MEMORY_TOP]
+            ]
+            with _tracemalloc_lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0 and _tracemalloc_owned:
+                    tracemalloc.stop()
+        _active.reset(self._token)
+
+    def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Exécute `func` depuis un thread de pool en l'incluant dans le profil du job."""
+        ident = threading.get_ident()
+        if ident == self._owner:
+            return func(*args, **kwargs)
+        if self._sampler is not None:
+            self._sampler.register(ident)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._sampler.unregister(ident)
+
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    @contextmanager
+    def memory_probe(self, label: str) -> Iterator[None]:
+        """Allocations nettes et pic (Ko) d'un bloc, cumulés par étiquette."""
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            with self._lock:
+                probe = self._probes.setdefault(label, {"count": 0, "net_kb": 0.0, "peak_kb": 0.0})
+                probe["count"] += 1
+                probe["net_kb"] = round(probe["net_kb"] + (current - before) / 1024, 1)
+                probe["peak_kb"] = round(max(probe["peak_kb"], (peak - before) / 1024), 1)
+
+    def write_result(self, result: Dict[str, Any]) -> None:
+        """
+        Ajoute le résultat d'un EAN à `results.jsonl` (une ligne JSON par EAN).
+
+        Les résultats sont écrits au fil du job plutôt que conservés jusqu'à `save()`.
+        """
+        line = dumps(result) + b"\n"
+        with self._lock:
+            if self._results is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self._results = open(os.path.join(self.directory, "results.jsonl"), "wb")
+            self._results.write(line)
+            self.results_written += 1
+
+    def save(self, summary: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Écrit le profil (et le résumé du job, s'il est fourni) dans son répertoire.
+
+        Returns:
+            Le répertoire du profil
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            if self._results is not None:
+                self._results.close()
+                self._results = None
+        if self._profile is not None:
+            stats = pstats.Stats(self._profile)
+            for profile in self._thread_profiles:
+                stats.add(profile)
+            stats.dump_stats(os.path.join(self.directory, "profile.prof"))
+            buffer = io.StringIO()
+            pstats.Stats(os.path.join(self.directory, "profile.prof"), stream=buffer) \
+                .sort_stats("cumulative").print_stats(PROFILE_TOP)
+            report = buffer.getvalue()
+        else:
+            with open(os.path.join(self.directory, "samples.folded"), "w", encoding="utf-8") as handle:
+                handle.write(self._sampler.folded())
+            report = self._sampler.summary()
+        with open(os.path.join(self.directory, "profile.txt"), "w", encoding="utf-8") as handle:
+            handle.write(report)
+
+        if self.memory:
+            with open(os.path.join(self.directory, "memory.json"), "w", encoding="utf-8") as handle:
+                json.dump({"probes": self._probes, "top_allocations": self._top_allocations},
+                          handle, ensure_ascii=False, indent=2)
+        if summary is not None:
+            with open(os.path.join(self.directory, "summary.json"), "w", encoding="utf-8") as handle:
+                json.dump(summary, handle, ensure_ascii=False, indent=2, default=str)
+        with open(os.path.join(self.directory, "meta.json"), "w", encoding="utf-8") as handle:
+            json.dump({
+                "job_id": self.job_id,
+                "mode": self.mode,
+                "memory": self.memory,
+                "started_at": self.started_at,
+                "duration_s": round(self.duration, 3),
+                "results": self.results_written,
+            }, handle, indent=2)
+
+        logger.info("🔬 Profil du job enregistré dans %s", self.directory)
+        return self.directory
+
+
+def current_profiler() -> Optional[JobProfiler]:
+    """Profileur actif dans le contexte courant (None si aucun)."""
+    return _active.get()
+
+
+def profiled(func: Callable, *args: Any, **kwargs: Any) -> Any:
+    """Appelle `func`, incluse dans le profil du job actif s'il y en a un."""
+    profiler = _active.get()
+    if profiler is None:
+        return func(*args, **kwargs)
+    return profiler.run(func, *args, **kwargs)
+
+
+@contextmanager
+def memory_probe(label: str) -> Iterator[None]:
+    """Mesure les allocations d'un bloc si le profil mémoire du job actif est demandé."""
+    profiler = _active.get()
+    if profiler is None or not profiler.memory:
+        yield
+        return
+    with profiler.memory_probe(label):
+        yield
+
+
+def list_profiles(directory: str = PROFILE_DIR) -> List[Dict[str, Any]]:
+    """Profils enregistrés (plus récents d'abord) : métadonnées et fichiers disponibles."""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for job_id in os.listdir(directory):
+        path = os.path.join(directory, job_id)
+        if not os.path.isdir(path):
+            continue
+        meta: Dict[str, Any] = {"job_id": job_id}
+        try:
+            with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as handle:
+                meta.update(json.load(handle))
+        except (OSError, ValueError):
+            meta["started_at"] = os.path.getmtime(path)
+        meta["files"] = {name: os.path.getsize(os.path.join(path, name)) for name in sorted(os.listdir(path))}
+        profiles.append(meta)
+    return sorted(profiles, key=lambda meta: meta.get("started_at", 0), reverse=True)
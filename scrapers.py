@@ -5,15 +5,18 @@ Chaque scraper s'appuie sur une session Tor avec gestion automatique des retries
 
 from __future__ import annotations
 
-import json
+import functools
+import logging
 import re
 import time
-from typing import Dict, List, Optional
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
 
 from config import (
+    CIRCUIT_POOL_SIZE,
+    HEDGE_ENABLED,
     MAX_RETRIES,
     REQUEST_TIMEOUT,
     RETRY_DELAY,
@@ -23,99 +26,368 @@ from config import (
     TOR_PROXY,
     TOR_RENEW_DELAY,
     TOR_USER_AGENT,
+    TRANSPORT_DIRECT_PROXY,
 )
+from cassette import mount_cassette
+from circuits import get_circuit_pool
+from concurrency import BLOCKED, get_site_limiter
+from deadline import Deadline
+from hedging import get_hedged_fetcher
+from html_scan import FieldScanner, clean_text
+import jsonld
+from metrics import TOR_RENEWALS_TOTAL
+from models import ProductRecord, Review
+from profiling import memory_probe
+from timing import count, span
+from tor_fleet import get_tor_fleet
+from transport import DIRECT, detect_block, get_transport_policy, is_connection_refused
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+# En-têtes "navigateur" communs aux sessions Tor et directes
+PAGE_HEADERS = {
+    "User-Agent": TOR_USER_AGENT,
+    "Accept": (
+        "text/html,application/xhtml+xml,application/xml;q=0.9,"
+        "image/avif,image/webp,*/*;q=0.8"
+    ),
+    "Accept-Language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
+    "Accept-Encoding": "gzip, deflate, br",
+    "Cache-Control": "no-cache",
+    "Pragma": "no-cache",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
 
 
 class TorSession:
     """Gestion des sessions HTTP via Tor."""
 
     @staticmethod
-    def create_session() -> requests.Session:
-        """Crée une session HTTP configurée pour Tor."""
-        session = requests.Session()
+    def isolated_proxy(isolation: Optional[str] = None, deadline: Optional[Deadline] = None) -> str:
+        """
+        Retourne l'URL du proxy Tor, éventuellement isolée.
+
+        Tor (IsolateSOCKSAuth, actif par défaut) attribue un circuit distinct à
+        chaque couple d'identifiants SOCKS : un identifiant d'isolation différent
+        garantit donc un circuit différent.
+
+        Avec la flotte de démons Tor (TOR_FLEET_SIZE > 0), chaque nouvelle session
+        est attribuée au démon prêt suivant, attendu dans la limite de `deadline`.
+        """
+        fleet = get_tor_fleet()
+        proxy = fleet.acquire(deadline).proxy if fleet is not None else TOR_PROXY
+        if not isolation:
+            return proxy
+        scheme, address = proxy.split("://", 1)
+        return f"{scheme}://{isolation}:x@{address}"
+
+    @staticmethod
+    def create_session(isolation: Optional[str] = None, deadline: Optional[Deadline] = None) -> requests.Session:
+        """Crée une session HTTP configurée pour Tor (circuit isolé si `isolation`)."""
+        proxy = TorSession.isolated_proxy(isolation, deadline)
+        session = mount_cassette(requests.Session())
         session.proxies = {
-            "http": TOR_PROXY,
-            "https": TOR_PROXY,
+            "http": proxy,
+            "https": proxy,
         }
-        session.headers.update({
-            "User-Agent": TOR_USER_AGENT,
-            "Accept": (
-                "text/html,application/xhtml+xml,application/xml;q=0.9,"
-                "image/avif,image/webp,*/*;q=0.8"
-            ),
-            "Accept-Language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
-            "Accept-Encoding": "gzip, deflate, br",
-            "Cache-Control": "no-cache",
-            "Pragma": "no-cache",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        })
+        session.headers.update(PAGE_HEADERS)
         # IMPORTANT: Activer la décompression automatique pour gzip/deflate/br
         # (équivalent de curl --compressed)
         # requests le fait normalement automatiquement, mais on force ici
         return session
 
     @staticmethod
-    def renew_tor_identity() -> bool:
+    def renew_tor_identity(deadline: Optional[Deadline] = None) -> bool:
         """Renouvelle l'identité Tor via le port de contrôle."""
+        renewed = TorSession._renew_tor_identity(deadline)
+        TOR_RENEWALS_TOTAL.inc("ok" if renewed else "failed")
+        return renewed
+
+    @staticmethod
+    def _renew_tor_identity(deadline: Optional[Deadline] = None) -> bool:
+        deadline = deadline or Deadline()
+        deadline.check("renouvellement Tor")
+        fleet = get_tor_fleet()
+        if fleet is not None:
+            if not fleet.renew_all(deadline.timeout(5)):
+                logger.warning("⚠️  Impossible de renouveler l'identité des démons Tor de la flotte")
+                return False
+            return TorSession._after_renewal(deadline)
         try:
             import telnetlib
 
-            with telnetlib.Telnet(TOR_CONTROL_HOST, TOR_CONTROL_PORT, timeout=5) as tn:
+            control_timeout = deadline.timeout(5)
+            with telnetlib.Telnet(TOR_CONTROL_HOST, TOR_CONTROL_PORT, timeout=control_timeout) as tn:
                 if TOR_CONTROL_PASSWORD:
                     auth = f'AUTHENTICATE "{TOR_CONTROL_PASSWORD}"\r\n'.encode()
                 else:
                     auth = b'AUTHENTICATE ""\r\n'
                 tn.write(auth)
-                if b"250 OK" not in tn.read_until(b"250", timeout=5):
+                if b"250 OK" not in tn.read_until(b"250", timeout=control_timeout):
                     return False
                 tn.write(b"SIGNAL NEWNYM\r\n")
-                if b"250 OK" not in tn.read_until(b"250", timeout=5):
+                if b"250 OK" not in tn.read_until(b"250", timeout=control_timeout):
                     return False
-
-            time.sleep(TOR_RENEW_DELAY)
-            print("   🔄 Identité Tor renouvelée")
-            return True
         except Exception:
-            print("   ⚠️  Impossible de renouveler l'identité Tor automatiquement")
+            logger.warning("⚠️  Impossible de renouveler l'identité Tor automatiquement")
             return False
+        return TorSession._after_renewal(deadline)
+
+    @staticmethod
+    def _after_renewal(deadline: Deadline) -> bool:
+        deadline.sleep(TOR_RENEW_DELAY)
+        if CIRCUIT_POOL_SIZE > 0:
+            # NEWNYM remplace tous les circuits : leurs mesures ne valent plus
+            get_circuit_pool().reset()
+        logger.info("🔄 Identité Tor renouvelée")
+        return True
+
+
+# Champ du produit -> donnée schema.org extraite par jsonld.product_data()
+JSONLD_SOURCES = {
+    "titre": "name",
+    "description": "description",
+    "ean_verif": "gtin",
+    "marque": "brand",
+    "prix": "price",
+    "note": "rating",
+    "nb_avis": "review_count",
+}
 
 
 class BaseScraper:
     """Classe de base partagée par les scrapers de chaque site."""
 
+    site_key = ""  # Clé du site (limiteur de concurrence, statistiques)
+    # Champs lus d'abord dans le JSON-LD de la page (même format que l'extraction HTML
+    # du site) ; l'analyse propre au site ne traite que les champs restés vides
+    jsonld_fields: Tuple[str, ...] = ()
+    # Motifs du HTML brut propres au site, relevés en un seul passage (cf. html_scan)
+    scanner: Optional[FieldScanner] = None
+
     def __init__(self) -> None:
         self.session: Optional[requests.Session] = None
+        self.direct_session: Optional[requests.Session] = None
         self.max_retries = MAX_RETRIES
+        self.hedged_fetcher = get_hedged_fetcher() if HEDGE_ENABLED else None
+        self.transport_policy = get_transport_policy()
+        # Temps cumulé par champ dans parse() (None = mesure désactivée, cf. benchmarks/)
+        self.field_timings: Optional[Dict[str, float]] = None
+
+    @contextmanager
+    def _field(self, name: str) -> Iterator[None]:
+        """Mesure le temps d'extraction d'un champ si `field_timings` est activé."""
+        timings = self.field_timings
+        if timings is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[name] = timings.get(name, 0.0) + time.perf_counter() - start
+
+    def _soup(self, html: str) -> BeautifulSoup:
+        """Analyse le HTML (allocations mesurées si le profil mémoire du job est actif)."""
+        from bs4 import BeautifulSoup  # import différé : inutile au démarrage
+
+        with memory_probe(f"soup:{self.site_key}"):
+            return BeautifulSoup(html, "html.parser")
+
+    def _apply_jsonld(self, product: ProductRecord, html: str) -> None:
+        """Renseigne les champs `jsonld_fields` fournis par le JSON-LD de la page."""
+        if not self.jsonld_fields:
+            return
+        data = jsonld.product_data(html)
+        if not data:
+            return
+        for name in self.jsonld_fields:
+            value = self._jsonld_value(name, data)
+            if value:
+                product[name] = value
+
+    def _jsonld_value(self, name: str, data: Dict[str, Any]) -> Any:
+        """Valeur d'un champ du produit, au format des scrapers, depuis les données JSON-LD."""
+        if name == "avis_clients":
+            reviews = (self._review_from_jsonld(review) for review in data.get("reviews", ()))
+            return [review for review in reviews if review.get("avis")][:5]
+        value = data.get(JSONLD_SOURCES[name])
+        if value is None:
+            return None
+        if name == "prix":
+            return f"{value:.2f}€" if isinstance(value, float) else f"{value}€"
+        if name == "note":
+            return f"{value}/5"
+        return self._clean_entities(str(value))
+
+    def _review_from_jsonld(self, review: Dict[str, Any]) -> Review:
+        """Convertit un nœud schema.org Review en avis client."""
+        rating = jsonld.review_rating(review)
+        result = Review(
+            auteur=self._clean_entities(jsonld.review_author(review) or "Anonyme"),
+            avis=self._clean_entities(review.get("reviewBody", "")),
+            note=f"{rating}/5" if rating is not None else "N/A",
+        )
+        if review.get("name"):
+            result["titre"] = self._clean_entities(review["name"])
+        if review.get("datePublished"):
+            result["date"] = review["datePublished"]
+        return result
 
-    def _get_session(self) -> requests.Session:
+    @staticmethod
+    def _check_ean(extracted_ean: Optional[str], ean: str) -> None:
+        """Vérifie que l'EAN affiché par la page correspond au code EAN recherché."""
+        if extracted_ean and extracted_ean != ean:
+            raise ValueError(
+                f"❌ EAN non correspondant : recherché={ean}, trouvé={extracted_ean}. "
+                f"Le produit sur cette page n'est pas celui demandé."
+            )
+
+    def _get_session(self, deadline: Optional[Deadline] = None) -> requests.Session:
         if self.session is None:
-            self.session = TorSession.create_session()
+            self.session = TorSession.create_session(deadline=deadline)
         return self.session
 
-    def _fetch_with_retry(self, url: str, max_retries: Optional[int] = None) -> requests.Response:
-        """Récupère une page HTML avec gestion des erreurs et rotation Tor."""
+    def _get_direct_session(self) -> requests.Session:
+        """Session sans Tor (éventuellement via un proxy simple TRANSPORT_DIRECT_PROXY)."""
+        if self.direct_session is None:
+            self.direct_session = mount_cassette(requests.Session())
+            if TRANSPORT_DIRECT_PROXY:
+                self.direct_session.proxies = {
+                    "http": TRANSPORT_DIRECT_PROXY,
+                    "https": TRANSPORT_DIRECT_PROXY,
+                }
+            self.direct_session.headers.update(PAGE_HEADERS)
+        return self.direct_session
+
+    def _fetch_direct(self, url: str, deadline: Deadline) -> Optional[requests.Response]:
+        """
+        Tente une récupération en connexion directe.
+
+        Seuls les signaux de blocage (403, 429, page de challenge, connexion refusée)
+        font basculer le domaine vers Tor ; les timeouts, erreurs réseau et erreurs 5xx
+        sont levés tels quels et retentés comme des erreurs ordinaires.
+
+        Returns:
+            La réponse, ou None si le site bloque (le domaine bascule alors vers Tor)
+        """
+        try:
+            timeout = deadline.timeout(REQUEST_TIMEOUT, f"récupération de {url}")
+            response = self._get_direct_session().get(url, timeout=timeout)
+        except requests.ConnectionError as exc:
+            if not is_connection_refused(exc):
+                raise
+            self.transport_policy.report_block(url, "connection_refused")
+            return None
+
+        reason = detect_block(response)
+        if reason:
+            self.transport_policy.report_block(url, reason)
+            return None
+
+        response.raise_for_status()
+        return response
+
+    def _get(self, url: str, timeout: float, deadline: Optional[Deadline] = None) -> requests.Response:
+        """
+        GET via Tor, couvert par une requête dupliquée si le mode hedging est actif.
+
+        Avec le pool de circuits (CIRCUIT_POOL_SIZE > 0), la requête part sur le circuit
+        le plus rapide du moment et sa latence est enregistrée. Les nouvelles sessions
+        n'attendent un démon Tor prêt que dans la limite de `deadline`.
+        """
+        session_factory = functools.partial(TorSession.create_session, deadline=deadline)
+        if CIRCUIT_POOL_SIZE <= 0:
+            if self.hedged_fetcher is None:
+                return self._get_session(deadline).get(url, timeout=timeout)
+            return self.hedged_fetcher.fetch(self._get_session(deadline), url, timeout, session_factory)
+        with get_circuit_pool().session(deadline) as session:
+            if self.hedged_fetcher is None:
+                return session.get(url, timeout=timeout)
+            return self.hedged_fetcher.fetch(session, url, timeout, session_factory)
+
+    def _renew_identity(self, deadline: Deadline) -> None:
+        """
+        Renouvelle l'identité Tor et abandonne les connexions de l'ancien circuit.
+
+        Avec le pool de circuits, les sessions inactives du pool sont fermées par
+        `CircuitPool.reset()` (cf. `TorSession._after_renewal`) ; sinon la session
+        propre au scraper est recréée à la prochaine requête.
+        """
+        if not TorSession.renew_tor_identity(deadline):
+            return
+        count("tor_renewals", self.site_key)
+        if CIRCUIT_POOL_SIZE <= 0 and self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def _fetch_with_retry(
+        self,
+        url: str,
+        max_retries: Optional[int] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> requests.Response:
+        """
+        Récupère une page HTML avec gestion des erreurs et rotation Tor.
+
+        Selon la politique de transport, la page est d'abord demandée en connexion
+        directe ; en cas de blocage la tentative se poursuit immédiatement via Tor, les
+        autres erreurs (timeout, réseau, 5xx) sont retentées en connexion directe.
+        Les timeouts, les pauses entre tentatives et les renouvellements Tor sont
+        bornés par `deadline` ; DeadlineExceeded est levée quand le budget est épuisé.
+        """
         attempts = max_retries or self.max_retries
+        deadline = deadline or Deadline()
+        limiter = get_site_limiter(self.site_key)
 
         for attempt in range(1, attempts + 1):
+            if attempt > 1:
+                count("retries", self.site_key)
+            if self.transport_policy.transport_for(url) == DIRECT:
+                try:
+                    with limiter.slot(deadline) as slot:
+                        response = self._fetch_direct(url, deadline)
+                        if response is None:
+                            slot.outcome = BLOCKED
+                except requests.RequestException as exc:
+                    # Erreur ordinaire (timeout, DNS, 5xx...) : nouvel essai en direct
+                    logger.warning("⚠️  Erreur réseau en direct (tentative %d/%d): %s", attempt, attempts, exc)
+                    if attempt == attempts:
+                        raise
+                    deadline.sleep(RETRY_DELAY)
+                    continue
+                if response is not None:
+                    return response
+                if self.transport_policy.mode == DIRECT:
+                    # Mode "direct" : jamais de Tor, nouvel essai en connexion directe
+                    if attempt < attempts:
+                        deadline.sleep(RETRY_DELAY)
+                    continue
+
             try:
-                response = self._get_session().get(url, timeout=REQUEST_TIMEOUT)
+                with limiter.slot(deadline) as slot:
+                    timeout = deadline.timeout(REQUEST_TIMEOUT, f"récupération de {url}")
+                    response = self._get(url, timeout, deadline)
+                    if detect_block(response):
+                        slot.outcome = BLOCKED
                 if response.status_code == 403 and attempt < attempts:
-                    print(f"   ⚠️  403 Forbidden (tentative {attempt}/{attempts})")
-                    if TorSession.renew_tor_identity():
-                        self.session = None
-                    time.sleep(RETRY_DELAY)
+                    logger.warning("⚠️  403 Forbidden (tentative %d/%d)", attempt, attempts)
+                    self._renew_identity(deadline)
+                    deadline.sleep(RETRY_DELAY)
                     continue
 
                 response.raise_for_status()
                 return response
             except requests.RequestException as exc:
-                print(f"   ⚠️  Erreur réseau (tentative {attempt}/{attempts}): {exc}")
+                logger.warning("⚠️  Erreur réseau (tentative %d/%d): %s", attempt, attempts, exc)
                 if attempt == attempts:
                     raise
-                if TorSession.renew_tor_identity():
-                    self.session = None
-                time.sleep(RETRY_DELAY)
+                self._renew_identity(deadline)
+                deadline.sleep(RETRY_DELAY)
 
         raise RuntimeError(f"Échec de récupération après {attempts} tentatives")
 
@@ -124,29 +396,7 @@ class BaseScraper:
         """Nettoie les entités HTML et normalise les espaces."""
         if not text:
             return ""
-
-        replacements = {
-            "&eacute;": "é",
-            "&egrave;": "è",
-            "&agrave;": "à",
-            "&ugrave;": "ù",
-            "&acirc;": "â",
-            "&ocirc;": "ô",
-            "&icirc;": "î",
-            "&ecirc;": "ê",
-            "&nbsp;": " ",
-            "&#39;": "'",
-            "&rsquo;": "'",
-            "&amp;": "&",
-            "&ccedil;": "ç",
-            "\\u00e9": "é",
-            "\\u00e8": "è",
-            "\\u00e0": "à",
-            "\\u00e7": "ç",
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return re.sub(r"\s+", " ", text).strip()
+        return clean_text(text)
 
     @staticmethod
     def _text_or_empty(element: Optional[BeautifulSoup]) -> str:
@@ -159,95 +409,114 @@ class BaseScraper:
 class CocooncenterScraper(BaseScraper):
     """Scraper Cocooncenter - Basé sur le script bash qui fonctionne."""
 
-    def extract(self, url: str, ean: str) -> Dict:
-        product = {
-            "site": "Cocooncenter",
-            "ean": ean,
-            "url": url,
-            "avis_clients": [],
-        }
+    site_key = "cocooncenter"
+    jsonld_fields = ("prix", "ean_verif", "marque", "note", "nb_avis", "avis_clients")
+
+    def extract(self, url: str, ean: str, deadline: Optional[Deadline] = None) -> ProductRecord:
+        with span("fetch", self.site_key):
+            response = self._fetch_with_retry(url, deadline=deadline)
+        with span("parse", self.site_key):
+            return self.parse(response.text, url, ean)
+
+    def parse(self, html: str, url: str, ean: str) -> ProductRecord:
+        """Extrait les données produit d'une page déjà récupérée (sans réseau)."""
+        product = ProductRecord(site="Cocooncenter", ean=ean, url=url, avis_clients=[])
 
-        response = self._fetch_with_retry(url)
-        html = response.text
-        soup = BeautifulSoup(html, "html.parser")
+        with self._field("jsonld"):
+            self._apply_jsonld(product, html)
+
+        with self._field("soup"):
+            soup = self._soup(html)
 
         # 1. TITRE
-        if soup.title:
-            product["titre"] = self._clean_entities(soup.title.get_text())
+        with self._field("titre"):
+            if soup.title:
+                product["titre"] = self._clean_entities(soup.title.get_text())
 
-        # 2. PRIX (depuis JSON-LD)
-        price_match = re.search(r'"price":\s*"([^"]*)"', html)
-        if price_match:
-            product["prix"] = price_match.group(1) + "€"
+        # 2. PRIX (JSON-LD, sinon motif "price" du HTML brut)
+        with self._field("prix"):
+            if not product.get("prix"):
+                price_match = re.search(r'"price":\s*"([^"]*)"', html)
+                if price_match:
+                    product["prix"] = price_match.group(1) + "€"
 
         # 3. DESCRIPTION (itemprop="description" ou fallback)
-        desc_elem = soup.find(itemprop="description")
-        if desc_elem:
-            p_tag = desc_elem.find("p")
-            if p_tag:
-                product["description"] = self._text_or_empty(p_tag)
-
-        if not product.get("description"):
-            desc_div = soup.find("div", id="type_info_prio_11_1")
-            if desc_div:
-                p_tag = desc_div.find("p")
+        with self._field("description"):
+            desc_elem = soup.find(itemprop="description")
+            if desc_elem:
+                p_tag = desc_elem.find("p")
                 if p_tag:
                     product["description"] = self._text_or_empty(p_tag)
 
-        # 4. CODE EAN
-        ean_elem = soup.find("span", itemprop="gtin13")
-        if ean_elem:
-            extracted_ean = self._text_or_empty(ean_elem)
-            product["ean_verif"] = extracted_ean
+            if not product.get("description"):
+                desc_div = soup.find("div", id="type_info_prio_11_1")
+                if desc_div:
+                    p_tag = desc_div.find("p")
+                    if p_tag:
+                        product["description"] = self._text_or_empty(p_tag)
+
+        # 4. CODE EAN (JSON-LD gtin13, sinon itemprop)
+        with self._field("ean_verif"):
+            if not product.get("ean_verif"):
+                ean_elem = soup.find("span", itemprop="gtin13")
+                if ean_elem:
+                    product["ean_verif"] = self._text_or_empty(ean_elem)
 
             # ✅ VALIDATION EAN : Vérifier que l'EAN extrait correspond au code EAN recherché
-            if extracted_ean and extracted_ean != ean:
-                raise ValueError(
-                    f"❌ EAN non correspondant : recherché={ean}, trouvé={extracted_ean}. "
-                    f"Le produit sur cette page n'est pas celui demandé."
-                )
+            self._check_ean(product.get("ean_verif"), ean)
 
         # 5. CONTENANCE (recherche dans les td)
-        contenance_match = re.search(r'<td[^>]*>([^<]*\d+\s*(?:ml|mL|ML|cl|CL)[^<]*)</td>', html, re.IGNORECASE)
-        if contenance_match:
-            product["contenance"] = self._clean_entities(contenance_match.group(1))
+        with self._field("contenance"):
+            contenance_match = re.search(r'<td[^>]*>([^<]*\d+\s*(?:ml|mL|ML|cl|CL)[^<]*)</td>', html, re.IGNORECASE)
+            if contenance_match:
+                product["contenance"] = self._clean_entities(contenance_match.group(1))
 
         # 6. FORME
-        forme_match = re.search(r'<td[^>]*>([^<]*(?:Crème|Gel|Lotion|Spray|Tube|Flacon|Huile|Sérum)[^<]*)</td>', html, re.IGNORECASE)
-        if forme_match:
-            product["forme"] = self._clean_entities(forme_match.group(1))
+        with self._field("forme"):
+            forme_match = re.search(r'<td[^>]*>([^<]*(?:Crème|Gel|Lotion|Spray|Tube|Flacon|Huile|Sérum)[^<]*)</td>', html, re.IGNORECASE)
+            if forme_match:
+                product["forme"] = self._clean_entities(forme_match.group(1))
 
         # 7. NOTE GÉNÉRALE
-        note_match = re.search(r'class="bvseo-ratingValue"[^>]*>([0-9.]+)', html)
-        if note_match:
-            product["note"] = note_match.group(1) + "/5"
+        with self._field("note"):
+            if not product.get("note"):
+                note_match = re.search(r'class="bvseo-ratingValue"[^>]*>([0-9.]+)', html)
+                if note_match:
+                    product["note"] = note_match.group(1) + "/5"
 
-        nb_avis_match = re.search(r'class="bvseo-reviewCount"[^>]*>(\d+)', html)
-        if nb_avis_match:
-            product["nb_avis"] = nb_avis_match.group(1)
+            if not product.get("nb_avis"):
+                nb_avis_match = re.search(r'class="bvseo-reviewCount"[^>]*>(\d+)', html)
+                if nb_avis_match:
+                    product["nb_avis"] = nb_avis_match.group(1)
 
         # 8. COMPOSITION
-        comp_div = soup.find("div", class_="longcompo")
-        if comp_div:
-            p_tag = comp_div.find("p")
-            if p_tag:
-                product["composition"] = self._text_or_empty(p_tag)
+        with self._field("composition"):
+            comp_div = soup.find("div", class_="longcompo")
+            if comp_div:
+                p_tag = comp_div.find("p")
+                if p_tag:
+                    product["composition"] = self._text_or_empty(p_tag)
 
         # 9. CONSEILS D'UTILISATION
-        conseils_div = soup.find("div", id="type_info_prio_6_1")
-        if conseils_div:
-            p_tag = conseils_div.find("p")
-            if p_tag:
-                product["conseils"] = self._text_or_empty(p_tag)
+        with self._field("conseils"):
+            conseils_div = soup.find("div", id="type_info_prio_6_1")
+            if conseils_div:
+                p_tag = conseils_div.find("p")
+                if p_tag:
+                    product["conseils"] = self._text_or_empty(p_tag)
 
-        # 10. AVIS CLIENTS (extraction depuis bvseo-reviewsSection)
-        product["avis_clients"] = self._extract_cocooncenter_reviews(soup, html)
+        # 10. AVIS CLIENTS (JSON-LD, sinon bvseo-reviewsSection)
+        with self._field("avis_clients"):
+            if not product.get("avis_clients"):
+                product["avis_clients"] = self._extract_cocooncenter_reviews(soup, html)
 
+        # Libère l'arbre tout de suite (références circulaires parent/enfant)
+        soup.decompose()
         return product
 
-    def _extract_cocooncenter_reviews(self, soup: BeautifulSoup, html: str) -> List[Dict]:
+    def _extract_cocooncenter_reviews(self, soup: BeautifulSoup, html: str) -> List[Review]:
         """Extrait les avis depuis bvseo-reviewsSection (méthode bash)."""
-        reviews: List[Dict] = []
+        reviews: List[Review] = []
 
         # Chercher la section des avis
         reviews_section = soup.find("div", id="bvseo-reviewsSection")
@@ -258,7 +527,7 @@ class CocooncenterScraper(BaseScraper):
         review_divs = reviews_section.find_all("div", class_="bvseo-review")
 
         for review_div in review_divs[:5]:  # Top 5 avis
-            review_data = {}
+            review_data = Review()
 
             # Note (itemprop="ratingValue")
             rating_span = review_div.find("span", itemprop="ratingValue")
@@ -284,114 +553,72 @@ class CocooncenterScraper(BaseScraper):
 
         return reviews
 
-    def _extract_reviews_from_jsonld(self, soup: BeautifulSoup) -> List[Dict]:
-        """Extrait les avis clients depuis les blocs JSON-LD."""
-        reviews: List[Dict] = []
-
-        def collect(obj: object) -> None:
-            if isinstance(obj, dict):
-                if obj.get("@type") == "Review":
-                    reviews.append(obj)
-                for value in obj.values():
-                    collect(value)
-            elif isinstance(obj, list):
-                for item in obj:
-                    collect(item)
-
-        for script in soup.find_all("script", type="application/ld+json"):
-            content = (script.string or "").strip()
-            if not content:
-                continue
-            try:
-                data = json.loads(content)
-            except json.JSONDecodeError:
-                continue
-            collect(data)
-
-        formatted_reviews: List[Dict] = []
-        for review in reviews[:5]:
-            author = review.get("author")
-            if isinstance(author, dict):
-                author = author.get("name")
-
-            formatted_reviews.append({
-                "auteur": self._clean_entities(author or "Anonyme"),
-                "avis": self._clean_entities(review.get("reviewBody", "")),
-                "note": f"{review.get('reviewRating', {}).get('ratingValue', 'N/A')}/5"
-                if isinstance(review.get("reviewRating"), dict)
-                else self._clean_entities(str(review.get("reviewRating", ""))),
-                "date": review.get("datePublished"),
-            })
-
-        return formatted_reviews
-
 
 class PharmaGDDScraper(BaseScraper):
     """Scraper Pharma-GDD (anti-403 avec retries)."""
 
-    def extract(self, url: str, ean: str) -> Dict:
-        product = {
-            "site": "Pharma-GDD",
-            "ean": ean,
-            "url": url,
-            "avis_clients": [],
-        }
-
-        response = self._fetch_with_retry(url, max_retries=MAX_RETRIES + 2)
-        html = response.text
-        soup = BeautifulSoup(html, "html.parser")
-
-        json_fields = {
-            "titre": r'"name":"([^"]*)"',
-            "description": r'"description":"([^"]*)"',
-            "note": r'"ratingValue":([0-9.]+)',
-            "nb_avis": r'"reviewCount":([0-9]+)',
-        }
-        for key, pattern in json_fields.items():
-            match = re.search(pattern, html)
-            if match:
-                value = self._clean_entities(match.group(1))
-                if key == "note":
-                    value = f"{value}/5"
-                product[key] = value
-
-        price_match = re.search(r'<span data-js-product-price[^>]*>([^<]*)', html)
-        if price_match:
-            product["prix"] = self._clean_entities(price_match.group(1))
-
-        ean_match = re.search(r'<span data-js-product-reference[^>]*>([^<]*)', html)
-        if ean_match:
-            extracted_ean = self._clean_entities(ean_match.group(1))
-            product["ean_verif"] = extracted_ean
-
-            # ✅ VALIDATION EAN : Vérifier que l'EAN extrait correspond au code EAN recherché
-            if extracted_ean and extracted_ean != ean:
-                raise ValueError(
-                    f"❌ EAN non correspondant : recherché={ean}, trouvé={extracted_ean}. "
-                    f"Le produit sur cette page n'est pas celui demandé."
-                )
-
-        custom_match = re.search(r'<span data-js-custom-code[^>]*>([^<]*)', html)
-        if custom_match:
-            product["code_custom"] = self._clean_entities(custom_match.group(1))
-
-        brand_match = re.search(r'<a class="brand"[^>]*title="[^"]*"[^>]*>([^<]*)', html)
-        if brand_match:
-            product["marque"] = self._clean_entities(brand_match.group(1))
-
-        comp_div = soup.find("div", id="Composition")
-        if comp_div:
-            product["composition"] = self._text_or_empty(comp_div.find("div", class_="text"))
-
-        conseils_div = soup.find("div", id="usages")
-        if conseils_div:
-            product["conseils"] = self._text_or_empty(conseils_div.find("div", class_="text"))
-
-        product["avis_clients"] = self._extract_flipcard_reviews(soup)
+    site_key = "pharmagdd"
+    jsonld_fields = ("titre", "description", "note", "nb_avis", "ean_verif", "marque")
+    scanner = FieldScanner(
+        # Secours si le bloc JSON-LD est absent ou illisible
+        r'"name":"(?P<titre>[^"]*)"',
+        r'"description":"(?P<description>[^"]*)"',
+        r'"ratingValue":(?P<note>[0-9.]+)',
+        r'"reviewCount":(?P<nb_avis>[0-9]+)',
+        r'<span data-js-product-price[^>]*>(?P<prix>[^<]*)',
+        r'<span data-js-product-reference[^>]*>(?P<ean_verif>[^<]*)',
+        r'<span data-js-custom-code[^>]*>(?P<code_custom>[^<]*)',
+        r'<a class="brand"[^>]*title="[^"]*"[^>]*>(?P<marque>[^<]*)',
+    )
+
+    def extract(self, url: str, ean: str, deadline: Optional[Deadline] = None) -> ProductRecord:
+        with span("fetch", self.site_key):
+            response = self._fetch_with_retry(url, max_retries=MAX_RETRIES + 2, deadline=deadline)
+        with span("parse", self.site_key):
+            return self.parse(response.text, url, ean)
+
+    def parse(self, html: str, url: str, ean: str) -> ProductRecord:
+        """Extrait les données produit d'une page déjà récupérée (sans réseau)."""
+        product = ProductRecord(site="Pharma-GDD", ean=ean, url=url, avis_clients=[])
+
+        with self._field("jsonld"):
+            self._apply_jsonld(product, html)
+
+        with self._field("scan"):
+            # Champs déjà lus dans le JSON-LD ignorés
+            found = self.scanner.scan(html, skip=product.keys())
+
+        with self._field("soup"):
+            soup = self._soup(html)
+
+        for key in ("titre", "description", "note", "nb_avis", "prix", "ean_verif", "code_custom", "marque"):
+            if key in found:
+                value = self._clean_entities(found[key])
+                product[key] = f"{value}/5" if key == "note" else value
+
+        # ✅ VALIDATION EAN : Vérifier que l'EAN extrait correspond au code EAN recherché
+        with self._field("ean_verif"):
+            self._check_ean(product.get("ean_verif"), ean)
+
+        with self._field("composition"):
+            comp_div = soup.find("div", id="Composition")
+            if comp_div:
+                product["composition"] = self._text_or_empty(comp_div.find("div", class_="text"))
+
+        with self._field("conseils"):
+            conseils_div = soup.find("div", id="usages")
+            if conseils_div:
+                product["conseils"] = self._text_or_empty(conseils_div.find("div", class_="text"))
+
+        with self._field("avis_clients"):
+            product["avis_clients"] = self._extract_flipcard_reviews(soup)
+
+        # Libère l'arbre tout de suite (références circulaires parent/enfant)
+        soup.decompose()
         return product
 
-    def _extract_flipcard_reviews(self, soup: BeautifulSoup) -> List[Dict]:
-        reviews: List[Dict] = []
+    def _extract_flipcard_reviews(self, soup: BeautifulSoup) -> List[Review]:
+        reviews: List[Review] = []
         for card in soup.find_all("div", class_="flip-card", limit=10):
             texte = card.find("p")
             if not texte:
@@ -401,12 +628,12 @@ class PharmaGDDScraper(BaseScraper):
             date = card.find("div", class_="date")
             auteur_match = re.search(r"par\s+([^\n\r]+)", card.get_text())
 
-            reviews.append({
-                "avis": self._text_or_empty(texte),
-                "note": f"{stars}/5" if stars else "N/A",
-                "date": self._clean_entities(date.get_text(strip=True) if date else ""),
-                "auteur": self._clean_entities(auteur_match.group(1)) if auteur_match else "Anonyme",
-            })
+            reviews.append(Review(
+                avis=self._text_or_empty(texte),
+                note=f"{stars}/5" if stars else "N/A",
+                date=self._clean_entities(date.get_text(strip=True) if date else ""),
+                auteur=self._clean_entities(auteur_match.group(1)) if auteur_match else "Anonyme",
+            ))
 
         return reviews
 
@@ -414,118 +641,128 @@ class PharmaGDDScraper(BaseScraper):
 class DrakkarsScraper(BaseScraper):
     """Scraper Pharmacie des Drakkars (extraction complète)."""
 
-    def extract(self, url: str, ean: str) -> Dict:
-        product = {
-            "site": "Pharmacie des Drakkars",
-            "ean": ean,
-            "url": url,
-            "avis_clients": [],
-        }
-
-        response = self._fetch_with_retry(url)
-        html = response.text
-        soup = BeautifulSoup(html, "html.parser")
-
-        if soup.title:
-            product["titre"] = self._clean_entities(soup.title.get_text())
-
-        price_match = re.search(r'class="pdt-detail-price[^>]*><strong>([0-9,]+)', html)
-        if price_match:
-            product["prix"] = price_match.group(1) + "€"
-
-        ref_elem = soup.find(id="product_reference")
-        if ref_elem:
-            extracted_ref = self._text_or_empty(ref_elem)
-            product["reference"] = extracted_ref
-
-            # ✅ VALIDATION EAN : Vérifier que la référence correspond au code EAN recherché
-            if extracted_ref != ean:
-                raise ValueError(
-                    f"❌ EAN non correspondant : recherché={ean}, trouvé={extracted_ref}. "
-                    f"Le produit sur cette page n'est pas celui demandé."
-                )
-
-        variantes = {
-            self._clean_entities(a.get("title", ""))
-            for a in soup.select('a[title*="mL"], a[title*="ml"], a[title*="ML"]')
-            if a.get("title")
-        }
-        if variantes:
-            product["variantes"] = " | ".join(sorted(variantes))
-
-        desc_article = soup.find("article", class_="desc-longue")
-        if desc_article:
-            product["description"] = self._text_or_empty(desc_article)
-
-        comp_div = soup.find("div", id="upcomposition")
-        if comp_div:
-            product["composition"] = self._text_or_empty(comp_div)
-
-        note_match = re.search(r'<span class="text-bold">([0-9]/[0-9])</span>', html)
-        if note_match:
-            product["note"] = note_match.group(1)
-
-        avis_match = re.search(
-            r'<span class="text-bold">[0-9]/[0-9]</span>\s*\|\s*<span>([0-9]+)',
-            html,
-        )
-        if avis_match:
-            product["nb_avis"] = avis_match.group(1)
-
-        pourcentage_match = re.search(
-            r'class="fa-4x text-bold has-color-theme">([0-9]+%)',
-            html,
-        )
-        if pourcentage_match:
-            product["pourcentage_reco"] = pourcentage_match.group(1)
-
-        product["avis_clients"] = self._extract_drakkars_reviews(html, soup)
-
-        conseils_section = soup.find(string=re.compile(r"Avis du pharmacien", re.IGNORECASE))
-        if conseils_section:
-            paragraph = conseils_section.find_parent().find_next("p")
-            if paragraph:
-                product["conseils_pharmacien"] = self._text_or_empty(paragraph)
-
-        return product
-
-    def _extract_drakkars_reviews(self, html: str, soup: BeautifulSoup) -> List[Dict]:
-        """Extraire un avis client principal depuis le JSON ou le HTML."""
-        reviews: List[Dict] = []
-
-        json_match = re.search(r'"review"\s*:\s*\{([^}]+)\}', html)
-        if json_match:
-            json_section = json_match.group(0)
-
-            auteur_match = re.search(r'"name":\s*"([^"]*)"', json_section)
-            avis_match = re.search(r'"reviewBody":\s*"([^"]*)"', json_section)
-            note_match = re.search(r'"ratingValue":\s*([0-9]+)', json_section)
-
-            review = {
-                "auteur": self._clean_entities(auteur_match.group(1)) if auteur_match else "Anonyme",
-                "avis": self._clean_entities(avis_match.group(1)) if avis_match else "",
-                "note": f"{note_match.group(1)}/5" if note_match else "N/A",
+    site_key = "drakkars"
+    jsonld_fields = ("marque", "note", "nb_avis", "avis_clients")
+    scanner = FieldScanner(
+        r'class="pdt-detail-price[^>]*><strong>(?P<prix>[0-9,]+)',
+        # Le nombre d'avis suit la note : un seul motif pour les deux
+        # (lookbehind : tous les motifs commencent par class=", préfixe commun rapide)
+        r'class="text-bold">(?<=<span class="text-bold">)(?P<note>[0-9]/[0-9])</span>'
+        r'(?:\s*\|\s*<span>(?P<nb_avis>[0-9]+))?',
+        r'class="fa-4x text-bold has-color-theme">(?P<pourcentage_reco>[0-9]+%)',
+        # Date du premier avis (affichée seulement dans la page)
+        r'class="gris-clair">\s*(?P<date_avis>[0-9.]+)',
+    )
+
+    def extract(self, url: str, ean: str, deadline: Optional[Deadline] = None) -> ProductRecord:
+        with span("fetch", self.site_key):
+            response = self._fetch_with_retry(url, deadline=deadline)
+        with span("parse", self.site_key):
+            return self.parse(response.text, url, ean)
+
+    def parse(self, html: str, url: str, ean: str) -> ProductRecord:
+        """Extrait les données produit d'une page déjà récupérée (sans réseau)."""
+        product = ProductRecord(site="Pharmacie des Drakkars", ean=ean, url=url, avis_clients=[])
+
+        with self._field("jsonld"):
+            self._apply_jsonld(product, html)
+
+        with self._field("scan"):
+            found = self.scanner.scan(html, skip=product.keys())
+
+        with self._field("soup"):
+            soup = self._soup(html)
+
+        with self._field("titre"):
+            if soup.title:
+                product["titre"] = self._clean_entities(soup.title.get_text())
+
+        with self._field("prix"):
+            if "prix" in found:
+                product["prix"] = found["prix"] + "€"
+
+        with self._field("reference"):
+            ref_elem = soup.find(id="product_reference")
+            if ref_elem:
+                extracted_ref = self._text_or_empty(ref_elem)
+                product["reference"] = extracted_ref
+
+                # ✅ VALIDATION EAN : Vérifier que la référence correspond au code EAN recherché
+                if extracted_ref != ean:
+                    raise ValueError(
+                        f"❌ EAN non correspondant : recherché={ean}, trouvé={extracted_ref}. "
+                        f"Le produit sur cette page n'est pas celui demandé."
+                    )
+
+        with self._field("variantes"):
+            variantes = {
+                self._clean_entities(a.get("title", ""))
+                for a in soup.select('a[title*="mL"], a[title*="ml"], a[title*="ML"]')
+                if a.get("title")
             }
+            if variantes:
+                product["variantes"] = " | ".join(sorted(variantes))
+
+        with self._field("description"):
+            desc_article = soup.find("article", class_="desc-longue")
+            if desc_article:
+                product["description"] = self._text_or_empty(desc_article)
+
+        with self._field("composition"):
+            comp_div = soup.find("div", id="upcomposition")
+            if comp_div:
+                product["composition"] = self._text_or_empty(comp_div)
+
+        with self._field("note"):
+            if not product.get("note") and "note" in found:
+                product["note"] = found["note"]
+
+            if not product.get("nb_avis") and "nb_avis" in found:
+                product["nb_avis"] = found["nb_avis"]
+
+        with self._field("pourcentage_reco"):
+            if "pourcentage_reco" in found:
+                product["pourcentage_reco"] = found["pourcentage_reco"]
+
+        with self._field("avis_clients"):
+            reviews = product.get("avis_clients")
+            if reviews:
+                # Date de l'avis JSON-LD : affichée seulement dans la page
+                if "date_avis" in found and not reviews[0].get("date"):
+                    reviews[0]["date"] = found["date_avis"]
+            else:
+                product["avis_clients"] = self._extract_drakkars_reviews(soup)
+
+        with self._field("conseils_pharmacien"):
+            conseils_section = soup.find(string=re.compile(r"Avis du pharmacien", re.IGNORECASE))
+            if conseils_section:
+                paragraph = conseils_section.find_parent().find_next("p")
+                if paragraph:
+                    product["conseils_pharmacien"] = self._text_or_empty(paragraph)
+
+        # Libère l'arbre tout de suite (références circulaires parent/enfant)
+        soup.decompose()
+        return product
 
-            date_match = re.search(r'class="gris-clair">\s*([0-9.]+)', html)
-            if date_match:
-                review["date"] = date_match.group(1)
-
-            if review["avis"]:
-                reviews.append(review)
+    def _review_from_jsonld(self, review: Dict[str, Any]) -> Review:
+        # Drakkars place le nom de l'auteur dans le "name" de l'avis (auteur sans nom)
+        result = super()._review_from_jsonld(review)
+        if not jsonld.review_author(review) and "titre" in result:
+            result["auteur"] = result.pop("titre")
+        return result
 
-        if reviews:
-            return reviews
+    def _extract_drakkars_reviews(self, soup: BeautifulSoup) -> List[Review]:
+        """Extraire un avis client principal depuis la section HTML des avis."""
+        reviews: List[Review] = []
 
-        # Fallback: essayer de récupérer via la section HTML des avis
         avis_section = soup.find("div", id="avis")
         if avis_section:
             first_review = avis_section.find("div", class_="avis")
             if first_review:
-                reviews.append({
-                    "auteur": self._text_or_empty(first_review.find("span", class_="auteur")),
-                    "avis": self._text_or_empty(first_review.find("p")),
-                    "note": self._text_or_empty(first_review.find("span", class_="note")),
-                })
+                reviews.append(Review(
+                    auteur=self._text_or_empty(first_review.find("span", class_="auteur")),
+                    avis=self._text_or_empty(first_review.find("p")),
+                    note=self._text_or_empty(first_review.find("span", class_="note")),
+                ))
 
         return reviews
@@ -1,30 +1,51 @@
+from __future__ import annotations
+
+import logging
 import re
 import time
-from typing import Optional, Tuple
+from typing import TYPE_CHECKING, Optional, Tuple
 
 import requests
-from bs4 import BeautifulSoup
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.firefox.options import Options
-from selenium.webdriver.firefox.service import Service
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
 
-from config import DEFAULT_USER_AGENT, SEARCH_TIMEOUT, TOR_PROXY
+from cassette import get_cassette, mount_cassette
+from concurrency import BLOCKED, Slot, get_site_limiter
+from config import (
+    COCOONCENTER_BASE_URL,
+    DEFAULT_USER_AGENT,
+    DRAKKARS_BASE_URL,
+    DRAKKARS_USE_TOR,
+    PHARMAGDD_BASE_URL,
+    REQUEST_TIMEOUT,
+    SEARCH_TIMEOUT,
+    TOR_PROXY,
+)
+from deadline import Deadline, DeadlineExceeded
+from timing import span
+from tor_fleet import get_tor_fleet
+from transport import contains_block_marker, detect_block
+
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger(__name__)
 
 
 """
 Modules de recherche rapide par EAN.
 Les recherches ne passent pas par Tor afin de réduire la latence.
+`search()` retourne (found, url[, label]) ; found vaut None quand la recherche n'a pas
+pu conclure (erreur réseau, blocage), False quand le site ne référence pas le produit.
+Selenium (recherche Drakkars) n'est importé qu'à la première recherche qui l'utilise.
 """
 
 
 class BaseSearcher:
     """Classe de base pour les modules de recherche."""
 
+    site_key = ""  # Clé du site (limiteur de concurrence, statistiques)
+
     def __init__(self) -> None:
-        self.session = requests.Session()
+        self.session = mount_cassette(requests.Session())
         self.session.headers.update({
             "User-Agent": DEFAULT_USER_AGENT,
             "Accept-Language": "fr-FR,fr;q=0.9,en-US;q=0.8,en;q=0.7",
@@ -34,9 +55,12 @@ class BaseSearcher:
 class CocooncenterSearcher(BaseSearcher):
     """Recherche produits sur Cocooncenter."""
 
-    def search(self, ean: str) -> Tuple[bool, Optional[str]]:
+    site_key = "cocooncenter"
+
+    def search(self, ean: str, deadline: Optional[Deadline] = None) -> Tuple[Optional[bool], Optional[str]]:
         """Recherche par EAN sur Cocooncenter."""
-        url = "https://www.cocooncenter.com/index/search/searchVue"
+        deadline = deadline or Deadline()
+        url = f"{COCOONCENTER_BASE_URL}/index/search/searchVue"
         headers = {
             "Content-Type": "application/x-www-form-urlencoded; charset=UTF-8",
             "X-Requested-With": "XMLHttpRequest"
@@ -44,9 +68,12 @@ class CocooncenterSearcher(BaseSearcher):
         data = {"recherche": ean}
 
         try:
-            response = self.session.post(
-                url, headers=headers, data=data, timeout=SEARCH_TIMEOUT
-            )
+            with get_site_limiter(self.site_key).slot(deadline) as slot:
+                response = self.session.post(
+                    url, headers=headers, data=data, timeout=deadline.timeout(SEARCH_TIMEOUT)
+                )
+                if detect_block(response):
+                    slot.outcome = BLOCKED
             response.raise_for_status()
             payload = response.json()
 
@@ -54,23 +81,31 @@ class CocooncenterSearcher(BaseSearcher):
                 urls = re.findall(r'href="(/[^"]+\.html)"', payload.get("vue", ""))
                 product_urls = [u for u in urls if not u.startswith("/c/")]
                 if product_urls:
-                    return True, "https://www.cocooncenter.com" + product_urls[0]
+                    return True, COCOONCENTER_BASE_URL + product_urls[0]
             return False, None
         except Exception as exc:  # noqa: BLE001
-            print(f"   ⚠️  Erreur Cocooncenter: {exc}")
-            return False, None
+            logger.warning("⚠️  Erreur Cocooncenter: %s", exc)
+            return None, None
 
 
 class PharmaGDDSearcher(BaseSearcher):
     """Recherche produits sur Pharma-GDD."""
 
-    def search(self, ean: str) -> Tuple[bool, Optional[str], Optional[str]]:
+    site_key = "pharmagdd"
+
+    def search(
+        self, ean: str, deadline: Optional[Deadline] = None
+    ) -> Tuple[Optional[bool], Optional[str], Optional[str]]:
         """Recherche par EAN sur Pharma-GDD."""
-        url = f"https://www.pharma-gdd.com/fr/search/autocomplete?s={ean}"
+        deadline = deadline or Deadline()
+        url = f"{PHARMAGDD_BASE_URL}/fr/search/autocomplete?s={ean}"
         headers = {"X-Requested-With": "XMLHttpRequest"}
 
         try:
-            response = self.session.get(url, headers=headers, timeout=SEARCH_TIMEOUT)
+            with get_site_limiter(self.site_key).slot(deadline) as slot:
+                response = self.session.get(url, headers=headers, timeout=deadline.timeout(SEARCH_TIMEOUT))
+                if detect_block(response):
+                    slot.outcome = BLOCKED
             response.raise_for_status()
             data = response.json()
 
@@ -80,18 +115,20 @@ class PharmaGDDSearcher(BaseSearcher):
                     (None, None),
                 )
                 if val:
-                    product_url = "https://www.pharma-gdd.com" + val["href"]
+                    product_url = PHARMAGDD_BASE_URL + val["href"]
                     return True, product_url, val.get("label")
             return False, None, None
         except Exception as exc:  # noqa: BLE001
-            print(f"   ⚠️  Erreur Pharma-GDD: {exc}")
-            return False, None, None
+            logger.warning("⚠️  Erreur Pharma-GDD: %s", exc)
+            return None, None, None
 
 
 class DrakkarsSearcher:
     """Recherche produits sur Pharmacie des Drakkars via Selenium + Tor."""
 
-    BASE_URL = "https://www.pharmaciedesdrakkars.com"
+    site_key = "drakkars"
+
+    BASE_URL = DRAKKARS_BASE_URL
     # fallback layer hash (observé côté site). Si un jour il change, on garde le chemin "input" qui n'en dépend pas.
     LAYER_HASH_PREFIX = "#6a37/fullscreen/m=and&q="
 
@@ -99,19 +136,25 @@ class DrakkarsSearcher:
         """Initialise le searcher (le driver sera créé à la demande)."""
         self.driver = None
 
-    def _create_driver(self) -> webdriver.Firefox:
-        """Crée un driver Firefox configuré avec Tor."""
+    def _create_driver(self, deadline: Optional[Deadline] = None) -> webdriver.Firefox:
+        """Crée un driver Firefox configuré avec Tor (démon de la flotte attendu dans la limite de `deadline`)."""
+        from selenium import webdriver
+        from selenium.webdriver.firefox.options import Options
+
         options = Options()
         options.add_argument("--headless")
         options.add_argument("--width=1400")
         options.add_argument("--height=1800")
 
         # Proxy Tor (SOCKS5) + DNS distant
-        options.set_preference("network.proxy.type", 1)
-        options.set_preference("network.proxy.socks", "127.0.0.1")
-        options.set_preference("network.proxy.socks_port", 9050)
-        options.set_preference("network.proxy.socks_version", 5)
-        options.set_preference("network.proxy.socks_remote_dns", True)
+        if DRAKKARS_USE_TOR:
+            options.set_preference("network.proxy.type", 1)
+            options.set_preference("network.proxy.socks", "127.0.0.1")
+            fleet = get_tor_fleet()
+            socks_port = fleet.acquire(deadline).socks_port if fleet is not None else 9050
+            options.set_preference("network.proxy.socks_port", socks_port)
+            options.set_preference("network.proxy.socks_version", 5)
+            options.set_preference("network.proxy.socks_remote_dns", True)
 
         # UA + langues (réduit les frictions côté front/CDN)
         options.set_preference("general.useragent.override", DEFAULT_USER_AGENT)
@@ -121,15 +164,20 @@ class DrakkarsSearcher:
         options.set_preference("dom.webdriver.enabled", False)
         options.set_preference("useAutomationExtension", False)
 
-        # Si tu as geckodriver dans un chemin spécifique, active la ligne suivante:
+        # Si tu as geckodriver dans un chemin spécifique, active les lignes suivantes:
+        # from selenium.webdriver.firefox.service import Service
         # service = Service("/usr/local/bin/geckodriver")
         # return webdriver.Firefox(service=service, options=options)
         return webdriver.Firefox(options=options)
 
-    def _close_cookies_if_any(self, driver: webdriver.Firefox) -> None:
+    def _close_cookies_if_any(self, driver: webdriver.Firefox, deadline: Deadline) -> None:
         """Ferme un éventuel bandeau cookies s'il est présent (best-effort)."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
         try:
-            WebDriverWait(driver, 6).until(
+            WebDriverWait(driver, deadline.timeout(6)).until(
                 EC.element_to_be_clickable((
                     By.CSS_SELECTOR,
                     "button[aria-label*='Accepter'], .didomi-accept-button, "
@@ -139,9 +187,13 @@ class DrakkarsSearcher:
         except Exception:
             pass  # pas de popin détectée
 
-    def _collect_product_url(self, driver: webdriver.Firefox) -> Optional[str]:
+    def _collect_product_url(self, driver: webdriver.Firefox, deadline: Deadline) -> Optional[str]:
         """Récupère la première URL produit depuis le layer Doofinder."""
-        wait = WebDriverWait(driver, 30)
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        wait = WebDriverWait(driver, deadline.timeout(30))
 
         # attendre le conteneur résultats
         wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".dfd-results")))
@@ -167,16 +219,46 @@ class DrakkarsSearcher:
             return urls[0].split("?")[0]
         return None
 
-    def search(self, ean: str) -> Tuple[bool, Optional[str]]:
+    def search(self, ean: str, deadline: Optional[Deadline] = None) -> Tuple[Optional[bool], Optional[str]]:
         """Recherche par EAN sur Pharmacie des Drakkars via interface web (Tor)."""
+        deadline = deadline or Deadline()
+        cassette = get_cassette()
+        if cassette is not None:
+            # Le navigateur ne passe pas par requests : seul le résultat est enregistré/rejoué
+            try:
+                found, url = cassette.call(f"drakkars-search:{ean}", lambda: list(self._search_in_slot(ean, deadline)))
+            except requests.ConnectionError as exc:
+                logger.warning("⚠️  Erreur Drakkars: %s", exc)
+                return None, None
+            return found, url
+        return self._search_in_slot(ean, deadline)
+
+    def _search_in_slot(self, ean: str, deadline: Deadline) -> Tuple[Optional[bool], Optional[str]]:
+        """Recherche dans un créneau du limiteur de concurrence Drakkars."""
+        try:
+            with get_site_limiter(self.site_key).slot(deadline) as slot:
+                return self._search(ean, deadline, slot)
+        except DeadlineExceeded as exc:
+            logger.warning("⚠️  Erreur Drakkars: %s", exc)
+            return None, None
+
+    def _search(self, ean: str, deadline: Deadline, slot: Slot) -> Tuple[Optional[bool], Optional[str]]:
+        """Recherche Selenium ; `slot.outcome` est marqué BLOCKED si une page de challenge est servie."""
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.common.keys import Keys
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+
         driver = None
         try:
-            driver = self._create_driver()
-            wait = WebDriverWait(driver, 40)
+            with span("browser", self.site_key):
+                driver = self._create_driver(deadline)
+            driver.set_page_load_timeout(deadline.timeout(REQUEST_TIMEOUT))
+            wait = WebDriverWait(driver, deadline.timeout(40))
 
             # 1) ouvrir la home
             driver.get(self.BASE_URL)
-            self._close_cookies_if_any(driver)
+            self._close_cookies_if_any(driver, deadline)
 
             # 2) chemin “input” (init du layer + saisie EAN)
             try:
@@ -196,11 +278,10 @@ class DrakkarsSearcher:
                 )
                 input_box.clear()
                 input_box.send_keys(ean)
-                from selenium.webdriver.common.keys import Keys  # import local pour éviter de casser tes imports
                 input_box.send_keys(Keys.ENTER)
 
                 # récupérer la première URL produit
-                product_url = self._collect_product_url(driver)
+                product_url = self._collect_product_url(driver, deadline)
                 if product_url:
                     return True, product_url
             except Exception:
@@ -210,20 +291,24 @@ class DrakkarsSearcher:
             # 3) fallback “hash layer” (ouvre directement le layer fullscreen avec la requête)
             try:
                 layer_url = f"{self.BASE_URL}/{self.LAYER_HASH_PREFIX}{ean}"
+                driver.set_page_load_timeout(deadline.timeout(REQUEST_TIMEOUT))
                 driver.get(layer_url)
-                self._close_cookies_if_any(driver)  # au cas où
-                product_url = self._collect_product_url(driver)
+                self._close_cookies_if_any(driver, deadline)  # au cas où
+                product_url = self._collect_product_url(driver, deadline)
                 if product_url:
                     return True, product_url
             except Exception:
                 pass
 
-            # rien trouvé
+            # rien trouvé (ou page de challenge : résultat indéterminé)
+            if contains_block_marker(driver.page_source or ""):
+                slot.outcome = BLOCKED
+                return None, None
             return False, None
 
         except Exception as exc:  # noqa: BLE001
-            print(f"   ⚠️  Erreur Drakkars: {exc}")
-            return False, None
+            logger.warning("⚠️  Erreur Drakkars: %s", exc)
+            return None, None
         finally:
             if driver:
                 driver.quit()
@@ -0,0 +1,249 @@
+"""
+Registre des sites (adaptateurs recherche + extraction) et statistiques de succès.
+
+Chaque pharmacie est déclarée une fois par `register_site()` : clé, nom affiché et
+classes de recherche et d'extraction désignées par "module:Classe" (importées à la
+première utilisation). Ajouter une pharmacie (ex: Pharmashopi, 1001pharmacies) ne
+demande qu'un appel à `register_site()`, sans toucher à l'orchestrateur.
+
+`HitRateStats` suit, par site, la proportion d'EAN trouvés selon le préfixe de l'EAN
+(préfixe pays GS1 puis préfixe entreprise, donc la marque) : un site qui ne référence
+jamais une marque est ignoré pour ses EAN, sauf une part d'exploration qui garde les
+statistiques à jour, et les sites les plus prometteurs sont interrogés en premier.
+"""
+
+from __future__ import annotations
+
+import atexit
+import importlib
+import json
+import logging
+import os
+import random
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from config import (
+    SITE_EXPLORE_RATE,
+    SITE_SKIP_MIN_TRIALS,
+    SITE_SKIP_THRESHOLD,
+    SITE_STATS_FILE,
+    SITE_STATS_MAX_TRIALS,
+    SITE_STATS_PREFIX_LENGTHS,
+    SITE_STATS_PRIOR_WEIGHT,
+)
+from metrics import SITE_SKIPS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SiteAdapter:
+    """Déclaration d'une pharmacie : classes de recherche et d'extraction ("module:Classe")."""
+
+    key: str
+    name: str
+    searcher: str
+    scraper: str
+
+
+_adapters: Dict[str, SiteAdapter] = {}
+
+
+def register_site(key: str, name: str, searcher: str, scraper: str) -> SiteAdapter:
+    """
+    Déclare (ou remplace) une pharmacie.
+
+    Args:
+        key: Clé du site (limiteurs, statistiques, résultats)
+        name: Nom affiché
+        searcher: Classe de recherche, ex: "searchers:CocooncenterSearcher" ; sa méthode
+            `search(ean, deadline)` retourne (found, url) ou (found, url, label)
+        scraper: Classe d'extraction, ex: "scrapers:CocooncenterScraper" ; sa méthode
+            `extract(url, ean, deadline)` retourne le produit
+    """
+    adapter = SiteAdapter(key, name, searcher, scraper)
+    _adapters[key] = adapter
+    return adapter
+
+
+def site_adapters() -> Dict[str, SiteAdapter]:
+    """Pharmacies déclarées, dans l'ordre de déclaration."""
+    return dict(_adapters)
+
+
+register_site("cocooncenter", "Cocooncenter", "searchers:CocooncenterSearcher", "scrapers:CocooncenterScraper")
+register_site("pharmagdd", "Pharma-GDD", "searchers:PharmaGDDSearcher", "scrapers:PharmaGDDScraper")
+register_site("drakkars", "Pharmacie des Drakkars", "searchers:DrakkarsSearcher", "scrapers:DrakkarsScraper")
+
+
+class SiteRegistry(Mapping):
+    """
+    Objets par site (searchers ou scrapers) créés au premier accès (thread-safe).
+
+    Les classes sont désignées par "module:Classe" : un module n'est importé, et un
+    objet construit, que si un site s'en sert réellement pendant l'exécution.
+    """
+
+    def __init__(self, classes: Dict[str, str]) -> None:
+        self._classes = dict(classes)
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, site_key: str) -> Any:
+        instance = self._instances.get(site_key)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(site_key)
+                if instance is None:
+                    module_name, class_name = self._classes[site_key].split(":")
+                    instance = getattr(importlib.import_module(module_name), class_name)()
+                    self._instances[site_key] = instance
+        return instance
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._classes))
+
+    def __len__(self) -> int:
+        return len(self._classes)
+
+    def __contains__(self, site_key: object) -> bool:
+        return site_key in self._classes
+
+    def pop(self, site_key: str, default: Any = None) -> Any:
+        """Retire un site (il ne sera plus utilisé par cet orchestrateur)."""
+        with self._lock:
+            self._classes.pop(site_key, None)
+            return self._instances.pop(site_key, default)
+
+
+class HitRateStats:
+    """Taux de succès des recherches par site et par préfixe d'EAN (thread-safe)."""
+
+    def __init__(
+        self,
+        state_file: Optional[str] = SITE_STATS_FILE,
+        prefix_lengths: Iterable[int] = SITE_STATS_PREFIX_LENGTHS,
+    ) -> None:
+        """
+        Args:
+            state_file: Fichier de persistance des compteurs (None ou "" = mémoire uniquement)
+            prefix_lengths: Longueurs de préfixe suivies, du plus général au plus précis
+        """
+        self.state_file = state_file
+        self.prefix_lengths = sorted(prefix_lengths)
+        # {site: {préfixe: [trouvés, recherches]}} ; le préfixe "" couvre tout le site
+        self._counts: Dict[str, Dict[str, List[float]]] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+        atexit.register(self.save)
+
+    def _prefixes(self, ean: str) -> List[str]:
+        return [""] + [ean[:length] for length in self.prefix_lengths if len(ean) > length]
+
+    def record(self, site: str, ean: str, found: bool) -> None:
+        """Enregistre le résultat d'une recherche aboutie (trouvé ou non)."""
+        with self._lock:
+            counts = self._counts.setdefault(site, {})
+            for prefix in self._prefixes(ean):
+                entry = counts.setdefault(prefix, [0.0, 0.0])
+                entry[0] += found
+                entry[1] += 1
+                if entry[1] > SITE_STATS_MAX_TRIALS:
+                    # Décroissance : les résultats récents pèsent davantage
+                    entry[0] /= 2
+                    entry[1] /= 2
+            self._dirty = True
+
+    def predict(self, site: str, ean: str) -> Tuple[float, float]:
+        """
+        Taux de succès estimé d'un site pour cet EAN.
+
+        Chaque niveau de préfixe est lissé vers le niveau plus général (a priori de poids
+        SITE_STATS_PRIOR_WEIGHT) : un préfixe peu observé hérite du taux du site.
+
+        Returns:
+            (taux estimé, nombre de recherches observées pour le préfixe le plus précis connu)
+        """
+        with self._lock:
+            counts = self._counts.get(site, {})
+            rate, trials = 0.5, 0.0
+            for prefix in self._prefixes(ean):
+                entry = counts.get(prefix)
+                if entry is None:
+                    break
+                hits, trials = entry
+                rate = (hits + SITE_STATS_PRIOR_WEIGHT * rate) / (trials + SITE_STATS_PRIOR_WEIGHT)
+            return rate, trials
+
+    def plan(self, sites: Iterable[str], ean: str) -> Tuple[List[str], List[str]]:
+        """
+        Sites à interroger pour cet EAN, les plus prometteurs d'abord, et sites ignorés.
+
+        Un site est ignoré si son taux estimé est sous SITE_SKIP_THRESHOLD après au moins
+        SITE_SKIP_MIN_TRIALS recherches, sauf tirage d'exploration (SITE_EXPLORE_RATE).
+        """
+        sites = list(sites)
+        predictions = {site: self.predict(site, ean) for site in sites}
+        selected, skipped = [], []
+        for site in sites:
+            rate, trials = predictions[site]
+            if trials >= SITE_SKIP_MIN_TRIALS and rate < SITE_SKIP_THRESHOLD and random.random() >= SITE_EXPLORE_RATE:
+                skipped.append(site)
+                SITE_SKIPS_TOTAL.inc(site)
+            else:
+                selected.append(site)
+        selected.sort(key=lambda site: -predictions[site][0])  # tri stable : ordre déclaré à égalité
+        return selected, skipped
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Taux global et nombre de préfixes suivis par site (exposé par /api/health)."""
+        with self._lock:
+            return {
+                site: {
+                    "hits": round(counts.get("", [0, 0])[0], 1),
+                    "trials": round(counts.get("", [0, 0])[1], 1),
+                    "rate": round(counts[""][0] / counts[""][1], 3) if counts.get("", [0, 0])[1] else None,
+                    "prefixes": len(counts) - ("" in counts),
+                }
+                for site, counts in self._counts.items()
+            }
+
+    def _load(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as handle:
+                self._counts = json.load(handle)
+        except (OSError, json.JSONDecodeError) as exc:
+            logger.warning("⚠️  Statistiques des sites illisibles (%s): %s", self.state_file, exc)
+
+    def save(self) -> None:
+        """Écrit les compteurs sur disque (écriture atomique)."""
+        if not self.state_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._counts, separators=(",", ":"))
+            self._dirty = False
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(snapshot)
+        os.replace(tmp_path, self.state_file)
+
+
+_shared_stats: Optional[HitRateStats] = None
+_shared_lock = threading.Lock()
+
+
+def get_hit_rate_stats() -> HitRateStats:
+    """Retourne les statistiques partagées par tous les orchestrateurs."""
+    global _shared_stats
+    with _shared_lock:
+        if _shared_stats is None:
+            _shared_stats = HitRateStats()
+        return _shared_stats
@@ -0,0 +1,9 @@
+"""Configuration commune des tests : aucun fichier d'état écrit dans le dépôt."""
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cwd(tmp_path, monkeypatch):
+    """Chaque test s'exécute dans un répertoire temporaire (spool, empreintes, statistiques)."""
+    monkeypatch.chdir(tmp_path)
@@ -0,0 +1,118 @@
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+import api_checker
+from deadline import Deadline
+from api_checker import BackendCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_negative_results_expire_first(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(api_checker.time, "monotonic", clock.monotonic)
+    cache = BackendCache(ttl=100, negative_ttl=10, max_entries=10)
+    cache.set("found", (True, {"id": 1}))
+    cache.set("missing", (False, None))
+
+    clock.now += 20
+    assert cache.get("missing") is None
+    assert cache.get("found") == (True, {"id": 1})
+
+    clock.now += 100
+    assert cache.get("found") is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = BackendCache(ttl=100, negative_ttl=100, max_entries=2)
+    cache.set("a", (True, None))
+    cache.set("b", (True, None))
+    cache.get("a")  # "b" devient le moins récemment utilisé
+    cache.set("c", (True, None))
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+class FakeResponse:
+    def __init__(self, data: dict) -> None:
+        self.data = data
+
+    def raise_for_status(self) -> None:
+        pass
+
+    def json(self) -> dict:
+        return self.data
+
+
+class FakeBackend:
+    """Backend Magento simulé : catalogue d'EAN connus, EAN dont la requête échoue."""
+
+    def __init__(self, known=(), failing=()) -> None:
+        self.known = set(known)
+        self.failing = set(failing)
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        query = parse_qs(urlparse(url).query)
+        eans = query["searchCriteria[filter_groups][0][filters][0][value]"][0].split(",")
+        if self.failing.intersection(eans):
+            raise requests.ConnectionError("backend injoignable")
+        items = [{"id": ean, "ean": ean} for ean in eans if ean in self.known]
+        return FakeResponse({"items": items, "total_count": len(items)})
+
+
+def make_checker(monkeypatch, backend: FakeBackend):
+    monkeypatch.setattr(api_checker, "PHARMAZON_BATCH_SIZE", 2)
+    checker = api_checker.PharmazonAPIChecker()
+    checker.BASE_URL = "http://backend/products"
+    checker.session = backend
+    return checker
+
+
+def test_failed_chunk_is_left_out_of_results(monkeypatch):
+    checker = make_checker(monkeypatch, FakeBackend(known={"1", "3"}, failing={"4"}))
+    results = checker.batch_check_products(["1", "2", "3", "4"])
+    assert results == {"1": (True, {"id": "1", "ean": "1"}), "2": (False, None)}
+    # Les erreurs ne sont pas mises en cache
+    assert checker.cache.get("3") is None and checker.cache.get("4") is None
+
+
+def test_network_error_is_not_reported_as_missing(monkeypatch):
+    checker = make_checker(monkeypatch, FakeBackend(failing={"4"}))
+    with pytest.raises(requests.RequestException):
+        checker.check_product_exists("4")
+    assert checker.cache.get("4") is None
+    assert checker.check_product_exists("5") == (False, None)
+
+
+class SlowBackend(FakeBackend):
+    """Le premier lot consomme tout le budget du job."""
+
+    def __init__(self, deadline: Deadline, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.deadline = deadline
+
+    def get(self, url, timeout=None):
+        response = super().get(url, timeout)
+        self.deadline.cancel()
+        return response
+
+
+def test_expired_budget_leaves_remaining_chunks_unmapped(monkeypatch):
+    deadline = Deadline(60)
+    backend = SlowBackend(deadline, known={"1"})
+    checker = make_checker(monkeypatch, backend)
+    results = checker.batch_check_products(["1", "2", "3", "4", "5"], deadline)
+    assert results == {"1": (True, {"id": "1", "ean": "1"}), "2": (False, None)}
+    assert backend.calls == 1
@@ -0,0 +1,67 @@
+import pytest
+
+import app as app_module
+
+EANS = [{"primary": "3282770390155", "replacement": None}]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    started = []
+    monkeypatch.setattr(app_module, "process_scraping_task", lambda data, job_id: started.append(data))
+    client = app_module.app.test_client()
+    client.started = started
+    return client
+
+
+@pytest.mark.parametrize("extra", [
+    {"sites": ["cocooncenter", "inconnu"]},
+    {"sites": "cocooncenter"},
+    {"sites": []},
+    {"ean_budget": "120"},
+    {"ean_budget": -1},
+    {"job_budget": True},
+    {"job_budget": [60]},
+    {"mode": "slowest"},
+    {"mode": ["fastest"]},
+    {"mode": "fastest", "site_order": "pharmagdd"},
+    {"mode": "fastest", "site_order": ["pharmagdd", "inconnu"]},
+    {"mode": "fastest", "site_order": []},
+])
+def test_invalid_job_options_are_rejected(client, extra):
+    response = client.post("/api/scrape", json={"eans": EANS, **extra})
+    assert response.status_code == 400
+    assert client.started == []
+
+
+@pytest.mark.parametrize("extra", [
+    {},
+    {"sites": ["pharmagdd", "drakkars"]},
+    {"sites": None, "ean_budget": 30.5, "job_budget": 0},
+    {"job_budget": None},
+    {"mode": "fastest", "site_order": ["pharmagdd", "cocooncenter", "drakkars"]},
+    {"mode": None, "site_order": None},
+])
+def test_valid_job_options_are_accepted(client, extra):
+    response = client.post("/api/scrape", json={"eans": EANS, **extra})
+    assert response.status_code == 202
+
+
+def test_backend_prefetch_checks_primary_eans_only(monkeypatch):
+    prefetched = []
+
+    def batch_check_products(eans, deadline=None):
+        prefetched.extend(eans)
+        return {ean: (False, None) for ean in eans}
+
+    monkeypatch.setattr(app_module.api_checker, "batch_check_products", batch_check_products)
+    monkeypatch.setattr(app_module.api_checker, "check_product_exists", lambda *args: pytest.fail("EAN non préchargé"))
+    summaries = []
+    monkeypatch.setattr(app_module.webhook_notifier, "send_summary_email", lambda *args: summaries.append(args))
+    stats = app_module._run_scraping_job({"eans": [
+        {"primary": "3282770390155", "replacement": "3282770390148"},
+        {"primary": "3401000000001", "replacement": None},
+    ]})
+    assert prefetched == ["3282770390155", "3401000000001"]
+    assert stats.not_found_backend == ["3282770390155", "3401000000001"]
+    assert summaries == [([], ["3282770390155", "3401000000001"])]
@@ -0,0 +1,79 @@
+import threading
+import time
+
+from circuits import CircuitPool
+
+
+class FakeSession:
+    def __init__(self, isolation: str, deadline=None) -> None:
+        self.isolation = isolation
+        self.closed = False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def make_pool(size: int = 2) -> CircuitPool:
+    pool = CircuitPool(FakeSession, size=size, retire_factor=3.0, max_failures=2)
+    pool.created = []
+    factory = pool.session_factory
+
+    def tracking_factory(isolation: str, deadline=None) -> FakeSession:
+        session = factory(isolation, deadline)
+        pool.created.append(session)
+        return session
+
+    pool.session_factory = tracking_factory
+    for circuit in pool._circuits:
+        circuit._session_factory = tracking_factory
+    return pool
+
+
+def test_reset_closes_idle_sessions_only():
+    pool = make_pool(size=1)
+    with pool.session() as busy:
+        session = busy.circuit.session
+        pool.reset()
+        assert not session.closed  # requête en cours : la session reste ouverte
+    pool.record(busy.circuit, "https://www.example.com/", 0.5, 1000.0)
+    pool.reset()
+    assert session.closed
+    assert busy.circuit.samples == 0
+
+
+def test_repeated_failures_retire_circuit():
+    pool = make_pool(size=1)
+    with pool.session() as first:
+        circuit = first.circuit
+        session = circuit.session
+    pool.record_failure(circuit, "error")
+    pool.record_failure(circuit, "error")
+    assert pool._circuits[0] is not circuit
+    assert session.closed
+    assert pool.retirements == 1
+
+
+def test_concurrent_first_use_creates_one_session():
+    pool = make_pool(size=1)
+    circuit = pool._circuits[0]
+    created = threading.Barrier(8)
+    factory = circuit._session_factory
+
+    def slow_factory(isolation: str, deadline=None) -> FakeSession:
+        time.sleep(0.05)  # élargit la fenêtre de concurrence
+        return factory(isolation, deadline)
+
+    circuit._session_factory = slow_factory
+    sessions = []
+
+    def first_use() -> None:
+        created.wait()
+        sessions.append(circuit.session)
+
+    threads = [threading.Thread(target=first_use) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(pool.created) == 1
+    assert all(session is sessions[0] for session in sessions)
@@ -0,0 +1,87 @@
+import pytest
+import requests
+
+import concurrency
+from concurrency import BLOCKED, CANCELLED, ERROR, SUCCESS, TIMEOUT, AIMDLimiter
+from deadline import Deadline, DeadlineExceeded
+
+
+def saturate(limiter: AIMDLimiter) -> None:
+    for _ in range(int(limiter.limit)):
+        limiter.acquire()
+
+
+def test_limit_grows_only_when_saturated():
+    limiter = AIMDLimiter("site", initial=2, minimum=1, maximum=8)
+    limiter.acquire()
+    limiter.release(SUCCESS)
+    assert limiter.limit == 2
+
+    saturate(limiter)
+    limiter.release(SUCCESS)
+    assert limiter.limit == pytest.approx(2.5)
+
+
+def test_limit_is_halved_once_per_interval(monkeypatch):
+    monkeypatch.setattr(concurrency, "AIMD_DECREASE_INTERVAL", 60)
+    limiter = AIMDLimiter("site", initial=8, minimum=1, maximum=8)
+    saturate(limiter)
+    limiter.release(BLOCKED)
+    limiter.release(TIMEOUT)
+    assert limiter.limit == 4
+
+
+def test_limit_never_drops_below_minimum(monkeypatch):
+    monkeypatch.setattr(concurrency, "AIMD_DECREASE_INTERVAL", 0)
+    limiter = AIMDLimiter("site", initial=2, minimum=1, maximum=8)
+    for _ in range(5):
+        limiter.acquire()
+        limiter.release(BLOCKED)
+    assert limiter.limit == 1
+
+
+def test_acquire_respects_deadline():
+    limiter = AIMDLimiter("site", initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+    with pytest.raises(DeadlineExceeded):
+        limiter.acquire(Deadline(0.05))
+
+
+def test_slot_classifies_exceptions():
+    limiter = AIMDLimiter("site", initial=4, minimum=1, maximum=8)
+    with pytest.raises(requests.Timeout):
+        with limiter.slot():
+            raise requests.Timeout()
+    with pytest.raises(ValueError):
+        with limiter.slot():
+            raise ValueError()
+    with limiter.slot() as slot:
+        slot.outcome = BLOCKED
+    assert list(limiter._outcomes) == [TIMEOUT, ERROR, BLOCKED]
+    assert limiter.in_flight == 0
+
+
+def test_caller_deadline_does_not_shrink_limit(monkeypatch):
+    monkeypatch.setattr(concurrency, "AIMD_DECREASE_INTERVAL", 0)
+    limiter = AIMDLimiter("site", initial=4, minimum=1, maximum=8)
+    cancelled = Deadline(60)
+    with pytest.raises(DeadlineExceeded):
+        with limiter.slot(cancelled):
+            cancelled.cancel()  # mode fastest : un autre site a trouvé le produit
+            cancelled.check("recherche")
+    # Timeout raccourci par le budget de l'appelant, expiré entre-temps
+    expired = Deadline(60)
+    with pytest.raises(requests.ReadTimeout):
+        with limiter.slot(expired):
+            expired.cancel()
+            raise requests.ReadTimeout()
+    assert limiter.limit == 4
+    assert list(limiter._outcomes) == []
+    assert limiter.snapshot()["timeout_rate"] == 0.0
+
+    with pytest.raises(requests.ReadTimeout):
+        with limiter.slot(Deadline(60)):
+            raise requests.ReadTimeout()
+    assert limiter.limit == 2
+    assert list(limiter._outcomes) == [TIMEOUT]
+    assert CANCELLED not in limiter._outcomes
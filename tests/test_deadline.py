@@ -0,0 +1,52 @@
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded
+
+
+def test_unlimited_deadline_keeps_default_timeout():
+    deadline = Deadline()
+    assert deadline.remaining() is None
+    assert not deadline.expired()
+    assert deadline.timeout(10) == 10
+
+
+def test_timeout_is_capped_by_remaining_budget():
+    deadline = Deadline(0.5)
+    assert deadline.timeout(10) <= 0.5
+
+
+def test_child_cannot_outlive_parent():
+    parent = Deadline(0.2)
+    child = parent.child(60)
+    assert child.remaining() <= 0.2
+
+
+def test_child_budget_applies_under_unlimited_parent():
+    child = Deadline().child(0.3)
+    assert 0 < child.remaining() <= 0.3
+
+
+def test_cancel_expires_deadline_and_children():
+    parent = Deadline(60)
+    child = parent.child(60)
+    parent.cancel()
+    assert parent.expired()
+    assert child.expired()
+
+
+def test_check_raises_and_records_step():
+    deadline = Deadline(0.01)
+    time.sleep(0.02)
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(10, "recherche Cocooncenter")
+    assert deadline.timed_out
+    assert deadline.timeouts == ["recherche Cocooncenter"]
+
+
+def test_sleep_stops_at_deadline():
+    deadline = Deadline(0.05)
+    start = time.monotonic()
+    deadline.sleep(5)
+    assert time.monotonic() - start < 1
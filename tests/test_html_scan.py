@@ -0,0 +1,34 @@
+import pytest
+
+from html_scan import FieldScanner, clean_text
+
+
+def test_first_occurrence_of_each_field():
+    scanner = FieldScanner(r'<b id="a">(?P<a>\d+)', r'<b id="b">(?P<b>\d+)')
+    html = '<b id="b">1</b><b id="a">2</b><b id="b">3</b><b id="a">4</b>'
+    assert scanner.scan(html) == {"a": "2", "b": "1"}
+
+
+def test_skipped_fields_are_not_searched():
+    scanner = FieldScanner(r'<b id="a">(?P<a>\d+)', r'<b id="b">(?P<b>\d+)')
+    assert scanner.scan('<b id="a">2</b><b id="b">1</b>', skip=["a", "site"]) == {"b": "1"}
+    assert scanner.scan('<b id="a">2</b>', skip=["a", "b"]) == {}
+
+
+def test_fields_sharing_a_pattern():
+    scanner = FieldScanner(r'<i>(?P<note>\d/5)</i>(?: \((?P<nb>\d+)\))?')
+    assert scanner.scan("<i>4/5</i> x <i>3/5</i> (12)") == {"note": "4/5", "nb": "12"}
+
+
+def test_patterns_without_named_group_are_rejected():
+    with pytest.raises(ValueError):
+        FieldScanner(r"<b>(\d+)")
+
+
+def test_clean_text_decodes_entities_and_whitespace():
+    assert clean_text("  Cr&egrave;me\xa0 d&#39;&eacute;t&eacute; \\u00e9\n") == "Crème d'été é"
+    assert clean_text("&nbsp;a&nbsp;&nbsp;b ") == "a b"
+
+
+def test_clean_text_decodes_ampersand_once():
+    assert clean_text("A &amp;amp; B") == "A &amp; B"
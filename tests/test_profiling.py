@@ -0,0 +1,26 @@
+import json
+import os
+
+import pytest
+
+from profiling import CPROFILE, SAMPLE, JobProfiler
+
+
+@pytest.mark.parametrize("mode", [CPROFILE, SAMPLE])
+def test_save_writes_job_summary_and_profile_separately(tmp_path, mode):
+    with JobProfiler("job1", mode=mode, directory=str(tmp_path)) as profiler:
+        profiler.run(sum, range(1000))
+    directory = profiler.save({"received": 3, "found": 2})
+
+    with open(os.path.join(directory, "summary.json"), encoding="utf-8") as handle:
+        assert json.load(handle) == {"received": 3, "found": 2}
+    with open(os.path.join(directory, "profile.txt"), encoding="utf-8") as handle:
+        assert handle.read()
+
+
+def test_save_without_summary_writes_no_summary(tmp_path):
+    with JobProfiler("job2", directory=str(tmp_path)) as profiler:
+        profiler.run(sum, range(10))
+    directory = profiler.save()
+    assert not os.path.exists(os.path.join(directory, "summary.json"))
+    assert os.path.exists(os.path.join(directory, "profile.txt"))
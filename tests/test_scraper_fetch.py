@@ -0,0 +1,119 @@
+import pytest
+import requests
+
+import scrapers
+from concurrency import BLOCKED, ERROR, TIMEOUT, get_site_limiter
+from scrapers import BaseScraper, TorSession
+from transport import DIRECT, TOR, TransportPolicy
+
+URL = "https://www.example.com/produit"
+
+
+class FakeResponse:
+    def __init__(self, status: int = 200, text: str = "<html>produit</html>") -> None:
+        self.status_code = status
+        self.text = text
+        self.headers = {"Content-Type": "text/html"}
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+
+class FakeSession:
+    """Renvoie (ou lève) successivement les résultats donnés."""
+
+    def __init__(self, *results) -> None:
+        self.results = list(results)
+        self.calls = 0
+
+    def get(self, url, timeout=None):
+        self.calls += 1
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def refused() -> requests.ConnectionError:
+    return requests.ConnectionError(ConnectionRefusedError(111, "Connection refused"))
+
+
+@pytest.fixture
+def scraper(monkeypatch):
+    monkeypatch.setattr(scrapers, "RETRY_DELAY", 0)
+    monkeypatch.setattr(TorSession, "renew_tor_identity", staticmethod(lambda deadline=None: False))
+    scraper = BaseScraper()
+    scraper.site_key = f"test-{id(scraper)}"
+    scraper.max_retries = 3
+    scraper.transport_policy = TransportPolicy(mode="adaptive", cooldown=600)
+    scraper.tor_calls = []
+
+    def tor_get(url, timeout, deadline=None):
+        scraper.tor_calls.append(url)
+        return FakeResponse()
+
+    scraper._get = tor_get
+    return scraper
+
+
+def outcomes(scraper):
+    return list(get_site_limiter(scraper.site_key)._outcomes)
+
+
+@pytest.mark.parametrize("error, outcome", [
+    (requests.ReadTimeout("délai dépassé"), TIMEOUT),
+    (requests.ConnectionError("Connection reset by peer"), ERROR),
+])
+def test_network_errors_are_retried_directly(scraper, error, outcome):
+    scraper.direct_session = FakeSession(error, FakeResponse())
+    assert scraper._fetch_with_retry(URL).status_code == 200
+    assert scraper.tor_calls == []
+    assert scraper.transport_policy.transport_for(URL) == DIRECT
+    assert outcomes(scraper)[0] == outcome
+
+
+def test_server_errors_are_not_blocks(scraper):
+    scraper.direct_session = FakeSession(FakeResponse(503), FakeResponse())
+    assert scraper._fetch_with_retry(URL).status_code == 200
+    assert scraper.tor_calls == []
+    assert scraper.transport_policy.snapshot() == {}
+
+
+def test_last_network_error_is_raised(scraper):
+    scraper.direct_session = FakeSession(*[requests.ReadTimeout("délai dépassé")] * 3)
+    with pytest.raises(requests.ReadTimeout):
+        scraper._fetch_with_retry(URL)
+    assert scraper.tor_calls == []
+
+
+@pytest.mark.parametrize("blocked", [
+    FakeResponse(403),
+    FakeResponse(429),
+    FakeResponse(200, "<title>Attention Required! | Cloudflare</title>"),
+    refused(),
+])
+def test_blocks_switch_to_tor(scraper, blocked):
+    scraper.direct_session = FakeSession(blocked)
+    assert scraper._fetch_with_retry(URL).status_code == 200
+    assert scraper.tor_calls == [URL]
+    assert scraper.transport_policy.transport_for(URL) == TOR
+    assert outcomes(scraper)[0] == BLOCKED
+
+
+def test_direct_mode_never_falls_back_to_tor(scraper):
+    scraper.transport_policy = TransportPolicy(mode=DIRECT)
+    scraper.direct_session = FakeSession(FakeResponse(403), refused(), FakeResponse())
+    assert scraper._fetch_with_retry(URL).status_code == 200
+    assert scraper.tor_calls == []
+
+
+def test_renewal_drops_own_session_without_pool(scraper, monkeypatch):
+    monkeypatch.setattr(scrapers, "CIRCUIT_POOL_SIZE", 0)
+    monkeypatch.setattr(TorSession, "renew_tor_identity", staticmethod(lambda deadline=None: True))
+    closed = []
+    scraper.session = requests.Session()
+    scraper.session.close = lambda: closed.append(True)
+    scraper._renew_identity(None)
+    assert scraper.session is None
+    assert closed == [True]
@@ -0,0 +1,41 @@
+import sites
+from sites import HitRateStats
+
+
+def make_stats(monkeypatch) -> HitRateStats:
+    monkeypatch.setattr(sites, "SITE_EXPLORE_RATE", 0.0)
+    monkeypatch.setattr(sites, "SITE_SKIP_THRESHOLD", 0.05)
+    monkeypatch.setattr(sites, "SITE_SKIP_MIN_TRIALS", 20)
+    return HitRateStats(state_file=None, prefix_lengths=(3, 7))
+
+
+def test_unknown_sites_keep_declared_order(monkeypatch):
+    stats = make_stats(monkeypatch)
+    assert stats.plan(["a", "b", "c"], "3282770390155") == (["a", "b", "c"], [])
+
+
+def test_best_site_first_and_hopeless_site_skipped(monkeypatch):
+    stats = make_stats(monkeypatch)
+    for _ in range(50):
+        stats.record("a", "3282770390155", found=False)
+        stats.record("b", "3282770390155", found=True)
+    selected, skipped = stats.plan(["a", "b", "c"], "3282770000000")
+    assert selected == ["b", "c"]
+    assert skipped == ["a"]
+
+
+def test_other_brand_prefix_is_not_skipped(monkeypatch):
+    stats = make_stats(monkeypatch)
+    for _ in range(50):
+        stats.record("a", "3282770390155", found=False)
+        stats.record("a", "3401000000000", found=True)
+    selected, skipped = stats.plan(["a"], "3401000000001")
+    assert selected == ["a"] and skipped == []
+
+
+def test_exploration_keeps_skippable_sites(monkeypatch):
+    stats = make_stats(monkeypatch)
+    monkeypatch.setattr(sites, "SITE_EXPLORE_RATE", 1.0)
+    for _ in range(50):
+        stats.record("a", "3282770390155", found=False)
+    assert stats.plan(["a"], "3282770390155") == (["a"], [])
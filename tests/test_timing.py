@@ -0,0 +1,18 @@
+import pytest
+
+from timing import percentile
+
+
+@pytest.mark.parametrize("values, fraction, expected", [
+    (range(1, 11), 0.5, 5),   # n pair, fraction × n entier
+    (range(1, 11), 0.9, 9),
+    (range(1, 11), 0.95, 10),
+    (range(1, 11), 1.0, 10),
+    (range(1, 11), 0.0, 1),
+    (range(1, 12), 0.5, 6),   # n impair
+    (range(1, 101), 0.99, 99),
+    ([7.5], 0.99, 7.5),
+    ([3, 1, 2, 4], 0.5, 2),   # valeurs non triées
+])
+def test_nearest_rank_percentile(values, fraction, expected):
+    assert percentile(list(values), fraction) == expected
@@ -0,0 +1,109 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import tor_fleet
+from deadline import Deadline, DeadlineExceeded
+from tor_fleet import READY, TorDaemon, TorFleet
+
+COOKIE = bytes(range(32))
+
+
+class FakeControlPort:
+    """Port de contrôle Tor simulé : n'accepte que le cookie attendu."""
+
+    def __init__(self, cookie: bytes) -> None:
+        self.cookie = cookie
+        self.commands = []
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.port = self.server.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self) -> None:
+        while True:
+            try:
+                connection, _ = self.server.accept()
+            except OSError:
+                return
+            with connection:
+                data = b""
+                while b"QUIT\r\n" not in data:
+                    chunk = connection.recv(4096)
+                    if not chunk:
+                        break
+                    data += chunk
+                auth, command = data.decode().split("\r\n")[:2]
+                if auth != f"AUTHENTICATE {self.cookie.hex()}":
+                    connection.sendall(b"515 Authentication failed\r\n")
+                    continue
+                self.commands.append(command)
+                connection.sendall(b"250 OK\r\n250 OK\r\n250 closing connection\r\n")
+
+    def close(self) -> None:
+        self.server.close()
+
+
+@pytest.fixture
+def control_port():
+    port = FakeControlPort(COOKIE)
+    yield port
+    port.close()
+
+
+def make_daemon(tmp_path, port: int) -> TorDaemon:
+    return TorDaemon(0, 19050, port, str(tmp_path / "0"))
+
+
+def test_commands_are_authenticated_with_daemon_cookie(tmp_path, control_port):
+    daemon = make_daemon(tmp_path, control_port.port)
+    assert daemon.control("SIGNAL NEWNYM") is None  # cookie pas encore écrit
+
+    (tmp_path / "0").mkdir()
+    (tmp_path / "0" / "control_auth_cookie").write_bytes(COOKIE)
+    assert daemon.control("SIGNAL NEWNYM") is not None
+    assert control_port.commands == ["SIGNAL NEWNYM"]
+
+
+def test_wrong_cookie_is_refused(tmp_path, control_port):
+    daemon = make_daemon(tmp_path, control_port.port)
+    (tmp_path / "0").mkdir()
+    (tmp_path / "0" / "control_auth_cookie").write_bytes(b"x" * 32)
+    assert daemon.control("SIGNAL NEWNYM") is None
+    assert control_port.commands == []
+
+
+def test_daemon_starts_with_cookie_authentication(tmp_path, monkeypatch):
+    launched = []
+
+    class FakePopen:
+        pid = 1234
+
+        def __init__(self, command, **kwargs) -> None:
+            launched.append(command)
+
+    monkeypatch.setattr(tor_fleet.subprocess, "Popen", FakePopen)
+    daemon = make_daemon(tmp_path, 19150)
+    (tmp_path / "0").mkdir()
+    (tmp_path / "0" / "control_auth_cookie").write_bytes(COOKIE)  # lancement précédent
+    daemon.start()
+
+    [command] = launched
+    assert command[command.index("--CookieAuthentication") + 1] == "1"
+    assert not (tmp_path / "0" / "control_auth_cookie").exists()
+
+
+def test_acquire_gives_up_at_caller_deadline(tmp_path):
+    fleet = TorFleet(size=2, directory=str(tmp_path))
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        fleet.acquire(Deadline(0.05))
+    assert time.monotonic() - started < 1.0
+
+
+def test_acquire_returns_ready_daemons_in_turn(tmp_path):
+    fleet = TorFleet(size=2, directory=str(tmp_path))
+    fleet.daemons[1].state = READY
+    assert fleet.acquire(Deadline(0.05)) is fleet.daemons[1]
+    assert fleet.acquire(Deadline(0.05)) is fleet.daemons[1]
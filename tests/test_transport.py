@@ -0,0 +1,58 @@
+import socket
+
+import requests
+
+import transport
+from transport import DIRECT, TOR, TransportPolicy, detect_block, is_connection_refused
+
+
+def test_block_switches_domain_to_tor_until_cooldown(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(transport.time, "monotonic", lambda: now[0])
+    policy = TransportPolicy(mode="adaptive", cooldown=60)
+    url = "https://www.example.com/produit"
+
+    assert policy.transport_for(url) == DIRECT
+    policy.report_block(url, "http_403")
+    assert policy.transport_for(url) == TOR
+    assert policy.transport_for("https://autre.example.org/") == DIRECT
+
+    now[0] += 61
+    assert policy.transport_for(url) == DIRECT
+    assert policy.snapshot()["www.example.com"]["blocks"] == 1
+
+
+def test_fixed_modes_ignore_blocks():
+    direct = TransportPolicy(mode=DIRECT, cooldown=60)
+    direct.report_block("https://www.example.com/", "http_403")
+    assert direct.transport_for("https://www.example.com/") == DIRECT
+    assert TransportPolicy(mode=TOR).transport_for("https://www.example.com/") == TOR
+
+
+class FakeResponse:
+    def __init__(self, status: int, text: str = "", content_type: str = "text/html") -> None:
+        self.status_code = status
+        self.text = text
+        self.headers = {"Content-Type": content_type}
+
+
+def test_detect_block_statuses_and_challenge_pages():
+    assert detect_block(FakeResponse(403)) == "http_403"
+    assert detect_block(FakeResponse(429)) == "http_429"
+    assert detect_block(FakeResponse(200, '<script src="/cdn-cgi/challenge-platform/x">')) == "captcha"
+    assert detect_block(FakeResponse(200, "<html>produit</html>")) is None
+    assert detect_block(FakeResponse(503)) is None
+    assert detect_block(FakeResponse(200, "px-captcha", content_type="application/json")) is None
+
+
+def test_connection_refused_is_found_in_wrapped_errors():
+    # Port local fermé : l'erreur socket est enveloppée par urllib3 puis requests
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    try:
+        requests.get(f"http://127.0.0.1:{port}/", timeout=2)
+    except requests.ConnectionError as exc:
+        assert is_connection_refused(exc)
+    assert not is_connection_refused(requests.ConnectTimeout("délai dépassé"))
+    assert not is_connection_refused(requests.ConnectionError("Connection reset by peer"))
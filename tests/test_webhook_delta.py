@@ -0,0 +1,55 @@
+from webhook_delta import CHANGED, DIFF, FULL, DeltaTracker
+
+PRODUCTS = {
+    "cocooncenter": {"titre": "Crème", "prix": "15,90€", "timings": {"parse": 0.1}},
+    "pharmagdd": {"titre": "Crème", "prix": "16,00€"},
+}
+
+
+def sent(tracker: DeltaTracker, ean: str, products: dict, partial: bool = False):
+    """Calcule l'envoi puis enregistre les empreintes, comme après un envoi réussi."""
+    data, delta, fingerprints = tracker.compute(ean, products, partial=partial)
+    tracker.update(ean, fingerprints)
+    return data, delta
+
+
+def test_full_mode_always_sends():
+    tracker = DeltaTracker(mode=FULL, state_file=None)
+    assert sent(tracker, "1", PRODUCTS) == (PRODUCTS, None)
+    assert sent(tracker, "1", PRODUCTS) == (PRODUCTS, None)
+
+
+def test_changed_mode_skips_unchanged_products():
+    tracker = DeltaTracker(mode=CHANGED, state_file=None)
+    assert sent(tracker, "1", PRODUCTS)[0] == PRODUCTS
+    # Les champs volatils (timings) ne comptent pas comme un changement
+    same = {**PRODUCTS, "cocooncenter": {**PRODUCTS["cocooncenter"], "timings": {"parse": 9}}}
+    assert sent(tracker, "1", same) == (None, None)
+    changed = {**PRODUCTS, "pharmagdd": {"titre": "Crème", "prix": "14,00€"}}
+    assert sent(tracker, "1", changed)[0] == changed
+
+
+def test_diff_mode_sends_changed_fields_only():
+    tracker = DeltaTracker(mode=DIFF, state_file=None)
+    sent(tracker, "1", PRODUCTS)
+    data, delta = sent(tracker, "1", {
+        "cocooncenter": {"titre": "Crème", "prix": "13,90€"},
+        "drakkars": {"titre": "Crème"},
+    })
+    assert data == {"cocooncenter": {"prix": "13,90€"}, "drakkars": {"titre": "Crème"}}
+    assert delta == {"mode": DIFF, "new_sites": ["drakkars"], "removed_sites": ["pharmagdd"]}
+
+
+def test_partial_results_do_not_remove_sites():
+    tracker = DeltaTracker(mode=DIFF, state_file=None)
+    sent(tracker, "1", PRODUCTS)
+    data, delta = sent(tracker, "1", {"cocooncenter": PRODUCTS["cocooncenter"]}, partial=True)
+    assert (data, delta) == (None, None)
+
+
+def test_fingerprints_persist_across_instances(tmp_path):
+    state_file = str(tmp_path / "state.json")
+    tracker = DeltaTracker(mode=CHANGED, state_file=state_file)
+    sent(tracker, "1", PRODUCTS)
+    tracker.save()
+    assert DeltaTracker(mode=CHANGED, state_file=state_file).compute("1", PRODUCTS)[0] is None
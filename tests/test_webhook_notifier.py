@@ -0,0 +1,167 @@
+import json
+
+import requests
+
+from models import dumps
+from webhook_delta import CHANGED, DeltaTracker
+from webhook_notifier import WebhookBatcher, WebhookNotifier
+
+
+class FakeResponse:
+    def __init__(self, status: int) -> None:
+        self.status_code = status
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error")
+
+
+class FakeSession:
+    """Session HTTP simulée : enregistre les envois, répond avec les statuts donnés."""
+
+    def __init__(self, *statuses: int) -> None:
+        self.statuses = list(statuses)
+        self.posts = []
+
+    def post(self, url, data=None, json=None, headers=None, timeout=None):
+        self.posts.append({"url": url, "data": data, "timeout": timeout})
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 0:
+            raise requests.ConnectionError("connexion refusée")
+        return FakeResponse(status)
+
+
+def make_notifier(*statuses: int) -> WebhookNotifier:
+    notifier = WebhookNotifier("http://hook/summary", "http://hook/products")
+    notifier.session = FakeSession(*statuses)
+    return notifier
+
+
+def test_partial_product_is_sent_with_webhook_timeout():
+    notifier = make_notifier(200)
+    assert notifier.send_product_data("3282770390155", {"site": {"titre": "Crème"}}, timed_out=True)
+    post = notifier.session.posts[0]
+    assert post["timeout"] > 0
+    assert json.loads(post["data"]) == {
+        "ean": "3282770390155", "data": {"site": {"titre": "Crème"}}, "timed_out": True,
+    }
+
+
+def test_failed_sync_send_is_reported():
+    assert not make_notifier(500).send_product_data("1", {})
+    assert not make_notifier(0).send_product_data("1", {})
+
+
+def test_shutdown_flushes_batch_before_stopping_queue():
+    calls = []
+
+    class Recorder:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+        def __getattr__(self, method):
+            return lambda *args, **kwargs: calls.append(f"{self.name}.{method}")
+
+    notifier = make_notifier()
+    notifier.batcher = Recorder("batcher")
+    notifier.delivery_queue = Recorder("queue")
+    notifier.delta_tracker = Recorder("delta")
+    notifier.shutdown()
+    assert calls == ["batcher.flush", "queue.stop", "delta.save"]
+
+
+def make_batcher(**limits):
+    batches = []
+
+    def send(body: bytes, count: int, on_delivered) -> bool:
+        batches.append(json.loads(body))
+        return True
+
+    batcher = WebhookBatcher(send, window=60, **limits)
+    return batcher, batches
+
+
+def test_batch_never_exceeds_max_bytes():
+    item_size = len(dumps({"ean": "1", "data": "x" * 100}))
+    batcher, batches = make_batcher(max_items=100, max_bytes=item_size * 2 + item_size // 2)
+    for ean in "12345":
+        assert batcher.add({"ean": ean, "data": "x" * 100})
+    batcher.flush()
+    assert [batch["count"] for batch in batches] == [2, 2, 1]
+    assert [item["ean"] for batch in batches for item in batch["items"]] == list("12345")
+
+
+def test_oversized_item_is_sent_alone():
+    batcher, batches = make_batcher(max_items=100, max_bytes=50)
+    batcher.add({"ean": "1"})
+    batcher.add({"ean": "2", "data": "x" * 100})
+    batcher.add({"ean": "3"})
+    batcher.flush()
+    assert [[item["ean"] for item in batch["items"]] for batch in batches] == [["1"], ["2"], ["3"]]
+
+
+def test_batch_is_sent_when_max_items_reached():
+    batcher, batches = make_batcher(max_items=2, max_bytes=1 << 20)
+    for ean in "123":
+        batcher.add({"ean": ean})
+    assert [batch["count"] for batch in batches] == [2]
+    batcher.flush()
+    assert [batch["count"] for batch in batches] == [2, 1]
+
+
+PRODUCTS = {"cocooncenter": {"titre": "Crème", "prix": "15,90€"}}
+
+
+def with_delta(notifier: WebhookNotifier) -> WebhookNotifier:
+    notifier.delta_tracker = DeltaTracker(mode=CHANGED, state_file=None)
+    return notifier
+
+
+def test_failed_send_does_not_record_fingerprints():
+    notifier = with_delta(make_notifier(503, 200))
+    assert not notifier.send_product_data("1", PRODUCTS)
+    # Rien n'a été reçu : le produit inchangé doit être renvoyé
+    assert notifier.send_product_data("1", PRODUCTS)
+    assert len(notifier.session.posts) == 2
+    assert notifier.send_product_data("1", PRODUCTS)
+    assert len(notifier.session.posts) == 2
+
+
+class FakeQueue:
+    def __init__(self) -> None:
+        self.deliveries = []
+
+    def enqueue(self, delivery) -> bool:
+        self.deliveries.append(delivery)
+        return True
+
+    def stop(self) -> None:
+        pass
+
+
+def test_enqueued_product_is_recorded_on_confirmed_delivery_only():
+    notifier = with_delta(make_notifier())
+    notifier.delivery_queue = FakeQueue()
+    assert notifier.send_product_data("1", PRODUCTS)
+    # En file mais non confirmé : le produit est de nouveau envoyé
+    assert notifier.send_product_data("1", PRODUCTS)
+    assert len(notifier.delivery_queue.deliveries) == 2
+
+    notifier.delivery_queue.deliveries[-1].on_delivered()
+    assert notifier.send_product_data("1", PRODUCTS)
+    assert len(notifier.delivery_queue.deliveries) == 2
+
+
+def test_batched_products_are_recorded_when_batch_is_delivered():
+    notifier = with_delta(make_notifier(503, 200))
+    notifier.batcher = WebhookBatcher(notifier._send_batch, max_items=10, window=60)
+    notifier.send_product_data("1", PRODUCTS)
+    notifier.send_product_data("2", PRODUCTS)
+    assert not notifier.batcher.flush()  # lot refusé (503)
+    assert notifier.delta_tracker.compute("1", PRODUCTS)[0] is not None
+
+    notifier.send_product_data("1", PRODUCTS)
+    notifier.send_product_data("2", PRODUCTS)
+    assert notifier.batcher.flush()
+    assert notifier.delta_tracker.compute("1", PRODUCTS)[0] is None
+    assert notifier.delta_tracker.compute("2", PRODUCTS)[0] is None
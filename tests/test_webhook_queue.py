@@ -0,0 +1,91 @@
+import json
+import time
+
+import pytest
+
+import webhook_queue
+from webhook_queue import WebhookDelivery, WebhookDeliveryQueue
+
+
+class FakeResponse:
+    def __init__(self, status: int) -> None:
+        self.status_code = status
+
+
+class FakeSession:
+    def __init__(self, status: int) -> None:
+        self.status = status
+        self.posts = 0
+
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.posts += 1
+        return FakeResponse(self.status)
+
+
+def wait_for(condition, timeout: float = 5) -> None:
+    limit = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < limit, "condition non atteinte"
+        time.sleep(0.01)
+
+
+def spool_lines(delivery_queue: WebhookDeliveryQueue):
+    with open(delivery_queue.spool_path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle]
+
+
+@pytest.fixture
+def make_queue(tmp_path, monkeypatch):
+    def factory(status: int) -> WebhookDeliveryQueue:
+        session = FakeSession(status)
+        delivery_queue = WebhookDeliveryQueue(workers=1, maxsize=10, spool_dir=str(tmp_path))
+        delivery_queue._create_session = lambda: session
+        delivery_queue.session = session
+        return delivery_queue
+    return factory
+
+
+def test_delivery_callback_runs_on_success_only(make_queue, monkeypatch):
+    monkeypatch.setattr(webhook_queue, "WEBHOOK_RETRY_BASE_DELAY", 0)
+    confirmed = []
+    for status in (200, 400):
+        delivery_queue = make_queue(status)
+        delivery_queue.enqueue(WebhookDelivery(
+            url="http://hook", body=b"{}", label="produit 1",
+            on_delivered=lambda status=status: confirmed.append(status),
+        ))
+        assert delivery_queue.flush(timeout=5)
+        delivery_queue.stop()
+    assert confirmed == [200]
+
+
+def test_stop_spools_delivery_waiting_between_retries(make_queue, monkeypatch):
+    monkeypatch.setattr(webhook_queue, "WEBHOOK_RETRY_BASE_DELAY", 30)
+    delivery_queue = make_queue(503)
+    delivery_queue.enqueue(WebhookDelivery(url="http://hook", body=b'{"ean": "1"}', label="produit 1"))
+    wait_for(lambda: delivery_queue.retried == 1)
+
+    started = time.monotonic()
+    delivery_queue.stop(timeout=0.1)
+    assert time.monotonic() - started < 5
+
+    [record] = spool_lines(delivery_queue)
+    assert record["body"] == '{"ean": "1"}'
+    assert record["error"].startswith("arrêt du service")
+    # Le worker interrompu n'écrit pas l'envoi une seconde fois
+    wait_for(lambda: delivery_queue.busy == 0)
+    assert delivery_queue.spooled == 1
+    assert delivery_queue.session.posts == 1
+
+
+def test_stop_spools_queued_deliveries(make_queue, monkeypatch):
+    monkeypatch.setattr(webhook_queue, "WEBHOOK_RETRY_BASE_DELAY", 30)
+    delivery_queue = make_queue(503)
+    for ean in "123":
+        delivery_queue.enqueue(WebhookDelivery(url="http://hook", body=b"{}", label=f"produit {ean}"))
+    wait_for(lambda: delivery_queue.retried == 1)
+    delivery_queue.stop(timeout=0.1)
+    wait_for(lambda: delivery_queue.busy == 0)
+    assert sorted(record["label"] for record in spool_lines(delivery_queue)) == [
+        "produit 1", "produit 2", "produit 3",
+    ]
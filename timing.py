@@ -0,0 +1,227 @@
+"""
+Mesure du temps passé par étape (vérification backend, recherche, navigateur,
+récupération, parsing, webhook) et compteurs (retries, renouvellements Tor).
+
+Chaque EAN a sa timeline, active sur le thread qui le traite : `span()` et `count()`
+l'alimentent depuis n'importe quel module et ne coûtent presque rien lorsqu'aucune
+timeline n'est active. Les timelines d'un job sont agrégées en percentiles par étape.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import math
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from profiling import profiled
+
+_local = threading.local()
+
+
+class Timeline:
+    """Durées par (étape, site) et compteurs d'un EAN (thread-safe)."""
+
+    def __init__(self, label: str = "") -> None:
+        self.label = label
+        self.started_at = time.perf_counter()
+        self._durations: Dict[Tuple[str, str], float] = {}
+        self._counters: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, site: str = "") -> None:
+        with self._lock:
+            key = (stage, site)
+            self._durations[key] = self._durations.get(key, 0.0) + seconds
+
+    def incr(self, counter: str, site: str = "", n: int = 1) -> None:
+        with self._lock:
+            key = (counter, site)
+            self._counters[key] = self._counters.get(key, 0) + n
+
+    def stage_totals(self) -> Dict[str, float]:
+        """Durée totale (secondes) de chaque étape, tous sites confondus."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for (stage, _), seconds in self._durations.items():
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        return totals
+
+    def counter_totals(self) -> Dict[str, int]:
+        """Valeur totale de chaque compteur, tous sites confondus."""
+        totals: Dict[str, int] = {}
+        with self._lock:
+            for (counter, _), value in self._counters.items():
+                totals[counter] = totals.get(counter, 0) + value
+        return totals
+
+    def for_site(self, site: str) -> Dict[str, float]:
+        """Résumé compact d'un site : {"search_ms": .., "fetch_ms": .., "retries": ..}."""
+        with self._lock:
+            summary: Dict[str, float] = {
+                f"{stage}_ms": round(seconds * 1000, 1)
+                for (stage, stage_site), seconds in self._durations.items()
+                if stage_site == site
+            }
+            summary.update({
+                counter: value
+                for (counter, counter_site), value in self._counters.items()
+                if counter_site == site
+            })
+        return summary
+
+    def to_dict(self) -> Dict:
+        """Résumé compact de l'EAN : durée totale, durées par étape et compteurs."""
+        result: Dict = {
+            "total_ms": round((time.perf_counter() - self.started_at) * 1000, 1),
+            "stages": {stage: round(seconds * 1000, 1) for stage, seconds in self.stage_totals().items()},
+        }
+        counters = self.counter_totals()
+        if counters:
+            result["counters"] = counters
+        return result
+
+
+def current_timeline() -> Optional[Timeline]:
+    """Timeline active sur le thread courant (None si aucune)."""
+    return getattr(_local, "timeline", None)
+
+
+def start_timeline(label: str = "") -> Timeline:
+    """Crée une timeline et l'active sur le thread courant."""
+    timeline = Timeline(label)
+    _local.timeline = timeline
+    return timeline
+
+
+def end_timeline() -> Optional[Timeline]:
+    """Désactive la timeline du thread courant et la retourne."""
+    timeline = current_timeline()
+    _local.timeline = None
+    return timeline
+
+
+def bind(func: Callable, timeline: Optional[Timeline] = None) -> Callable:
+    """
+    Enveloppe `func` pour qu'elle alimente `timeline` depuis un autre thread (pool),
+    avec le contexte courant (identifiants de corrélation des logs, profileur du job).
+    """
+    timeline = timeline or current_timeline()
+    context = contextvars.copy_context()
+
+    def wrapper(*args, **kwargs):
+        previous = current_timeline()
+        _local.timeline = timeline
+        try:
+            return context.copy().run(profiled, func, *args, **kwargs)
+        finally:
+            _local.timeline = previous
+
+    return wrapper
+
+
+@contextmanager
+def span(stage: str, site: str = "") -> Iterator[None]:
+    """Mesure la durée d'une étape dans la timeline active (sans effet s'il n'y en a pas)."""
+    timeline = current_timeline()
+    if timeline is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timeline.add(stage, time.perf_counter() - start, site)
+
+
+def count(counter: str, site: str = "", n: int = 1) -> None:
+    """Incrémente un compteur de la timeline active."""
+    timeline = current_timeline()
+    if timeline is not None:
+        timeline.incr(counter, site, n)
+
+
+def attach_timings(product: Dict, site: str) -> None:
+    """Ajoute au produit le résumé des temps de son site (clé "timings")."""
+    timeline = current_timeline()
+    if timeline is not None:
+        product["timings"] = timeline.for_site(site)
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Percentile par rang le plus proche (valeurs non vides) : rang ⌈fraction × n⌉."""
+    ordered = sorted(values)
+    # Arrondi préalable : 0.9 * 10 vaut 9.000000000000002 en flottant
+    rank = math.ceil(round(fraction * len(ordered), 9))
+    return ordered[min(len(ordered), max(1, rank)) - 1]
+
+
+class JobTimings:
+    """Agrège les timelines des EAN d'un job en percentiles par étape."""
+
+    def __init__(self) -> None:
+        # Durées brutes en double C (8 octets par mesure) : un job de plusieurs
+        # milliers d'EAN n'accumule pas un objet float par étape et par EAN
+        self._stages: Dict[str, array] = {}
+        self._counters: Dict[str, int] = {}
+        self._job_stages: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, timeline: Timeline) -> None:
+        """Ajoute la timeline d'un EAN terminé."""
+        total = time.perf_counter() - timeline.started_at
+        stages = timeline.stage_totals()
+        counters = timeline.counter_totals()
+        with self._lock:
+            self._stages.setdefault("total", array("d")).append(total)
+            for stage, seconds in stages.items():
+                self._stages.setdefault(stage, array("d")).append(seconds)
+            for counter, value in counters.items():
+                self._counters[counter] = self._counters.get(counter, 0) + value
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        """Mesure une étape propre au job (ex: pré-vérification backend groupée)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._job_stages[stage] = self._job_stages.get(stage, 0.0) + time.perf_counter() - start
+
+    def summary(self) -> Dict:
+        """Percentiles (ms) par étape, étapes du job et compteurs cumulés."""
+        with self._lock:
+            stages = {
+                stage: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 0.5) * 1000, 1),
+                    "p90": round(percentile(values, 0.9) * 1000, 1),
+                    "p99": round(percentile(values, 0.99) * 1000, 1),
+                    "max": round(max(values) * 1000, 1),
+                }
+                for stage, values in sorted(self._stages.items())
+            }
+            return {
+                "stages": stages,
+                "job": {stage: round(seconds * 1000, 1) for stage, seconds in self._job_stages.items()},
+                "counters": dict(self._counters),
+            }
+
+    def format_lines(self) -> List[str]:
+        """Tableau texte du résumé (une ligne par étape)."""
+        summary = self.summary()
+        lines = [f"   {'étape':<18}{'n':>6}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}  (ms)"]
+        for stage, stats in summary["stages"].items():
+            lines.append(
+                f"   {stage:<18}{stats['count']:>6}{stats['p50']:>10.0f}{stats['p90']:>10.0f}"
+                f"{stats['p99']:>10.0f}{stats['max']:>10.0f}"
+            )
+        for stage, ms in summary["job"].items():
+            lines.append(f"   {stage:<18}{'job':>6}{ms:>10.0f}")
+        if summary["counters"]:
+            lines.append("   " + ", ".join(f"{name}: {value}" for name, value in sorted(summary["counters"].items())))
+        return lines
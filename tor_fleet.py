@@ -0,0 +1,307 @@
+"""
+Flotte de démons Tor locaux gérés par le service.
+
+Un seul démon Tor plafonne le débit et la construction de circuits sous charge
+parallèle. Avec TOR_FLEET_SIZE > 0, le service lance N processus `tor`, chacun avec
+son répertoire de données, son SocksPort et son ControlPort ; les sessions Tor sont
+réparties entre les démons prêts (tourniquet) et un démon arrêté est relancé par le
+superviseur. Sans flotte, le démon système (TOR_PROXY / TOR_CONTROL_PORT) est utilisé.
+
+Le port de contrôle de chaque démon exige le cookie d'authentification que Tor écrit
+dans son DataDirectory (lisible par le seul utilisateur du service) : un autre
+processus local ne peut ni changer d'identité (NEWNYM) ni arrêter ou reconfigurer la flotte.
+"""
+
+from __future__ import annotations
+
+import atexit
+import itertools
+import logging
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import (
+    TOR_FLEET_BINARY,
+    TOR_FLEET_BOOTSTRAP_TIMEOUT,
+    TOR_FLEET_CHECK_INTERVAL,
+    TOR_FLEET_CONTROL_PORT_BASE,
+    TOR_FLEET_DIR,
+    TOR_FLEET_SIZE,
+    TOR_FLEET_SOCKS_PORT_BASE,
+)
+from deadline import Deadline
+from metrics import TOR_DAEMON_RESTARTS_TOTAL
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+READY = "ready"
+DOWN = "down"
+
+# Délai maximal entre deux relances d'un démon qui s'arrête en boucle
+MAX_RESTART_BACKOFF = 300
+
+# Cookie d'authentification du port de contrôle, écrit par Tor dans son DataDirectory
+COOKIE_FILE = "control_auth_cookie"
+
+
+def control_command(
+    port: int,
+    command: str,
+    timeout: float = 5,
+    host: str = "127.0.0.1",
+    cookie: Optional[bytes] = None,
+) -> Optional[str]:
+    """
+    Envoie une commande au port de contrôle d'un démon Tor.
+
+    Args:
+        cookie: Cookie d'authentification (CookieAuthentication) ; sans cookie,
+            authentification sans mot de passe
+
+    Returns:
+        La réponse brute, ou None si le démon est injoignable ou refuse la commande
+    """
+    credential = cookie.hex() if cookie is not None else '""'
+    try:
+        with socket.create_connection((host, port), timeout=timeout) as sock:
+            sock.sendall(f"AUTHENTICATE {credential}\r\n{command}\r\nQUIT\r\n".encode())
+            reply = b""
+            while True:
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                reply += chunk
+    except OSError:
+        return None
+    text = reply.decode(errors="replace")
+    lines = text.splitlines()
+    if len(lines) < 2 or not lines[0].startswith("250") or not any(line.startswith("250") for line in lines[1:]):
+        return None
+    return text
+
+
+class TorDaemon:
+    """Un processus Tor de la flotte."""
+
+    def __init__(self, index: int, socks_port: int, control_port: int, data_dir: str) -> None:
+        self.index = index
+        self.socks_port = socks_port
+        self.control_port = control_port
+        self.data_dir = data_dir
+        self.process: Optional[subprocess.Popen] = None
+        self.state = DOWN
+        self.restarts = 0
+        self.started_at = 0.0
+        self.next_start = 0.0  # Relance différée (backoff) après un arrêt
+        self.sessions = 0  # Sessions attribuées à ce démon
+
+    @property
+    def proxy(self) -> str:
+        return f"socks5h://127.0.0.1:{self.socks_port}"
+
+    @property
+    def cookie_path(self) -> str:
+        return os.path.join(os.path.abspath(self.data_dir), COOKIE_FILE)
+
+    def control(self, command: str, timeout: float = 5) -> Optional[str]:
+        """Commande au port de contrôle, authentifiée par le cookie du démon (None si refusée)."""
+        try:
+            with open(self.cookie_path, "rb") as handle:
+                cookie = handle.read()
+        except OSError:
+            return None  # Cookie pas encore écrit (démarrage en cours)
+        return control_command(self.control_port, command, timeout, cookie=cookie)
+
+    def start(self) -> None:
+        """Lance le processus (le démarrage complet est détecté par `check()`)."""
+        os.makedirs(self.data_dir, mode=0o700, exist_ok=True)
+        # Le cookie d'un lancement précédent n'est plus valable
+        try:
+            os.remove(self.cookie_path)
+        except FileNotFoundError:
+            pass
+        command = [
+            TOR_FLEET_BINARY,
+            "--DataDirectory", os.path.abspath(self.data_dir),
+            "--SocksPort", f"127.0.0.1:{self.socks_port}",
+            "--ControlPort", f"127.0.0.1:{self.control_port}",
+            "--CookieAuthentication", "1",
+            "--Log", f"notice file {os.path.abspath(os.path.join(self.data_dir, 'notice.log'))}",
+            # Le démon s'arrête de lui-même si le service disparaît
+            "--__OwningControllerProcess", str(os.getpid()),
+        ]
+        self.process = subprocess.Popen(
+            command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.state = STARTING
+        self.started_at = time.monotonic()
+        logger.info("🧅 Démon Tor %d lancé (SocksPort %d, ControlPort %d)", self.index, self.socks_port, self.control_port)
+
+    def check(self) -> str:
+        """Met à jour l'état du démon (arrêté, en démarrage ou prêt) et le retourne."""
+        if self.process is None or self.process.poll() is not None:
+            self.state = DOWN
+        elif self.state == STARTING:
+            reply = self.control("GETINFO status/bootstrap-phase", timeout=2)
+            if reply is not None and "PROGRESS=100" in reply:
+                self.state = READY
+                logger.info("✅ Démon Tor %d prêt (%.0fs)", self.index, time.monotonic() - self.started_at)
+            elif time.monotonic() - self.started_at > TOR_FLEET_BOOTSTRAP_TIMEOUT:
+                logger.warning("⚠️  Démon Tor %d: démarrage trop long, arrêt", self.index)
+                self.stop()
+        return self.state
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.state = DOWN
+
+    def snapshot(self) -> Dict:
+        return {
+            "state": self.state,
+            "pid": self.process.pid if self.process is not None else None,
+            "socks_port": self.socks_port,
+            "control_port": self.control_port,
+            "restarts": self.restarts,
+            "sessions": self.sessions,
+            "uptime": round(time.monotonic() - self.started_at, 1) if self.state == READY else 0,
+        }
+
+
+class TorFleet:
+    """Lance, supervise et répartit la charge entre plusieurs démons Tor (thread-safe)."""
+
+    def __init__(
+        self,
+        size: int = TOR_FLEET_SIZE,
+        directory: str = TOR_FLEET_DIR,
+        socks_port_base: int = TOR_FLEET_SOCKS_PORT_BASE,
+        control_port_base: int = TOR_FLEET_CONTROL_PORT_BASE,
+    ) -> None:
+        """
+        Args:
+            size: Nombre de démons Tor
+            directory: Répertoire racine des DataDirectory (un sous-répertoire par démon)
+            socks_port_base: SocksPort du premier démon (les suivants : +1, +2...)
+            control_port_base: ControlPort du premier démon
+        """
+        self.daemons = [
+            TorDaemon(index, socks_port_base + index, control_port_base + index, os.path.join(directory, str(index)))
+            for index in range(size)
+        ]
+        self._cycle = itertools.cycle(self.daemons)
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._stop = threading.Event()
+        self._supervisor: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Lance tous les démons et le superviseur (sans attendre leur démarrage complet)."""
+        with self._lock:
+            if self._supervisor is not None:
+                return
+            for daemon in self.daemons:
+                daemon.start()
+            self._supervisor = threading.Thread(target=self._supervise, name="tor-fleet", daemon=True)
+            self._supervisor.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Arrête le superviseur et tous les démons."""
+        self._stop.set()
+        if self._supervisor is not None:
+            self._supervisor.join()
+        for daemon in self.daemons:
+            daemon.stop()
+
+    def _supervise(self) -> None:
+        """Suit le démarrage des démons et relance ceux qui se sont arrêtés (backoff exponentiel)."""
+        while not self._stop.is_set():
+            # Les vérifications (port de contrôle) se font hors verrou : seul le
+            # superviseur modifie l'état des démons
+            for daemon in self.daemons:
+                previous = daemon.state
+                state = daemon.check()
+                if state == DOWN and previous != DOWN:
+                    delay = min(MAX_RESTART_BACKOFF, TOR_FLEET_CHECK_INTERVAL * 2 ** min(daemon.restarts, 8))
+                    daemon.next_start = time.monotonic() + delay
+                    logger.warning("⚠️  Démon Tor %d arrêté - relance dans %.0fs", daemon.index, delay)
+                elif state == DOWN and time.monotonic() >= daemon.next_start:
+                    daemon.restarts += 1
+                    TOR_DAEMON_RESTARTS_TOTAL.inc()
+                    daemon.start()
+            with self._ready:
+                self._ready.notify_all()
+            self._stop.wait(TOR_FLEET_CHECK_INTERVAL if self._all_ready() else 1)
+
+    def _all_ready(self) -> bool:
+        return all(daemon.state == READY for daemon in self.daemons)
+
+    def acquire(self, deadline: Optional[Deadline] = None) -> TorDaemon:
+        """
+        Démon prêt suivant (tourniquet) ; attend qu'un démon soit prêt, au plus
+        TOR_FLEET_BOOTSTRAP_TIMEOUT secondes et dans la limite de l'échéance de l'appelant.
+        Après TOR_FLEET_BOOTSTRAP_TIMEOUT, le démon suivant est retourné quand même (la
+        requête échouera et sera réessayée).
+
+        Raises:
+            DeadlineExceeded: si l'échéance expire avant qu'un démon soit prêt
+        """
+        deadline = deadline or Deadline()
+        with self._ready:
+            ready = self._ready.wait_for(
+                lambda: any(daemon.state == READY for daemon in self.daemons),
+                deadline.timeout(TOR_FLEET_BOOTSTRAP_TIMEOUT, "attente d'un démon Tor prêt"),
+            )
+            if not ready:
+                deadline.check("attente d'un démon Tor prêt")
+            for _ in range(len(self.daemons)):
+                daemon = next(self._cycle)
+                if daemon.state == READY:
+                    break
+            daemon.sessions += 1
+            return daemon
+
+    def ready_daemons(self) -> List[TorDaemon]:
+        return [daemon for daemon in self.daemons if daemon.state == READY]
+
+    def renew_all(self, timeout: float = 5) -> bool:
+        """Envoie SIGNAL NEWNYM à tous les démons prêts ; True si au moins un l'a accepté."""
+        replies = [daemon.control("SIGNAL NEWNYM", timeout) for daemon in self.ready_daemons()]
+        return any(reply is not None for reply in replies)
+
+    def snapshot(self) -> Dict:
+        """État de chaque démon (exposé par /api/health et /metrics)."""
+        return {str(daemon.index): daemon.snapshot() for daemon in self.daemons}
+
+
+_shared_fleet: Optional[TorFleet] = None
+_shared_lock = threading.Lock()
+
+
+def get_tor_fleet() -> Optional[TorFleet]:
+    """Retourne la flotte partagée, démarrée au premier appel (None si TOR_FLEET_SIZE = 0)."""
+    global _shared_fleet
+    if TOR_FLEET_SIZE <= 0:
+        return None
+    with _shared_lock:
+        if _shared_fleet is None:
+            _shared_fleet = TorFleet()
+            _shared_fleet.start()
+        return _shared_fleet
+
+
+def fleet_snapshot() -> Dict:
+    """État de la flotte, sans la démarrer si elle n'a pas encore servi."""
+    with _shared_lock:
+        fleet = _shared_fleet
+    return fleet.snapshot() if fleet is not None else {}
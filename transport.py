@@ -0,0 +1,157 @@
+"""
+Politique de transport par site pour l'extraction : connexion directe d'abord,
+bascule vers Tor uniquement quand le site bloque (403, 429, page de challenge),
+puis retour en direct après une période de refroidissement.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+
+from config import TRANSPORT_MODE, TRANSPORT_TOR_COOLDOWN
+
+logger = logging.getLogger(__name__)
+
+DIRECT = "direct"
+TOR = "tor"
+
+# Statuts HTTP considérés comme un blocage
+BLOCK_STATUSES = {403, 429}
+
+# Marqueurs de pages de challenge anti-bot (Cloudflare, DataDome, PerimeterX...)
+BLOCK_MARKERS = (
+    "_cf_chl_opt",
+    "/cdn-cgi/challenge-platform",
+    "captcha-delivery.com",
+    "px-captcha",
+    "<title>Access Denied</title>",
+    "<title>Attention Required! | Cloudflare</title>",
+)
+
+# Seul le début de la page est inspecté (les pages de challenge sont courtes)
+BLOCK_SCAN_LENGTH = 20000
+
+
+def contains_block_marker(html: str) -> bool:
+    """Indique si une page HTML ressemble à une page de challenge anti-bot."""
+    head = html[:BLOCK_SCAN_LENGTH]
+    return any(marker in head for marker in BLOCK_MARKERS)
+
+
+def detect_block(response: requests.Response) -> Optional[str]:
+    """
+    Détecte un signal de blocage dans une réponse.
+
+    Returns:
+        Le motif du blocage (ex: "http_403", "captcha") ou None
+    """
+    if response.status_code in BLOCK_STATUSES:
+        return f"http_{response.status_code}"
+    content_type = response.headers.get("Content-Type", "")
+    if "html" not in content_type:
+        return None
+    if contains_block_marker(response.text):
+        return "captcha"
+    return None
+
+
+def is_connection_refused(exc: BaseException) -> bool:
+    """
+    Indique si une erreur réseau est un refus de connexion (pare-feu du site).
+
+    Les timeouts, erreurs DNS et connexions réinitialisées ne sont pas des blocages :
+    ce sont des erreurs ordinaires, retentées sans basculer vers Tor.
+    """
+    pending = [exc]
+    seen = set()
+    while pending:
+        error = pending.pop()
+        if error is None or id(error) in seen:
+            continue
+        seen.add(id(error))
+        if isinstance(error, ConnectionRefusedError):
+            return True
+        # requests enveloppe les erreurs urllib3 (args, reason) qui enveloppent l'erreur socket
+        pending.extend((error.__cause__, error.__context__, getattr(error, "reason", None)))
+        pending.extend(arg for arg in error.args if isinstance(arg, BaseException))
+    return False
+
+
+class TransportPolicy:
+    """Choisit le transport (direct ou Tor) de chaque domaine (thread-safe)."""
+
+    def __init__(self, mode: str = TRANSPORT_MODE, cooldown: float = TRANSPORT_TOR_COOLDOWN) -> None:
+        """
+        Args:
+            mode: "adaptive" (direct puis Tor si blocage), "direct" ou "tor"
+            cooldown: Durée (secondes) passée en Tor après un blocage
+        """
+        self.mode = mode
+        self.cooldown = cooldown
+        self._tor_until: Dict[str, float] = {}
+        self._blocks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        return urlparse(url).netloc
+
+    def transport_for(self, url: str) -> str:
+        """Retourne le transport à utiliser pour cette URL."""
+        if self.mode in (DIRECT, TOR):
+            return self.mode
+        domain = self._domain(url)
+        with self._lock:
+            until = self._tor_until.get(domain)
+            if until is None:
+                return DIRECT
+            if time.monotonic() >= until:
+                del self._tor_until[domain]
+                logger.info("🔓 %s: fin du refroidissement, retour en connexion directe", domain)
+                return DIRECT
+            return TOR
+
+    def report_block(self, url: str, reason: str) -> None:
+        """Enregistre un blocage ; en mode adaptatif, bascule le domaine vers Tor pour la durée de refroidissement."""
+        domain = self._domain(url)
+        with self._lock:
+            self._blocks[domain] = self._blocks.get(domain, 0) + 1
+            if self.mode != DIRECT:
+                self._tor_until[domain] = time.monotonic() + self.cooldown
+        if self.mode == DIRECT:
+            logger.warning("🔒 %s: blocage détecté (%s)", domain, reason)
+            return
+        logger.warning("🔒 %s: blocage détecté (%s) - bascule vers Tor pour %.0fs", domain, reason, self.cooldown)
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """État courant par domaine (transport, temps restant en Tor, nombre de blocages)."""
+        now = time.monotonic()
+        with self._lock:
+            domains = set(self._tor_until) | set(self._blocks)
+            return {
+                domain: {
+                    "transport": TOR if self._tor_until.get(domain, 0) > now or self.mode == TOR else DIRECT,
+                    "tor_remaining": round(max(0.0, self._tor_until.get(domain, 0) - now), 1),
+                    "blocks": self._blocks.get(domain, 0),
+                }
+                for domain in domains
+            }
+
+
+_shared_policy: Optional[TransportPolicy] = None
+_shared_lock = threading.Lock()
+
+
+def get_transport_policy() -> TransportPolicy:
+    """Retourne la politique partagée par tous les scrapers."""
+    global _shared_policy
+    with _shared_lock:
+        if _shared_policy is None:
+            _shared_policy = TransportPolicy()
+        return _shared_policy
@@ -0,0 +1,160 @@
+"""
+Webhooks différentiels : une empreinte compacte par (EAN, site) du dernier envoi
+permet de n'envoyer que ce qui a changé lors d'un nouveau scraping du catalogue.
+
+Modes (WEBHOOK_DELTA_MODE) :
+- "full"    : envoi complet systématique (comportement historique)
+- "changed" : envoi complet uniquement si le produit a changé, rien sinon
+- "diff"    : envoi des seuls champs modifiés, rien si aucun changement
+"""
+
+from __future__ import annotations
+
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from config import WEBHOOK_DELTA_IGNORED_FIELDS, WEBHOOK_DELTA_MODE, WEBHOOK_DELTA_STATE_FILE
+from models import dumps
+
+logger = logging.getLogger(__name__)
+
+FULL = "full"
+CHANGED = "changed"
+DIFF = "diff"
+
+# Empreintes d'un EAN : {site: {champ: empreinte}}
+Fingerprints = Dict[str, Dict[str, str]]
+
+
+def field_fingerprint(value: object) -> str:
+    """Empreinte courte (8 octets) et stable d'une valeur JSON."""
+    return hashlib.blake2b(dumps(value, sort_keys=True), digest_size=8).hexdigest()
+
+
+class DeltaTracker:
+    """Conserve les empreintes des derniers envois et calcule les différences (thread-safe)."""
+
+    def __init__(
+        self,
+        mode: str = WEBHOOK_DELTA_MODE,
+        state_file: Optional[str] = WEBHOOK_DELTA_STATE_FILE,
+    ) -> None:
+        """
+        Args:
+            mode: "full", "changed" ou "diff"
+            state_file: Fichier de persistance des empreintes (None = mémoire uniquement)
+        """
+        self.mode = mode
+        self.state_file = state_file
+        self._state: Dict[str, Fingerprints] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._load()
+        atexit.register(self.save)
+
+    @staticmethod
+    def fingerprints(products: Dict[str, Dict]) -> Fingerprints:
+        """Calcule les empreintes champ par champ de chaque produit."""
+        return {
+            site: {
+                key: field_fingerprint(value)
+                for key, value in product.items()
+                if key not in WEBHOOK_DELTA_IGNORED_FIELDS
+            }
+            for site, product in products.items()
+        }
+
+    def compute(
+        self, ean: str, products: Dict[str, Dict], partial: bool = False
+    ) -> Tuple[Optional[Dict[str, Dict]], Optional[Dict], Fingerprints]:
+        """
+        Calcule ce qu'il faut envoyer pour un EAN.
+
+        Args:
+            ean: Code EAN
+            products: Produits scrapés, par site
+            partial: True si les résultats sont incomplets (budget de temps épuisé) :
+                les sites absents ne sont alors pas considérés comme supprimés
+
+        Returns:
+            (données à envoyer ou None si rien n'a changé, métadonnées delta ou None,
+            empreintes à enregistrer après envoi)
+        """
+        current = self.fingerprints(products)
+        with self._lock:
+            previous = self._state.get(ean)
+
+        if partial and previous:
+            # Les sites non scrapés conservent leur dernière empreinte connue
+            current = {**{site: fields for site, fields in previous.items() if site not in current}, **current}
+
+        if self.mode == FULL or previous is None:
+            return products, None, current
+        if current == previous:
+            return None, None, current
+        if self.mode == CHANGED:
+            return products, None, current
+
+        data: Dict[str, Dict] = {}
+        removed_fields: Dict[str, list] = {}
+        new_sites = []
+        for site, product in products.items():
+            old = previous.get(site)
+            if old is None:
+                data[site] = product
+                new_sites.append(site)
+                continue
+            changed = {
+                key: value
+                for key, value in product.items()
+                if key not in WEBHOOK_DELTA_IGNORED_FIELDS and old.get(key) != current[site][key]
+            }
+            removed = [key for key in old if key not in current[site]]
+            if changed:
+                data[site] = changed
+            if removed:
+                removed_fields[site] = removed
+
+        removed_sites = [site for site in previous if site not in current]
+        delta = {"mode": DIFF}
+        if new_sites:
+            delta["new_sites"] = new_sites
+        if removed_fields:
+            delta["removed_fields"] = removed_fields
+        if removed_sites:
+            delta["removed_sites"] = removed_sites
+        return data, delta, current
+
+    def update(self, ean: str, fingerprints: Fingerprints) -> None:
+        """Enregistre les empreintes du dernier envoi accepté."""
+        with self._lock:
+            self._state[ean] = fingerprints
+            self._dirty = True
+
+    def _load(self) -> None:
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, "r", encoding="utf-8") as handle:
+                self._state = json.load(handle)
+        except (OSError, json.JSONDecodeError) as exc:
+            logger.warning("⚠️  Empreintes webhook illisibles (%s): %s", self.state_file, exc)
+
+    def save(self) -> None:
+        """Écrit les empreintes sur disque (écriture atomique)."""
+        if not self.state_file:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            snapshot = json.dumps(self._state, separators=(",", ":"))
+            self._dirty = False
+        tmp_path = f"{self.state_file}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as handle:
+            handle.write(snapshot)
+        os.replace(tmp_path, self.state_file)
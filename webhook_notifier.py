@@ -5,23 +5,214 @@ Utilitaire pour envoyer des notifications par webhook (email).
 
 from __future__ import annotations
 
+import atexit
+import functools
+import logging
+import threading
 import requests
-from typing import List
+from typing import Callable, List, Optional, Tuple
+
+from cassette import mount_cassette
+from config import (
+    WEBHOOK_BATCH_ENABLED,
+    WEBHOOK_BATCH_MAX_BYTES,
+    WEBHOOK_BATCH_MAX_ITEMS,
+    WEBHOOK_BATCH_WINDOW,
+    WEBHOOK_DELTA_MODE,
+    WEBHOOK_GZIP,
+    WEBHOOK_TIMEOUT,
+)
+from models import dumps
+from timing import span
+from webhook_delta import FULL, DeltaTracker
+from webhook_queue import WebhookDelivery, WebhookDeliveryQueue
+
+logger = logging.getLogger(__name__)
+
+
+class WebhookBatcher:
+    """
+    Regroupe plusieurs produits dans un seul envoi webhook.
+
+    Un lot est envoyé dès qu'il atteint `max_items` produits ou `max_bytes` octets
+    de JSON, ou `window` secondes après l'arrivée de son premier produit. Forme du
+    corps envoyé : {"batch": true, "count": n, "items": [{"ean": ..., "data": ...}, ...]}.
+    Les rappels `on_delivered` des produits d'un lot sont exécutés quand l'envoi du lot
+    est confirmé.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[bytes, int, Callable[[], None]], bool],
+        max_items: int = WEBHOOK_BATCH_MAX_ITEMS,
+        max_bytes: int = WEBHOOK_BATCH_MAX_BYTES,
+        window: float = WEBHOOK_BATCH_WINDOW,
+    ) -> None:
+        """
+        Args:
+            send: Fonction d'envoi d'un corps de lot déjà sérialisé (corps, nombre de
+                produits, rappel à exécuter une fois l'envoi confirmé)
+            max_items: Nombre maximal de produits par lot
+            max_bytes: Taille maximale (JSON non compressé) d'un lot
+            window: Délai maximal (secondes) avant l'envoi d'un lot incomplet
+        """
+        self._send = send
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.window = window
+        self._items: List[bytes] = []
+        self._callbacks: List[Callable[[], None]] = []
+        self._size = 0
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def add(self, item: dict, on_delivered: Optional[Callable[[], None]] = None) -> bool:
+        """
+        Ajoute un produit au lot courant (envoi immédiat si le lot est plein).
+
+        Si le produit ferait dépasser `max_bytes`, le lot courant est d'abord envoyé sans
+        lui ; un produit plus gros que `max_bytes` à lui seul part dans un lot d'un produit.
+
+        Args:
+            item: Produit à envoyer ({"ean": ..., "data": ...})
+            on_delivered: Rappel exécuté une fois l'envoi du lot confirmé
+        """
+        encoded = dumps(item)
+        with self._lock:
+            previous = self._take() if self._items and self._size + len(encoded) > self.max_bytes else ([], [])
+            self._items.append(encoded)
+            if on_delivered is not None:
+                self._callbacks.append(on_delivered)
+            self._size += len(encoded)
+            full = len(self._items) >= self.max_items or self._size >= self.max_bytes
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        sent = self._send_items(*previous)
+        if full:
+            return self.flush() and sent
+        return sent
+
+    def _take(self) -> Tuple[List[bytes], List[Callable[[], None]]]:
+        """Retire les produits du lot courant et leurs rappels (appelé sous verrou)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._items, self._callbacks
+        self._items, self._callbacks, self._size = [], [], 0
+        return batch
+
+    def flush(self) -> bool:
+        """Envoie le lot courant s'il n'est pas vide."""
+        with self._lock:
+            items, callbacks = self._take()
+        return self._send_items(items, callbacks)
+
+    def _send_items(self, items: List[bytes], callbacks: List[Callable[[], None]]) -> bool:
+        if not items:
+            return True
+        body = (
+            b'{"batch": true, "count": ' + str(len(items)).encode() + b', "items": ['
+            + b", ".join(items) + b"]}"
+        )
+
+        def delivered() -> None:
+            for callback in callbacks:
+                callback()
+
+        return self._send(body, len(items), delivered)
 
 
 class WebhookNotifier:
     """Envoie des notifications par webhook."""
 
-    def __init__(self, webhook_url: str, webhook_url_pdts: str = None):
+    def __init__(
+        self,
+        webhook_url: str,
+        webhook_url_pdts: str = None,
+        delivery_queue: Optional[WebhookDeliveryQueue] = None,
+    ):
         """
         Initialise le notifier avec l'URL du webhook.
 
         Args:
             webhook_url: L'URL du webhook pour l'envoi des notifications récapitulatives
             webhook_url_pdts: L'URL du webhook pour l'envoi des produits scrappés
+            delivery_queue: File d'envoi asynchrone ; si fournie, les envois sont mis
+                en file (retry + spool disque) au lieu d'être bloquants
         """
         self.webhook_url = webhook_url
         self.webhook_url_pdts = webhook_url_pdts
+        self.delivery_queue = delivery_queue
+        # Session des envois synchrones (keep-alive, cassette HTTP éventuelle)
+        self.session = mount_cassette(requests.Session())
+
+        # Mode lot (optionnel) : plusieurs produits par requête, corps gzip
+        self.batcher = WebhookBatcher(self._send_batch) if WEBHOOK_BATCH_ENABLED else None
+
+        # Webhooks différentiels (optionnel) : rien n'est envoyé pour un produit inchangé
+        self.delta_tracker = DeltaTracker() if WEBHOOK_DELTA_MODE != FULL else None
+
+        # Un seul hook d'arrêt, pour l'ordre : lot en attente, puis file d'envoi, puis empreintes
+        atexit.register(self.shutdown)
+
+    def _send_batch(self, body: bytes, count: int, on_delivered: Callable[[], None]) -> bool:
+        """Envoie un lot de produits (via la file asynchrone si elle est configurée)."""
+        delivery = WebhookDelivery(
+            url=self.webhook_url_pdts,
+            body=body,
+            label=f"lot de {count} produit(s)",
+            headers={"Content-Type": "application/json"},
+            compress=WEBHOOK_GZIP,
+            on_delivered=on_delivered,
+        )
+        if self.delivery_queue is not None:
+            queued = self.delivery_queue.enqueue(delivery)
+            if queued:
+                logger.debug("📤 %s placé dans la file d'envoi webhook", delivery.label)
+            return queued
+
+        data, headers = delivery.encoded()
+        try:
+            logger.debug("📤 Envoi d'un %s au webhook (%d octets)", delivery.label, len(data))
+            response = self.session.post(self.webhook_url_pdts, data=data, headers=headers, timeout=WEBHOOK_TIMEOUT)
+            response.raise_for_status()
+            logger.info("✅ %s envoyé au webhook", delivery.label.capitalize())
+            on_delivered()
+            return True
+        except requests.exceptions.RequestException as e:
+            logger.error("⚠️  Erreur lors de l'envoi du %s: %s", delivery.label, e)
+            return False
+
+    def flush(self) -> bool:
+        """Envoie immédiatement le lot de produits en attente et persiste les empreintes delta."""
+        if self.delta_tracker is not None:
+            self.delta_tracker.save()
+        if self.batcher is None:
+            return True
+        return self.batcher.flush()
+
+    def shutdown(self) -> None:
+        """Arrêt du service : envoie le lot en attente, vide la file d'envoi puis persiste les empreintes."""
+        if self.batcher is not None:
+            self.batcher.flush()
+        if self.delivery_queue is not None:
+            self.delivery_queue.stop()
+        if self.delta_tracker is not None:
+            self.delta_tracker.save()
+
+    def _enqueue(
+        self, url: str, payload: dict, label: str, on_delivered: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """Place un envoi dans la file asynchrone (le corps est sérialisé immédiatement)."""
+        body = dumps(payload)
+        queued = self.delivery_queue.enqueue(
+            WebhookDelivery(url=url, body=body, label=label, on_delivered=on_delivered)
+        )
+        if queued:
+            logger.debug("📤 %s placé dans la file d'envoi webhook", label)
+        return queued
 
     def send_summary_email(
         self,
@@ -54,7 +245,7 @@ class WebhookNotifier:
             message_parts.append("")
 
         if not message_parts:
-            print("ℹ️  Aucune notification à envoyer (pas de produits ignorés ou non trouvés)")
+            logger.info("ℹ️  Aucune notification à envoyer (pas de produits ignorés ou non trouvés)")
             return True
 
         message_parts.insert(0, "🔔 **Rapport de traitement des codes EAN**\n")
@@ -69,55 +260,107 @@ class WebhookNotifier:
             "not_found_backend": not_found_backend,
         }
 
+        if self.delivery_queue is not None:
+            return self._enqueue(self.webhook_url, payload, "notification récapitulative")
+
         try:
-            print(f"📧 Envoi de la notification par webhook...")
-            response = requests.post(
+            logger.debug("📧 Envoi de la notification par webhook")
+            response = self.session.post(
                 self.webhook_url,
                 json=payload,
-                timeout=10,
+                timeout=WEBHOOK_TIMEOUT,
             )
             response.raise_for_status()
 
-            print(f"✅ Notification envoyée avec succès!")
+            logger.info("✅ Notification récapitulative envoyée")
             return True
 
         except requests.exceptions.RequestException as e:
-            print(f"⚠️  Erreur lors de l'envoi de la notification: {e}")
+            logger.error("⚠️  Erreur lors de l'envoi de la notification: %s", e)
             return False
 
-    def send_product_data(self, ean: str, product_data: dict) -> bool:
+    def send_product_data(
+        self,
+        ean: str,
+        product_data: dict,
+        timed_out: bool = False,
+    ) -> bool:
         """
         Envoie les données d'un produit scrappé via webhook.
 
+        En mode différentiel (WEBHOOK_DELTA_MODE), un produit inchangé depuis le dernier
+        envoi n'est pas renvoyé ; en mode "diff", seuls les champs modifiés sont envoyés
+        et le payload contient une clé "delta" (nouveaux sites, champs et sites supprimés).
+        Les empreintes ne sont enregistrées qu'une fois l'envoi confirmé (réponse 2xx,
+        éventuellement après mise en lot ou en file) : un envoi perdu est refait au
+        prochain scraping.
+
         Args:
             ean: Le code EAN du produit
             product_data: Les données complètes du produit (contenu du JSON)
+            timed_out: True si les données sont partielles (budget de temps épuisé) ; le
+                produit est tout de même envoyé, avec le timeout propre aux webhooks
+                (WEBHOOK_TIMEOUT) et non le budget du job déjà consommé
 
         Returns:
-            True si l'envoi a réussi, False sinon
+            True si l'envoi a réussi, a été mis en lot ou en file (ou était inutile),
+            False sinon
         """
         if not self.webhook_url_pdts:
-            print("⚠️  Aucune URL de webhook pour les produits configurée (WEBHOOK_URL_PDTS)")
+            logger.warning("⚠️  Aucune URL de webhook pour les produits configurée (WEBHOOK_URL_PDTS)")
             return False
 
+        delta = fingerprints = None
+        if self.delta_tracker is not None:
+            product_data, delta, fingerprints = self.delta_tracker.compute(ean, product_data, partial=timed_out)
+            if product_data is None:
+                logger.info("⏭️  Produit %s inchangé depuis le dernier envoi - webhook ignoré", ean)
+                return True
+
         # Payload avec les données du produit
         payload = {
             "ean": ean,
             "data": product_data,
         }
+        if delta:
+            payload["delta"] = delta
+        if timed_out:
+            payload["timed_out"] = True
+
+        on_delivered = None
+        if fingerprints is not None:
+            on_delivered = functools.partial(self.delta_tracker.update, ean, fingerprints)
+        with span("webhook"):
+            return self._send_product_payload(ean, payload, on_delivered)
+
+    def _send_product_payload(
+        self, ean: str, payload: dict, on_delivered: Optional[Callable[[], None]] = None
+    ) -> bool:
+        """
+        Envoie un payload produit (lot, file asynchrone ou envoi synchrone) ; `on_delivered`
+        est exécuté une fois l'envoi confirmé.
+        """
+        if self.batcher is not None:
+            return self.batcher.add(payload, on_delivered)
+
+        if self.delivery_queue is not None:
+            return self._enqueue(self.webhook_url_pdts, payload, f"produit {ean}", on_delivered)
 
         try:
-            print(f"📤 Envoi du produit {ean} au webhook...")
-            response = requests.post(
+            logger.debug("📤 Envoi du produit %s au webhook", ean)
+            response = self.session.post(
                 self.webhook_url_pdts,
-                json=payload,
-                timeout=10,
+                data=dumps(payload),
+                headers={"Content-Type": "application/json"},
+                timeout=WEBHOOK_TIMEOUT,
             )
             response.raise_for_status()
 
-            print(f"✅ Produit {ean} envoyé avec succès au webhook!")
+            logger.info("✅ Produit %s envoyé au webhook", ean)
+            if on_delivered is not None:
+                on_delivered()
             return True
 
         except requests.exceptions.RequestException as e:
-            print(f"⚠️  Erreur lors de l'envoi du produit {ean}: {e}")
+            logger.error("⚠️  Erreur lors de l'envoi du produit %s: %s", ean, e)
             return False
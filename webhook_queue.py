@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+File d'envoi asynchrone des webhooks.
+Les envois sont placés dans une file bornée en mémoire et traités par un pool de
+workers (sessions HTTP persistantes) avec retry exponentiel. Les envois en échec
+définitif sont écrits dans un spool disque (dead letters) rejouable plus tard :
+
+    python3 webhook_queue.py --replay
+"""
+
+from __future__ import annotations
+
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from cassette import mount_cassette
+from config import (
+    WEBHOOK_ENQUEUE_TIMEOUT,
+    WEBHOOK_MAX_ATTEMPTS,
+    WEBHOOK_QUEUE_SIZE,
+    WEBHOOK_RETRY_BASE_DELAY,
+    WEBHOOK_RETRY_MAX_DELAY,
+    WEBHOOK_SPOOL_DIR,
+    WEBHOOK_TIMEOUT,
+    WEBHOOK_WORKERS,
+)
+from logs import setup_logging
+from metrics import WEBHOOK_DELIVERIES_TOTAL, WEBHOOK_DELIVERY_LAG
+
+logger = logging.getLogger(__name__)
+
+DEAD_LETTER_FILE = "dead_letters.jsonl"
+
+# Statuts 4xx pour lesquels un nouvel essai a un sens
+RETRYABLE_CLIENT_STATUSES = {408, 425, 429}
+
+
+@dataclass
+class WebhookDelivery:
+    """Envoi webhook en attente (corps JSON déjà sérialisé, compressé à l'envoi si `compress`)."""
+
+    url: str
+    body: bytes
+    label: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+    compress: bool = False
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    # Appelé après un envoi confirmé (2xx) ; non conservé dans le spool
+    on_delivered: Optional[Callable[[], None]] = field(default=None, repr=False, compare=False)
+
+    def encoded(self) -> Tuple[bytes, Dict[str, str]]:
+        """Retourne le corps à envoyer et ses en-têtes (gzip si demandé)."""
+        if not self.compress:
+            return self.body, self.headers
+        headers = dict(self.headers)
+        headers["Content-Encoding"] = "gzip"
+        return gzip.compress(self.body, compresslevel=6), headers
+
+    def to_spool(self, error: str) -> str:
+        """Sérialise l'envoi pour le spool disque (une ligne JSON)."""
+        return json.dumps({
+            "url": self.url,
+            "label": self.label,
+            "headers": self.headers,
+            "compress": self.compress,
+            "body": self.body.decode("utf-8"),
+            "attempts": self.attempts,
+            "enqueued_at": self.enqueued_at,
+            "failed_at": time.time(),
+            "error": error,
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_spool(cls, line: str) -> "WebhookDelivery":
+        record = json.loads(line)
+        return cls(
+            url=record["url"],
+            body=record["body"].encode("utf-8"),
+            label=record.get("label", ""),
+            headers=record.get("headers", {}),
+            compress=record.get("compress", False),
+        )
+
+
+class WebhookDeliveryQueue:
+    """File bornée + pool de workers d'envoi + spool des envois en échec."""
+
+    def __init__(
+        self,
+        workers: int = WEBHOOK_WORKERS,
+        maxsize: int = WEBHOOK_QUEUE_SIZE,
+        spool_dir: str = WEBHOOK_SPOOL_DIR,
+    ) -> None:
+        """
+        Args:
+            workers: Nombre de threads d'envoi
+            maxsize: Taille maximale de la file en mémoire
+            spool_dir: Répertoire du spool des envois en échec
+        """
+        self.workers = workers
+        self.spool_path = os.path.join(spool_dir, DEAD_LETTER_FILE)
+        self._queue: "queue.Queue[Optional[WebhookDelivery]]" = queue.Queue(maxsize=maxsize)
+        self._threads: List[threading.Thread] = []
+        self._start_lock = threading.Lock()
+        self._spool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.delivered = 0
+        self.retried = 0
+        self.spooled = 0
+        self.busy = 0  # Workers en cours d'envoi
+        # Envoi en cours de chaque worker (placé dans le spool par stop() s'il n'a pas abouti)
+        self._in_flight: Dict[str, WebhookDelivery] = {}
+        self._stopping = threading.Event()
+        # Enregistré à la création : le hook d'arrêt d'un propriétaire de la file
+        # (WebhookNotifier, créé après elle) s'exécute donc avant celui-ci
+        atexit.register(self.stop)
+
+    def start(self) -> None:
+        """Démarre les workers (idempotent)."""
+        with self._start_lock:
+            if self._threads:
+                return
+            self._stopping.clear()
+            for index in range(self.workers):
+                thread = threading.Thread(
+                    target=self._worker, name=f"webhook-{index + 1}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def enqueue(self, delivery: WebhookDelivery) -> bool:
+        """
+        Ajoute un envoi à la file.
+
+        Si la file reste pleine plus de WEBHOOK_ENQUEUE_TIMEOUT secondes, l'envoi est
+        écrit directement dans le spool (aucune donnée perdue).
+
+        Returns:
+            True si l'envoi est en file, False s'il a été placé dans le spool
+        """
+        self.start()
+        try:
+            self._queue.put(delivery, timeout=WEBHOOK_ENQUEUE_TIMEOUT)
+            return True
+        except queue.Full:
+            self._spool(delivery, "file d'envoi pleine")
+            return False
+
+    def depth(self) -> int:
+        """Nombre d'envois en attente dans la file."""
+        return self._queue.qsize()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Attend que la file soit vide (True si vidée avant le timeout)."""
+        deadline = time.monotonic() + timeout if timeout else None
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+        return True
+
+    def stop(self, timeout: float = 10) -> None:
+        """
+        Vide la file (dans la limite du timeout) puis arrête les workers ; le reste va au
+        spool, y compris les envois en cours (workers en attente entre deux essais).
+        """
+        if not self._threads:
+            return
+        self.flush(timeout)
+        self._stopping.set()
+        with self._stats_lock:
+            in_flight, self._in_flight = list(self._in_flight.values()), {}
+        for delivery in in_flight:
+            self._spool(delivery, "arrêt du service (envoi en cours)")
+        while True:
+            try:
+                delivery = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if delivery is not None:
+                self._spool(delivery, "arrêt du service")
+            self._queue.task_done()
+        for _ in self._threads:
+            self._queue.put(None)
+        self._threads = []
+
+    @staticmethod
+    def _create_session() -> requests.Session:
+        """Session persistante d'un worker (connexions keep-alive réutilisées)."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        mount_cassette(session, pool_connections=4, pool_maxsize=4)
+        session.headers.update({"Content-Type": "application/json"})
+        return session
+
+    @staticmethod
+    def _retry_delay(attempt: int) -> float:
+        """Backoff exponentiel avec jitter."""
+        delay = min(WEBHOOK_RETRY_MAX_DELAY, WEBHOOK_RETRY_BASE_DELAY * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def deliver(self, session: requests.Session, delivery: WebhookDelivery) -> Tuple[bool, str]:
+        """
+        Envoie un webhook avec retry exponentiel.
+
+        Returns:
+            (succès, dernière erreur)
+        """
+        error = ""
+        body, headers = delivery.encoded()
+        while delivery.attempts < WEBHOOK_MAX_ATTEMPTS:
+            delivery.attempts += 1
+            try:
+                response = session.post(
+                    delivery.url,
+                    data=body,
+                    headers=headers,
+                    timeout=WEBHOOK_TIMEOUT,
+                )
+                if response.status_code < 400:
+                    return True, ""
+                error = f"HTTP {response.status_code}"
+                if response.status_code < 500 and response.status_code not in RETRYABLE_CLIENT_STATUSES:
+                    return False, error  # erreur définitive, inutile de réessayer
+            except requests.exceptions.RequestException as exc:
+                error = str(exc)
+
+            if delivery.attempts < WEBHOOK_MAX_ATTEMPTS:
+                with self._stats_lock:
+                    self.retried += 1
+                WEBHOOK_DELIVERIES_TOTAL.inc("retried")
+                delay = self._retry_delay(delivery.attempts)
+                logger.warning("⚠️  Webhook %s: %s - nouvel essai dans %.1fs (%d/%d)",
+                               delivery.label, error, delay, delivery.attempts, WEBHOOK_MAX_ATTEMPTS)
+                if self._stopping.wait(delay):
+                    break  # Arrêt du service : l'envoi est repris depuis le spool
+        return False, error
+
+    def _worker(self) -> None:
+        session = self._create_session()
+        name = threading.current_thread().name
+        while True:
+            delivery = self._queue.get()
+            try:
+                if delivery is None:
+                    return
+                self._process(session, name, delivery)
+            finally:
+                self._queue.task_done()
+
+    def _process(self, session: requests.Session, name: str, delivery: WebhookDelivery) -> None:
+        """Envoie un webhook depuis le worker `name` ; en cas d'échec définitif, spool."""
+        with self._stats_lock:
+            self.busy += 1
+            self._in_flight[name] = delivery
+        try:
+            ok, error = self.deliver(session, delivery)
+        except Exception as exc:  # noqa: BLE001
+            ok, error = False, f"{type(exc).__name__}: {exc}"
+        finally:
+            with self._stats_lock:
+                self.busy -= 1
+                # Absent si stop() l'a déjà placé dans le spool
+                owned = self._in_flight.pop(name, None) is delivery
+        if ok:
+            with self._stats_lock:
+                self.delivered += 1
+            WEBHOOK_DELIVERIES_TOTAL.inc("delivered")
+            WEBHOOK_DELIVERY_LAG.observe(time.time() - delivery.enqueued_at)
+            logger.debug("✅ Webhook %s envoyé avec succès", delivery.label)
+            self._confirm(delivery)
+        elif owned:
+            self._spool(delivery, error)
+
+    @staticmethod
+    def _confirm(delivery: WebhookDelivery) -> None:
+        """Exécute le rappel d'un envoi confirmé (une erreur n'affecte pas le worker)."""
+        if delivery.on_delivered is None:
+            return
+        try:
+            delivery.on_delivered()
+        except Exception:  # noqa: BLE001
+            logger.exception("⚠️  Erreur après l'envoi du webhook %s", delivery.label)
+
+    def _spool(self, delivery: WebhookDelivery, error: str) -> None:
+        """Écrit un envoi en échec dans le spool disque."""
+        with self._spool_lock:
+            os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+            with open(self.spool_path, "a", encoding="utf-8") as handle:
+                handle.write(delivery.to_spool(error) + "\n")
+        with self._stats_lock:
+            self.spooled += 1
+        WEBHOOK_DELIVERIES_TOTAL.inc("spooled")
+        logger.error("📥 Webhook %s placé dans le spool (%s): %s", delivery.label, error, self.spool_path)
+
+    def replay_dead_letters(self) -> Tuple[int, int]:
+        """
+        Rejoue les envois du spool de façon synchrone.
+
+        Le spool est renommé avant traitement : les envois qui échouent à nouveau
+        sont réécrits dans un nouveau spool.
+
+        Returns:
+            (nombre d'envois réussis, nombre d'envois de nouveau en échec)
+        """
+        with self._spool_lock:
+            if not os.path.exists(self.spool_path):
+                return 0, 0
+            replay_path = f"{self.spool_path}.{int(time.time())}.replay"
+            os.replace(self.spool_path, replay_path)
+
+        session = self._create_session()
+        replayed = failed = 0
+        with open(replay_path, "r", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip():
+                    continue
+                delivery = WebhookDelivery.from_spool(line)
+                ok, error = self.deliver(session, delivery)
+                if ok:
+                    replayed += 1
+                else:
+                    failed += 1
+                    self._spool(delivery, error)
+        os.remove(replay_path)
+        return replayed, failed
+
+    def stats(self) -> Dict[str, int]:
+        """Compteurs de la file (profondeur, workers actifs, envoyés, réessais, spoolés)."""
+        with self._stats_lock:
+            return {
+                "depth": self.depth(),
+                "workers": len(self._threads),
+                "busy": self.busy,
+                "delivered": self.delivered,
+                "retried": self.retried,
+                "spooled": self.spooled,
+            }
+
+
+def main() -> None:
+    """Point d'entrée CLI : rejoue le spool des webhooks en échec."""
+    if "--replay" not in sys.argv[1:]:
+        print("Usage: python3 webhook_queue.py --replay")
+        sys.exit(1)
+
+    setup_logging()
+    delivery_queue = WebhookDeliveryQueue()
+    print(f"📤 Rejeu du spool: {delivery_queue.spool_path}")
+    replayed, failed = delivery_queue.replay_dead_letters()
+    print(f"✅ Rejoués: {replayed}")
+    print(f"❌ De nouveau en échec: {failed}")
+
+
+if __name__ == "__main__":
+    main()